@@ -1,19 +1,41 @@
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 import numpy as np
 from finvizfinance.quote import finvizfinance
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
+import http_client
+from metrics import observe_stage, stage
+from poll_store import delta_writer, poll_rows
+from quote_page import fetch_quote_page
+from replay import install_from_env
+
+# Tickers fetched in parallel. Per-host request rates live in http_client.
+MAX_WORKERS = 8
+FINVIZ_HOST = 'finviz.com'
+
+# When finvizfinance goes through the shared session it is already rate
+# limited there; older versions need an explicit slot before each call.
+FINVIZ_ROUTED = http_client.install_finvizfinance_session()
+
+# STOCK_REPLAY=record|replay polls against fixtures on disk (see replay.py).
+install_from_env()
 
 class StockScreener:
-    def __init__(self, symbol):
+    def __init__(self, symbol, rate_limiter=None):
         self.symbol = symbol
         self.timeframe = '1h'
         self.data = None
+        self.rate_limiter = rate_limiter
+
+    def _wait_for_slot(self, url_or_host):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(url_or_host)
 
     def fetch_stock_data_finviz(self):
         try:
+            if not FINVIZ_ROUTED:
+                self._wait_for_slot(FINVIZ_HOST)
             stock = finvizfinance(self.symbol)
             self.data = stock.ticker_fundament()
         except Exception as e:
@@ -39,81 +61,124 @@ class StockScreener:
             print("No data available to display.")
 
     def get_data_manual(self):
+        """
+        Fetches the quote page once and parses it with lxml while it streams
+        in, stopping after the snapshot table. Fills self.data with the same
+        fields finvizfinance's ticker_fundament() returns and returns the
+        snapshot table's label/value pairs.
+        """
         try:
-            url = f"https://finviz.com/quote.ashx?t={self.symbol}"
             headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                data = {}
-                table = soup.find_all('table', class_='snapshot-table2')
-                if table:
-                    rows = table[0].find_all('tr')
-                    for row in rows:
-                        cols = row.find_all('td')
-                        if len(cols) == 2:
-                            key = cols[0].text.strip()
-                            value = cols[1].text.strip()
-                            data[key] = value
-                return data
-            else:
-                print(f"{datetime.now()} - HTTP Error {response.status_code} for {self.symbol}")
-                return None
+            self.data, data = fetch_quote_page(self.symbol, headers=headers, rate_limiter=self.rate_limiter)
+            return data
         except Exception as e:
             print(f"{datetime.now()} - Error scraping data for {self.symbol}: {e}")
             return None
 
-def log_data_for_tickers(tickers):
+def fetch_ticker_data(ticker, rate_limiter=None):
+    """
+    Runs both fetch methods for one ticker. Safe to call from worker threads;
+    printing is left to the caller so output from parallel tickers does not
+    interleave.
+    """
+    iteration_start = datetime.now()
+    stock_data = StockScreener(ticker, rate_limiter)
+
+    # One request and one parse feed both outputs; finvizfinance (which
+    # downloads the page again) is only a fallback when that fails.
+    stock_data_manual = stock_data.get_data_manual()
+    if stock_data.data is None:
+        stock_data.fetch_stock_data_finviz()
+    if stock_data.data is not None:
+        stock_data.get_data_by_timeframe('1M')
+    df_manual = None
+    if stock_data_manual:
+        df_manual = pd.DataFrame(stock_data_manual.items(), columns=['Metric', 'Value'])
+
+    iteration_runtime = (datetime.now() - iteration_start).total_seconds()
+    observe_stage('poll_ticker', iteration_runtime)
+    return stock_data, df_manual, iteration_runtime
+
+
+def report_ticker_data(ticker, stock_data, df_manual, iteration_runtime):
+    if stock_data.data is not None:
+        stock_data.display_data()
+    else:
+        print(f"No data available using finvizfinance for {ticker}.")
+
+    if df_manual is not None:
+        print(f"All data using manual scraping for {ticker}:")
+        print(df_manual)
+    else:
+        print(f"No data available for {ticker} using manual scraping.")
+
+    print(f"Iteration runtime: {iteration_runtime:.2f} seconds")
+
+
+def log_data_for_tickers(tickers, max_workers=MAX_WORKERS, rate_limiter=None):
     start_time = datetime.now()
     print(f"\n{start_time} - Fetching data...")
-    total_runtime = 0
-    
-    all_data = []
+    if rate_limiter is None:
+        rate_limiter = http_client.rate_limiter
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {}
+        for ticker in tickers:
+            print(f"\nFetching data for {ticker}...")
+            futures[pool.submit(fetch_ticker_data, ticker, rate_limiter)] = ticker
+
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                results[ticker] = future.result()
+            except Exception as e:
+                print(f"{datetime.now()} - Error fetching data for {ticker}: {e}")
+                continue
+            print(f"\nResults for {ticker}:")
+            report_ticker_data(ticker, *results[ticker])
 
+    # Keep the watchlist order when collecting what gets written to disk.
+    all_data = []
     for ticker in tickers:
-        iteration_start = datetime.now()
-        
-        print(f"\nFetching data for {ticker}...")
-        
-        stock_data = StockScreener(ticker)
-        
-        stock_data.fetch_stock_data_finviz()
+        if ticker not in results:
+            continue
+        stock_data, df_manual, _ = results[ticker]
         if stock_data.data is not None:
-            stock_data.get_data_by_timeframe('1M')
-            stock_data.display_data()
             all_data.append((ticker, 'finvizfinance', stock_data.data))
-        else:
-            print(f"No data available using finvizfinance for {ticker}.")
-        
-        stock_data_manual = stock_data.get_data_manual()
-        if stock_data_manual:
-            df_manual = pd.DataFrame(stock_data_manual.items(), columns=['Metric', 'Value'])
-            print(f"All data using manual scraping for {ticker}:")
-            print(df_manual)
+        if df_manual is not None:
             all_data.append((ticker, 'manual_scraping', df_manual))
-        else:
-            print(f"No data available for {ticker} using manual scraping.")
-        
-        iteration_end = datetime.now()
-        iteration_runtime = (iteration_end - iteration_start).total_seconds()
-        total_runtime += iteration_runtime
-        print(f"Iteration runtime: {iteration_runtime:.2f} seconds")
-
-    for ticker, method, data in all_data:
-        filename = f"{ticker}_{method}_data_{start_time.strftime('%Y%m%d_%H%M%S')}.csv"
-        data.to_csv(filename, index=False)
-        print(f"Data saved to {filename}")
+
+    # One typed, day-partitioned Parquet append per poll instead of a CSV
+    # per ticker and method, holding only the values that changed since the
+    # last poll plus periodic full checkpoints. Read back with
+    # poll_store.load_metric() or poll_store.state_at().
+    # A failed write (full disk, unreadable dataset) loses this poll only;
+    # the writer keeps its state, so the next poll writes those changes.
+    poll_time = start_time.astimezone(timezone.utc)
+    try:
+        rows = [poll_rows(poll_time, ticker, method, data) for ticker, method, data in all_data]
+        if rows:
+            with stage('poll_write'):
+                written, polled = delta_writer.write(pd.concat(rows, ignore_index=True))
+            print(f"Saved {written} of {polled} polled values (unchanged values skipped)")
+    except Exception as e:
+        print(f"{datetime.now()} - Error saving polled data: {e}")
 
     end_time = datetime.now()
     total_runtime = (end_time - start_time).total_seconds()
+    observe_stage('poll_cycle', total_runtime)
     print(f"\nTotal runtime: {total_runtime:.2f} seconds")
+    return total_runtime
 
 
-def fetch_data_at_interval(tickers, interval_minutes):
+def fetch_data_at_interval(tickers, interval_minutes, max_workers=MAX_WORKERS):
     while True:
-        log_data_for_tickers(tickers)
-        sleep_time = interval_minutes * 60
-        print(f"Sleeping for {sleep_time} seconds...")
+        runtime = log_data_for_tickers(tickers, max_workers)
+        # Start the next cycle on the interval boundary, not after a full
+        # interval on top of the fetch time.
+        sleep_time = max(0, interval_minutes * 60 - runtime)
+        print(f"Sleeping for {sleep_time:.0f} seconds...")
         time.sleep(sleep_time)
 
 # Example usage
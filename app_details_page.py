@@ -1,78 +1,85 @@
+import time
 import dash
-from dash import dcc, html, Input, Output, dash_table
+from dash import dcc, html, Input, Output, State, ClientsideFunction, dash_table
 import pandas as pd
-import requests
-from io import StringIO
 from flask_caching import Cache
-import plotly.graph_objs as go
 import yfinance as yf
+from ohlcv_store import store
+from finviz_snapshot import SnapshotRefresher
+from shared_cache import shared_cache_config
+from table_query import ScreenCache
+from search_index import SearchIndex
+from screener import ScreenError
+from charts import build_detail_figures, visible_range, slice_to_range
+from indicators import indicator_engine
+from ttl_cache import history_cache, fundamentals_cache, history_ttl, FUNDAMENTALS_TTL
+from replay import install_from_env
+from metrics import callback_timer, instrument_app
+from background_jobs import ThreadedJobManager, JobCancelled, job_cancelled
+from live_updates import SnapshotPublisher
+
+# STOCK_REPLAY=record|replay runs the app against fixtures on disk (see replay.py).
+install_from_env()
 
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
-cache = Cache(app.server, config={'CACHE_TYPE': 'SimpleCache', 'CACHE_DEFAULT_TIMEOUT': 600})
+# Shared by all workers of both apps; DataFrames are stored as Arrow IPC.
+cache = Cache(app.server, config=shared_cache_config(default_timeout=600))
 
 finviz_url = "https://elite.finviz.com/export.ashx?v=111&f=allYourFilters&auth=29a1935a-c305-4356-b2f1-60de1ad68700"
 
-@cache.memoize(timeout=600)
+finviz_headers = {
+    "User -Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                   "AppleWebKit/537.36 (KHTML, like Gecko) "
+                   "Chrome/91.0.4472.124 Safari/537.36")
+}
+finviz_snapshot = SnapshotRefresher(finviz_url, headers=finviz_headers, cache=cache)
+# Main-table jobs run on threads in this process; results are cached per
+# snapshot version (and minute, for the age line) so identical requests
+# from many tabs are answered without recomputing.
+background_manager = ThreadedJobManager(cache_by=[finviz_snapshot.version, lambda: int(time.time() // 60)])
+
 def fetch_finviz_data():
-    headers = {
-        "User -Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                       "AppleWebKit/537.36 (KHTML, like Gecko) "
-                       "Chrome/91.0.4472.124 Safari/537.36")
-    }
-    response = requests.get(finviz_url, headers=headers)
-    print(f"Fetching new data from Finviz... Status: {response.status_code}")  
-
-    if response.status_code == 200:
-        try:
-            df = pd.read_csv(StringIO(response.text))
-            df.columns = df.columns.map(str)
-            if 'Change' in df.columns:
-                df['Change'] = pd.to_numeric(df['Change'].replace('%', '', regex=True), errors='coerce')
-                if df['Change'].max() < 1:
-                    df['Change'] = df['Change'] * 100
-                df['Change'] = df['Change'].round(2)
-
-            # Convert other relevant columns to numeric
-            numeric_columns = ['Market Cap', 'P/E', 'Forward P/E', 'EPS (ttm)', 'EPS (next Y)', 
-                               'EPS Growth', 'Revenue', 'Operating Margin', 'ROE', 'Debt/Equity', 'Beta','Change 1m', 'Change 3m', 'Change 1d', 'Change 1w', 'Change 1h', 'Change 1mo', 'Change 1y']
-            for col in numeric_columns:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-
-            print(df.head())  
-            return df
-        except Exception as e:
-            print(f"Error parsing data from Finviz: {e}")
-            return pd.DataFrame({"Error": ["Failed to parse data from Finviz"]})
-    elif response.status_code == 429:
-        print("Rate limit exceeded. Please try again later.")
-        return pd.DataFrame({"Error": ["Rate limit exceeded. Please try again later."]})
-    else:
-        print(f"Failed to fetch data. Status code: {response.status_code}")
-        return pd.DataFrame({"Error": [f"Failed to fetch data. Status code: {response.status_code}"]})
+    # Served from the last good snapshot; a background thread refreshes it
+    # before it goes stale and keeps it when a refresh fails.
+    df, _ = finviz_snapshot.get()
+    if df is None:
+        return pd.DataFrame({"Error": [finviz_snapshot.last_error or "Failed to fetch data from Finviz"]})
+    return df
+
+def snapshot_age_text():
+    age = finviz_snapshot.age()
+    if age is None:
+        return ""
+    if finviz_snapshot.partial:
+        return "Loading Finviz data... showing the rows received so far"
+    return f"Finviz data as of {age // 60:.0f}m {age % 60:.0f}s ago"
 
+@fundamentals_cache.memoize(ttl=FUNDAMENTALS_TTL)
 def fetch_detailed_stock_data(ticker_symbol):
-    stock = yf.Ticker(ticker_symbol)
+    info = yf.Ticker(ticker_symbol).info
     data = {
-        "Index": stock.info.get("index", "N/A"),
-        "Market Cap": stock.info.get("marketCap", "N/A"),
-        "P/E": stock.info.get("trailingPE", "N/A"),
-        "Forward P/E": stock.info.get("forwardPE", "N/A"),
-        "EPS (ttm)": stock.info.get("trailingEps", "N/A"),
-        "EPS (next Y)": stock.info.get("forwardEps", "N/A"),
-        "EPS Growth": stock.info.get("earningsGrowth", "N/A"),
-        "Revenue": stock.info.get("totalRevenue", "N/A"),
-        "Operating Margin": stock.info.get("operatingMargins", "N/A"),
-        "ROE": stock.info.get("returnOnEquity", "N/A"),
-        "Debt/Equity": stock.info.get("debtToEquity", "N/A"),
-        "Beta": stock.info.get("beta", "N/A"),
-        "Volume": stock.info.get("regularMarketVolume", "N/A"),
-        "52 Week High": stock.info.get("fiftyTwoWeekHigh", "N/A"),
-        "52 Week Low": stock.info.get("fiftyTwoWeekLow", "N/A"),
-        "Target Price": stock.info.get("targetMeanPrice", "N/A")
+        "Index": info.get("index", "N/A"),
+        "Market Cap": info.get("marketCap", "N/A"),
+        "P/E": info.get("trailingPE", "N/A"),
+        "Forward P/E": info.get("forwardPE", "N/A"),
+        "EPS (ttm)": info.get("trailingEps", "N/A"),
+        "EPS (next Y)": info.get("forwardEps", "N/A"),
+        "EPS Growth": info.get("earningsGrowth", "N/A"),
+        "Revenue": info.get("totalRevenue", "N/A"),
+        "Operating Margin": info.get("operatingMargins", "N/A"),
+        "ROE": info.get("returnOnEquity", "N/A"),
+        "Debt/Equity": info.get("debtToEquity", "N/A"),
+        "Beta": info.get("beta", "N/A"),
+        "Volume": info.get("regularMarketVolume", "N/A"),
+        "52 Week High": info.get("fiftyTwoWeekHigh", "N/A"),
+        "52 Week Low": info.get("fiftyTwoWeekLow", "N/A"),
+        "Target Price": info.get("targetMeanPrice", "N/A")
     }
     return pd.DataFrame(data.items(), columns=["Metric", "Value"])
 
+# Cached per (ticker, timeframe) for about one bar, so toggling the SMA
+# checklist or revisiting a timeframe does not download anything.
+@history_cache.memoize(ttl=history_ttl)
 def fetch_historical_data(ticker_symbol, interval):
     interval_mapping = {
         '1m':  ('7d', '1m'),
@@ -86,10 +93,10 @@ def fetch_historical_data(ticker_symbol, interval):
     
     period, yf_interval = interval_mapping.get(interval, ('1y', '1d'))
     
-    stock = yf.Ticker(ticker_symbol)
-    df = stock.history(period=period, interval=yf_interval)
+    df = store.history(ticker_symbol, period, yf_interval)
     if df.empty:
-        df = stock.history(period='1y', interval='1d')
+        period, yf_interval = '1y', '1d'
+        df = store.history(ticker_symbol, period, yf_interval)
 
     df.reset_index(inplace=True)
     if 'Date' not in df.columns:
@@ -97,28 +104,55 @@ def fetch_historical_data(ticker_symbol, interval):
 
     df['Change %'] = ((df['Close'] - df['Open'].iloc[0]) / df['Open'].iloc[0]) * 100
     
-    if not df.empty:
-        df['SMA20'] = df['Close'].rolling(window=20).mean()
-        df['SMA50'] = df['Close'].rolling(window=50).mean()
-        df['SMA200'] = df['Close'].rolling(window=200).mean()
+    # SMA/EMA/Bollinger/RSI/ATR/volatility, updated from the previous call's
+    # state when only new bars arrived.
+    indicator_engine.apply((ticker_symbol, period, yf_interval), df)
 
     return df
 
-def main_page():
+screen_cache = ScreenCache(search_index=SearchIndex())
+
+def build_screen(progress=None):
+    if progress is not None:
+        progress("Loading Finviz snapshot...")
     df = fetch_finviz_data()
     if df.empty or "Error" in df.columns:
-        return html.Div(
-            "No data available. Please check your Finviz configuration.", 
-            style={'textAlign': 'center', 'color': 'red'}
-        )
+        return df
 
     # Add extra columns for the desired timeframes
     timeframes = ['1m', '3m', '1d', '1w', '1h', '1mo', '1y']
     for tf in timeframes:
         df[f'Change {tf}'] = None
+    return df
+
+def current_screen(progress=None):
+    # Rebuilt only when a new Finviz snapshot has been swapped in.
+    return screen_cache.get(finviz_snapshot.version(), lambda: build_screen(progress))
+
+# Pushes row diffs of each new screen to every open main page at /events.
+live_publisher = SnapshotPublisher(finviz_snapshot, current_screen)
+
+numeric_columns = ['Market Cap', 'P/E', 'Forward P/E', 'EPS (ttm)', 'EPS (next Y)', 
+                   'EPS Growth', 'Revenue', 'Operating Margin', 'ROE', 'Debt/Equity', 'Beta', 'Change','Change 1m', 'Change 3m', 'Change 1d', 'Change 1w', 'Change 1h', 'Change 1mo', 'Change 1y']
+
+# Shown until the first screen has been built in this worker.
+skeleton_columns = ['Ticker', 'Company', 'Sector', 'Industry', 'Country', 'Market Cap', 'P/E', 'Price', 'Change', 'Volume']
+no_data_text = "No data available. Please check your Finviz configuration."
+
+def table_columns(columns):
+    return [{"name": col, "id": col, "type": "numeric" if col in numeric_columns else "text"} for col in columns]
+
+def main_page():
+    # Never builds the screen or waits on the network: paints the last
+    # screen this worker built, or empty skeleton columns, and
+    # update_main_table fills in the current data as a background job.
+    screen = screen_cache.engine
+    if screen is not None and not screen.df.empty and "Error" not in screen.df.columns:
+        columns = list(screen.df.columns)
+        records, page_count = screen.page(0, 10)
+    else:
+        columns, records, page_count = skeleton_columns, [], 1
 
-    numeric_columns = ['Market Cap', 'P/E', 'Forward P/E', 'EPS (ttm)', 'EPS (next Y)', 
-                       'EPS Growth', 'Revenue', 'Operating Margin', 'ROE', 'Debt/Equity', 'Beta', 'Change','Change 1m', 'Change 3m', 'Change 1d', 'Change 1w', 'Change 1h', 'Change 1mo', 'Change 1y']
 
     return html.Div([
         html.H1("Stock Screener - Main Page", style={'textAlign': 'center', 'color': '#007BFF'}),
@@ -133,27 +167,46 @@ def main_page():
                     style={'marginRight': '10px'}
                 )
             ], style={'display': 'inline-block', 'marginRight': '20px'}),
+            html.Div([
+                html.Label("Screen:"),
+                dcc.Input(
+                    id='screen-input',
+                    type='text',
+                    debounce=True,
+                    placeholder="e.g. P/E < 20 and zscore(ROE by Sector) > 1",
+                    style={'marginRight': '10px', 'width': '350px'}
+                )
+            ], style={'display': 'inline-block', 'marginRight': '20px'}),
             html.Button("Refresh Data", id="refresh-button", n_clicks=0, 
                         style={'backgroundColor': '#007BFF', 'color': 'white', 
                                'padding': '10px 20px', 'borderRadius': '5px'}),
             dcc.RadioItems(
-                id='refresh-interval-radio',
+                id='live-updates-radio',
                 options=[
-                    {'label': '10s', 'value': 10},
-                    {'label': '1min', 'value': 60},
-                    {'label': 'off', 'value': 0},
+                    {'label': 'live', 'value': 'live'},
+                    {'label': 'off', 'value': 'off'},
                 ],
-                value=0,
-                labelStyle={'marginRight': '20px'}
-            )
+                value='live',
+                labelStyle={'marginRight': '20px'},
+                style={'display': 'inline-block'}
+            ),
+            html.Span(id='live-status', style={'color': 'green'})
         ], style={'marginBottom': '20px'}),
-        dcc.Interval(id='refresh-interval', interval=0, n_intervals=0),
+        # Diffs pushed by live_publisher land in live-event; live-requery is
+        # bumped when a diff means the visible page must be fetched again.
+        dcc.Store(id='live-event'),
+        dcc.Store(id='live-requery', data=0),
+        html.Div("Loading Finviz data..." if screen is None else None, id='refresh-progress',
+                 style={'color': '#666', 'marginBottom': '10px'}),
+        html.Div(snapshot_age_text(), id='snapshot-age',
+                 style={'color': '#666', 'marginBottom': '10px'}),
+        html.Div(id='screen-status', style={'color': 'red', 'marginBottom': '10px'}),
 
         html.Div([
             html.Label("Sort By:"),
             dcc.Dropdown(
                 id='sort-by-dropdown',
-                options=[{'label': col, 'value': col} for col in df.columns],
+                options=[{'label': col, 'value': col} for col in columns],
                 value='Ticker',
                 style={'width': '45%', 'display': 'inline-block', 'marginRight': '10px'}
             ),
@@ -170,8 +223,8 @@ def main_page():
 
         dash_table.DataTable(
             id='main-table',
-            columns=[{"name": col, "id": col, "type": "numeric" if col in numeric_columns else "text"} for col in df.columns],
-            data=df.to_dict('records'),
+            columns=table_columns(columns),
+            data=records,
             style_table={'overflowX': 'auto'},
             style_cell={'textAlign': 'left', 'padding': '5px'},
             style_header={'backgroundColor': '#f4f4f4', 'fontWeight': 'bold'},
@@ -191,8 +244,14 @@ def main_page():
                     'backgroundColor': '#FFB6C1',
                 }
             ],
+            # Paging, sorting and filtering run on the server; the browser
+            # only ever receives the visible page.
+            page_current=0,
             page_size=10,
-            sort_action='native',  # Enable native sorting
+            page_count=page_count,
+            page_action='custom',
+            sort_action='custom',
+            filter_action='custom',
         ),
 
         html.Div("Click on a ticker to view detailed analysis.",
@@ -224,7 +283,10 @@ def detail_page(ticker_symbol):
             options=[
                 {'label': 'SMA20', 'value': 'SMA20'},
                 {'label': 'SMA50', 'value': 'SMA50'},
-                {'label': 'SMA200', 'value': 'SMA200'}
+                {'label': 'SMA200', 'value': 'SMA200'},
+                {'label': 'EMA20', 'value': 'EMA20'},
+                {'label': 'EMA50', 'value': 'EMA50'},
+                {'label': 'Bollinger Bands', 'value': 'BB'}
             ],
             value=['SMA20', 'SMA50'],
             style={'marginBottom': '20px'}
@@ -246,43 +308,91 @@ def detail_page(ticker_symbol):
 
 @app.callback(
     [Output('main-table', 'data'),
-     Output('refresh-interval', 'interval')],
+     Output('main-table', 'page_count'),
+     Output('main-table', 'columns'),
+     Output('sort-by-dropdown', 'options'),
+     Output('snapshot-age', 'children'),
+     Output('screen-status', 'children')],
     [Input('refresh-button', 'n_clicks'),
-     Input('refresh-interval-radio', 'value'),
+     Input('live-requery', 'data'),
      Input('sort-by-dropdown', 'value'),
-     Input('sort-order', 'value')],
-    prevent_initial_call=True
+     Input('sort-order', 'value'),
+     Input('main-table', 'page_current'),
+     Input('main-table', 'page_size'),
+     Input('main-table', 'sort_by'),
+     Input('main-table', 'filter_query'),
+     Input('search-input', 'value'),
+     Input('screen-input', 'value')],
+    # Runs as a background job so a screen rebuild does not hold a server
+    # thread; a newer request for the table supersedes (cancels) this one.
+    background=True,
+    manager=background_manager,
+    progress=[Output('refresh-progress', 'children')],
+    progress_default=[''],
+    cancel=[Input('url', 'pathname')],
+    # Clicks and live requeries re-run the job but do not change its answer.
+    cache_args_to_ignore=[0, 1]
+)
+def update_main_table(set_progress, n_clicks, requery, sort_by, sort_order,
+                      page_current, page_size, table_sort_by, filter_query, search, screen):
+    print(f"Refresh triggered! Button Clicks: {n_clicks}, Live requeries: {requery}")
+
+    # Sorting by a column header takes precedence over the dropdown.
+    sort = table_sort_by or [{'column_id': sort_by, 'direction': sort_order}]
+    engine = current_screen(progress=set_progress)
+    if job_cancelled():
+        # The screen build is shared and kept; only this answer is stale.
+        raise JobCancelled("Superseded by a newer table request")
+    columns = list(engine.df.columns)
+    if engine.df.empty or "Error" in columns:
+        columns = skeleton_columns
+        return ([], 1, table_columns(columns), [{'label': col, 'value': col} for col in columns],
+                snapshot_age_text(), no_data_text)
+    try:
+        records, page_count = engine.page(page_current, page_size, sort, filter_query, search, screen)
+        status = ''
+    except ScreenError as e:
+        records, page_count = engine.page(page_current, page_size, sort, filter_query, search)
+        status = f"Screen ignored: {e}"
+
+    return (records, page_count, table_columns(columns), [{'label': col, 'value': col} for col in columns],
+            snapshot_age_text(), status)
+
+@app.callback(Input('refresh-button', 'n_clicks'), prevent_initial_call=True)
+@callback_timer
+def request_snapshot_refresh(n_clicks):
+    # Serve the current snapshot right away and revalidate it in the background.
+    finviz_snapshot.request_refresh()
+
+# Both run in the browser (assets/live_updates.js): one opens or closes the
+# event stream, the other patches the visible rows with each pushed diff.
+app.clientside_callback(
+    ClientsideFunction(namespace='live', function_name='toggle'),
+    Output('live-status', 'children'),
+    Input('live-updates-radio', 'value')
 )
-def update_main_table(n_clicks, refresh_value, sort_by, sort_order):
-    print(f"Refresh triggered! Button Clicks: {n_clicks}, Auto-refresh Interval: {refresh_value}s")
-    
-    # Set refresh interval based on user selection
-    interval = refresh_value * 1000 if refresh_value > 0 else 0
-
-    # Fetch the financial data from a data source
-    df = fetch_finviz_data()  # Ensure this function can handle the new data requirements
-
 
-    # Sort the DataFrame based on the selected sort criteria
-    ascending = (sort_order == 'asc')
-    
-    # Define possible columns based on time intervals
-    time_intervals = ['Change 1m', 'Change 3m', 'Change 1d', 'Change 1w', 'Change 1h', 'Change 1mo', 'Change 1y']
-
-    # Validate and sort by the chosen criteria
-    if sort_by in time_intervals:
-        df['Change_numeric'] = pd.to_numeric(df[sort_by].str.replace('%', ''), errors='coerce')
-        df = df.sort_values(by='Change_numeric', ascending=ascending)
-        df.drop(columns=['Change_numeric'], inplace=True)
-    else:
-        df = df.sort_values(by=sort_by, ascending=ascending)
+app.clientside_callback(
+    ClientsideFunction(namespace='live', function_name='apply'),
+    [Output('main-table', 'data', allow_duplicate=True),
+     Output('live-requery', 'data')],
+    [Input('live-event', 'data')],
+    [State('main-table', 'data'),
+     State('main-table', 'sort_by'),
+     State('sort-by-dropdown', 'value'),
+     State('main-table', 'filter_query'),
+     State('search-input', 'value'),
+     State('screen-input', 'value'),
+     State('live-requery', 'data')],
+    prevent_initial_call=True
+)
 
-    return df.to_dict('records'), interval
 @app.callback(
     Output('url', 'pathname'),
     [Input('main-table', 'active_cell')],
     [dash.dependencies.State('main-table', 'data')]
 )
+@callback_timer
 def navigate_to_ticker(active_cell, table_data):
     if active_cell:
         row = active_cell['row']
@@ -291,80 +401,41 @@ def navigate_to_ticker(active_cell, table_data):
     return '/'
 
 @app.callback(
-    [Output('candlestick-chart', 'figure'), Output('volume-chart', 'figure')],
+    [Output('candlestick-chart', 'figure'), Output('volume-chart', 'figure'),
+     Output('candlestick-chart', 'relayoutData')],
     [Input('timeframe-dropdown', 'value'), Input('sma-options', 'value')],
-    Input('url', 'pathname')
+    Input('url', 'pathname'),
+    Input('candlestick-chart', 'relayoutData')
 )
-def update_detail_page(timeframe, sma_options, pathname):
+@callback_timer
+def update_detail_page(timeframe, sma_options, pathname, relayout_data):
     if pathname.startswith('/ticker/'):
         ticker_symbol = pathname.split('/')[2]
         historical_data = fetch_historical_data(ticker_symbol, timeframe)
 
-        if not historical_data.empty:
-            historical_data['Candle Change %'] = (
-                (historical_data['Close'] - historical_data['Open']) /
-                historical_data['Open']
-            ) * 100
-
-        hover_text = []
-        for _, row in historical_data.iterrows():
-            hover_text.append(
-                f"Date: {row['Date']}<br>"
-                f"Open: {row['Open']:.2f}<br>"
-                f"High: {row['High']:.2f}<br>"
-                f"Low: {row['Low']:.2f}<br>"
-                f"Close: {row['Close']:.2f}<br>"
-                f"Volume: {row['Volume']}<br>"
-                f"Change: {row['Candle Change %']:.2f}%"
-            )
-
-        candlestick_chart = go.Figure()
-        candlestick_chart.add_trace(go.Candlestick(
-            x=historical_data['Date'],
-            open=historical_data['Open'],
-            high=historical_data['High'],
-            low=historical_data['Low'],
-            close=historical_data['Close'],
-            name='Candlestick',
-            text=hover_text,
-            hoverinfo='text'
-        ))
-
-        if not historical_data.empty and len(historical_data) > 1:
-            overall_change = ((historical_data['Close'].iloc[-1] - historical_data['Open'].iloc[0]) /
-                              historical_data['Open'].iloc[0]) * 100
-            candlestick_chart.add_annotation(
-                x=historical_data['Date'].iloc[-1],
-                y=historical_data['High'].max(),
-                text=f"Overall Change: {overall_change:.2f}%",
-                showarrow=True,
-                arrowhead=2,
-                ax=0,
-                ay=-40
-            )
-
-        for sma in sma_options:
-            if sma in historical_data.columns:
-                candlestick_chart.add_trace(go.Scatter(
-                    x=historical_data['Date'],
-                    y=historical_data[sma],
-                    mode='lines',
-                    name=sma
-                ))
-
-        volume_chart = go.Figure()
-        volume_chart.add_trace(go.Bar(
-            x=historical_data['Date'],
-            y=historical_data['Volume'],
-            name='Volume'
-        ))
-        return candlestick_chart, volume_chart
-    return {}, {}
+        # Long series are downsampled; zooming in re-renders just the visible
+        # range from the cached history, at full resolution once it fits.
+        # The zoom belongs to the ticker and timeframe it was made on: a new
+        # one clears it, so later inputs (e.g. SMA toggles) do not slice the
+        # new bars to it.
+        if dash.callback_context.triggered_id in ('timeframe-dropdown', 'url'):
+            figures = build_detail_figures(historical_data, sma_options)
+            return figures + (None,)
+        x_range = visible_range(relayout_data)
+        if x_range is not None:
+            visible = slice_to_range(historical_data, x_range)
+            if visible.empty:
+                x_range = None  # nothing loaded in that range; show everything
+            else:
+                historical_data = visible
+        return build_detail_figures(historical_data, sma_options, x_range=x_range) + (dash.no_update,)
+    return {}, {}, dash.no_update
 
 @app.callback(
     Output('page-content', 'children'),
     Input('url', 'pathname')
 )
+@callback_timer
 def display_page(pathname):
     if pathname == '/' or pathname is None:
         return main_page()
@@ -374,10 +445,21 @@ def display_page(pathname):
     else:
         return html.H1("404: Page Not Found", style={'textAlign': 'center', 'color': 'red'})
 
-app.layout = html.Div([
-    dcc.Location(id='url', refresh=False),
-    html.Div(id='page-content', children=main_page())
-])
+# Per-callback latency histograms, stage timers and cache hit ratios at /metrics.
+instrument_app(app, caches=[history_cache, fundamentals_cache])
+live_publisher.install(app.server)
+
+def serve_layout():
+    # Evaluated per page load rather than at import, so importing the app
+    # does no network I/O. The snapshot download starts in the background
+    # now; display_page fills page-content for the URL.
+    finviz_snapshot.start()
+    return html.Div([
+        dcc.Location(id='url', refresh=False),
+        html.Div("Loading...", id='page-content', style={'color': '#666'})
+    ])
+
+app.layout = serve_layout
 
 if __name__ == '__main__':
     app.run_server(debug=True)
\ No newline at end of file
@@ -0,0 +1,113 @@
+// Live main-table updates pushed by the server over Server-Sent Events (see
+// live_updates.py). Diffs are applied to the rows on screen; the page is
+// only fetched again when the diff could change which rows it shows.
+(function () {
+    const live = {source: null, fetchedAt: null, partial: false, connected: false, timer: null};
+    const noUpdate = () => window.dash_clientside.no_update;
+
+    function onMainPage() {
+        return document.getElementById('main-table') !== null;
+    }
+
+    function close() {
+        if (live.source) {
+            live.source.close();
+            live.source = null;
+        }
+        live.connected = false;
+    }
+
+    function setStatus(status) {
+        live.fetchedAt = status.fetched_at;
+        live.partial = status.partial;
+        renderAge();
+    }
+
+    function renderAge() {
+        if (!onMainPage() || live.fetchedAt === null || live.partial) {
+            return;
+        }
+        const age = Math.max(0, Date.now() / 1000 - live.fetchedAt);
+        const text = `Finviz data as of ${Math.floor(age / 60)}m ${Math.floor(age % 60)}s ago`;
+        window.dash_clientside.set_props('snapshot-age', {children: text});
+    }
+
+    function deliver(event) {
+        if (!onMainPage()) {
+            close();
+            return;
+        }
+        window.dash_clientside.set_props('live-event', {data: event});
+    }
+
+    function connect() {
+        close();
+        live.source = new EventSource('/events');
+        live.source.addEventListener('hello', function (e) {
+            setStatus(JSON.parse(e.data));
+            // A reconnect may have missed events; the first hello follows
+            // the page load, which is current.
+            if (live.connected) {
+                deliver({resync: true});
+            }
+            live.connected = true;
+        });
+        live.source.addEventListener('diff', function (e) {
+            const diff = JSON.parse(e.data);
+            setStatus(diff);
+            deliver(diff);
+        });
+        live.source.addEventListener('resync', function (e) {
+            deliver({...JSON.parse(e.data), resync: true});
+        });
+        if (live.timer === null) {
+            live.timer = setInterval(renderAge, 5000);
+        }
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        live: {
+            toggle: function (mode) {
+                if (mode === 'live') {
+                    connect();
+                    return 'Live';
+                }
+                close();
+                return '';
+            },
+
+            apply: function (event, rows, tableSortBy, sortBy, filterQuery, search, screen, requery) {
+                if (!event) {
+                    return [noUpdate(), noUpdate()];
+                }
+                const refetch = [noUpdate(), (requery || 0) + 1];
+                if (event.resync || event.added.length || event.removed.length) {
+                    return refetch;
+                }
+                if (!event.columns.length || !rows) {
+                    return [noUpdate(), noUpdate()];
+                }
+                // Any changed value may move a row in or out of a filtered
+                // view, and a changed sort key may reorder the page.
+                if (filterQuery || search || screen) {
+                    return refetch;
+                }
+                const sortColumns = tableSortBy && tableSortBy.length
+                    ? tableSortBy.map(s => s.column_id) : [sortBy];
+                if (sortColumns.some(column => event.columns.includes(column))) {
+                    return refetch;
+                }
+                let patched = false;
+                const updated = rows.map(function (row) {
+                    const changes = event.changed[row.Ticker];
+                    if (!changes) {
+                        return row;
+                    }
+                    patched = true;
+                    return Object.assign({}, row, changes);
+                });
+                return [patched ? updated : noUpdate(), noUpdate()];
+            }
+        }
+    });
+})();
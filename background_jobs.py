@@ -0,0 +1,122 @@
+import itertools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import diskcache
+from dash import DiskcacheManager
+
+# Job results and state, shared by every worker. Kept apart from the
+# Flask-Caching directory, whose pruning expects only its own files there.
+JOB_DIR = os.environ.get('STOCK_JOB_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'job_data'))
+MAX_JOB_WORKERS = 4
+# Seconds a job may run before other workers stop treating it as alive
+# (covers a worker that died mid-job).
+JOB_TIMEOUT = 900
+# Seconds a finished result is kept for identical requests.
+RESULT_EXPIRE = 600
+
+_current = threading.local()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class ThreadedJobManager(DiskcacheManager):
+    """
+    Dash background-callback manager that runs jobs on a thread pool inside
+    the server process rather than in a new subprocess per job, so a job
+    sees this worker's Finviz snapshot, screen cache and connection pool
+    instead of starting cold. Results, progress and job state live in
+    diskcache as with DiskcacheManager, so any worker can answer the
+    browser's polling requests.
+
+    - Identical jobs (same cache key: inputs, callback and `cache_by`)
+      started while one is running share that run instead of starting
+      another.
+    - terminate_job() (a superseded request, or a `cancel` input) marks a
+      job cancelled once no request is waiting on it. Threads cannot be
+      killed, so a job that has not started yet is skipped and a running
+      one stops where it checks job_cancelled().
+
+    Dash has no public in-process manager: DiskcacheManager forks a process
+    per job, which would start without the warm caches and could inherit
+    locks held by this worker's refresher and publisher threads. So this
+    overrides the manager's job methods (call_job_fn, terminate_job,
+    terminate_unhealthy_job, job_running) and reuses its progress key.
+    requirements.txt pins the Dash minor version, and
+    tests/test_background_jobs.py fails if those signatures change.
+    """
+
+    def __init__(self, cache=None, cache_by=None, expire=RESULT_EXPIRE, max_workers=MAX_JOB_WORKERS):
+        super().__init__(cache if cache is not None else diskcache.Cache(JOB_DIR), cache_by, expire)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dash-job')
+        self._ids = itertools.count(1)
+
+    @staticmethod
+    def _job_key(job, name):
+        return f"job:{job}:{name}"
+
+    def call_job_fn(self, key, job_fn, args, context):
+        if self.cache_by is not None and self.result_ready(key):
+            return None  # answered from the cached result
+        handle = self.handle
+        with handle.transact():
+            running = handle.get(f"{key}-job")
+            if running is not None and self.job_running(running):
+                handle.incr(self._job_key(running, 'waiting'))
+                return running
+            job = f"{os.getpid()}-{next(self._ids)}"
+            handle.set(f"{key}-job", job, expire=JOB_TIMEOUT)
+            handle.set(self._job_key(job, 'running'), True, expire=JOB_TIMEOUT)
+            handle.set(self._job_key(job, 'waiting'), 1, expire=JOB_TIMEOUT)
+        self.executor.submit(self._run, job, key, job_fn, args, context)
+        return job
+
+    def _run(self, job, key, job_fn, args, context):
+        _current.job, _current.manager = job, self
+        try:
+            if not self.cancelled(job):
+                job_fn(key, self._make_progress_key(key), args, context)
+        finally:
+            _current.job = _current.manager = None
+            handle = self.handle
+            with handle.transact():
+                result = handle.get(key)
+                if self.cancelled(job) and isinstance(result, dict) and 'background_callback_error' in result:
+                    # A job that stopped because it was cancelled has no
+                    # answer; do not serve its error to identical requests.
+                    handle.delete(key)
+                if handle.get(f"{key}-job") == job:
+                    handle.delete(f"{key}-job")
+                for name in ('running', 'waiting', 'cancel'):
+                    handle.delete(self._job_key(job, name))
+
+    def cancelled(self, job):
+        return job is not None and self.handle.get(self._job_key(job, 'cancel')) is not None
+
+    def terminate_job(self, job):
+        if job is None:
+            return
+        handle = self.handle
+        with handle.transact():
+            if handle.get(self._job_key(job, 'running')) is None:
+                return
+            if handle.decr(self._job_key(job, 'waiting'), default=1) <= 0:
+                handle.set(self._job_key(job, 'cancel'), True, expire=JOB_TIMEOUT)
+
+    def terminate_unhealthy_job(self, job):
+        return False
+
+    def job_running(self, job):
+        return job is not None and self.handle.get(self._job_key(job, 'running')) is not None
+
+
+def job_cancelled():
+    """
+    True when called from a background job that has been cancelled or
+    superseded; jobs check it between expensive steps.
+    """
+    manager = getattr(_current, 'manager', None)
+    return manager is not None and manager.cancelled(_current.job)
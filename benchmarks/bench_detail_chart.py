@@ -0,0 +1,79 @@
+"""
+Compares the old row-by-row hover-text loop from update_detail_page() with
+the column-wise builder in charts.py, at 1k/10k/100k bars. `points` is the
+candle count actually sent to the browser after downsampling.
+
+    python benchmarks/bench_detail_chart.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from plotly.io.json import to_json_plotly
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts import build_detail_figures, candle_hover_text  # noqa: E402
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+def synthetic_bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.001, n))
+    open_ = close * (1 + rng.normal(0, 0.0005, n))
+    df = pd.DataFrame({
+        'Date': pd.date_range('2024-01-02 09:30', periods=n, freq='min', tz='America/New_York'),
+        'Open': open_,
+        'High': np.maximum(open_, close) * 1.001,
+        'Low': np.minimum(open_, close) * 0.999,
+        'Close': close,
+        'Volume': rng.integers(100, 100_000, n),
+    })
+    df['SMA20'] = df['Close'].rolling(window=20).mean()
+    df['SMA50'] = df['Close'].rolling(window=50).mean()
+    return df
+
+
+def legacy_hover_text(historical_data):
+    historical_data = historical_data.copy()
+    historical_data['Candle Change %'] = (
+        (historical_data['Close'] - historical_data['Open']) /
+        historical_data['Open']
+    ) * 100
+    hover_text = []
+    for _, row in historical_data.iterrows():
+        hover_text.append(
+            f"Date: {row['Date']}<br>"
+            f"Open: {row['Open']:.2f}<br>"
+            f"High: {row['High']:.2f}<br>"
+            f"Low: {row['Low']:.2f}<br>"
+            f"Close: {row['Close']:.2f}<br>"
+            f"Volume: {row['Volume']}<br>"
+            f"Change: {row['Candle Change %']:.2f}%"
+        )
+    return hover_text
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    print(f"{'bars':>8} {'legacy hover':>14} {'vector hover':>14} {'figures':>10} {'to_json':>10} {'points':>8}")
+    for n in SIZES:
+        df = synthetic_bars(n)
+        legacy, legacy_time = timed(legacy_hover_text, df)
+        vector, vector_time = timed(candle_hover_text, df)
+        assert list(vector) == legacy, "hover text differs from the legacy loop"
+        (candles, volume), figure_time = timed(build_detail_figures, df, ['SMA20', 'SMA50'])
+        _, json_time = timed(lambda: (to_json_plotly(candles), to_json_plotly(volume)))
+        print(f"{n:>8} {legacy_time:>13.3f}s {vector_time:>13.3f}s {figure_time:>9.3f}s {json_time:>9.3f}s {len(candles['data'][0]['x']):>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Checks indicators.py against plain pandas formulas (cold start and bar-by-bar
+updates, with a few missing closes), then compares the cost of one new bar:
+full rolling recompute vs the incremental engine.
+
+    python benchmarks/bench_indicators.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indicators import IndicatorEngine  # noqa: E402
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+def synthetic_bars(n, seed=0, gaps=True):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, n))
+    if gaps:
+        close[rng.choice(n, size=max(1, n // 500), replace=False)] = np.nan
+    return pd.DataFrame({
+        'Date': pd.date_range('2000-01-03', periods=n, freq='D'),
+        'Open': close,
+        'High': close * 1.01,
+        'Low': close * 0.99,
+        'Close': close,
+    })
+
+
+def reference(df):
+    """
+    The same indicators written directly with pandas.
+    """
+    close, high, low = df['Close'], df['High'], df['Low']
+    prev = close.ffill().shift(1)
+    out = pd.DataFrame(index=df.index)
+    for window in (20, 50, 200):
+        out[f'SMA{window}'] = close.rolling(window).mean()
+    for span in (20, 50):
+        out[f'EMA{span}'] = close.ewm(span=span, adjust=False, ignore_na=True, min_periods=span).mean()
+    mean, std = close.rolling(20).mean(), close.rolling(20).std(ddof=0)
+    out['BB_UPPER'], out['BB_LOWER'] = mean + 2 * std, mean - 2 * std
+
+    delta = close - prev
+    wilder = dict(alpha=1 / 14, adjust=False, ignore_na=True, min_periods=14)
+    gain = delta.clip(lower=0).ewm(**wilder).mean()
+    loss = (-delta).clip(lower=0).ewm(**wilder).mean()
+    rsi = 100 - 100 / (1 + gain / loss)
+    out['RSI14'] = rsi.where(loss != 0, 100.0).where(gain.notna() & loss.notna())
+
+    tr = pd.concat([high - low, (high - prev).abs(), (low - prev).abs()], axis=1).max(axis=1)
+    tr[close.isna()] = np.nan
+    out['ATR14'] = tr.ewm(**wilder).mean()
+    out['VOL20'] = np.log(close / prev).rolling(20).std(ddof=1)
+    return out
+
+
+def check(df):
+    expected = reference(df)
+    cold = IndicatorEngine().apply('cold', df.copy())
+    engine = IndicatorEngine()
+    for end in range(len(df) // 2, len(df) + 1, 7):
+        incremental = engine.apply('warm', df.iloc[:end].copy())
+    assert engine.cold_starts == 1, engine.cold_starts
+    for column in expected.columns:
+        want = expected[column].to_numpy()
+        np.testing.assert_allclose(cold[column].to_numpy(), want, rtol=1e-9, atol=1e-9, err_msg=column)
+        np.testing.assert_allclose(incremental[column].to_numpy(), want[:len(incremental)],
+                                   rtol=1e-9, atol=1e-9, err_msg=column)
+
+
+def main():
+    check(synthetic_bars(3_000))
+    check(synthetic_bars(500, seed=1, gaps=False))
+    print("indicators match pandas")
+
+    print(f"{'bars':>8} {'rolling recompute':>18} {'incremental':>12} {'cold start':>11}")
+    for n in SIZES:
+        df = synthetic_bars(n, gaps=False)
+        start = time.perf_counter()
+        reference(df)
+        full_time = time.perf_counter() - start
+
+        engine = IndicatorEngine()
+        start = time.perf_counter()
+        engine.apply('bench', df.iloc[:-1].copy())
+        cold_time = time.perf_counter() - start
+        start = time.perf_counter()
+        engine.apply('bench', df.copy())
+        step_time = time.perf_counter() - start
+        print(f"{n:>8} {full_time:>17.4f}s {step_time:>11.4f}s {cold_time:>10.4f}s")
+
+
+if __name__ == '__main__':
+    main()
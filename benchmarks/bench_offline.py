@@ -0,0 +1,245 @@
+"""
+End-to-end timings with no network, through the replay harness in
+replay.py: fetch_finviz_data(), fetch_historical_data(),
+update_main_table(), update_detail_page() and log_data_for_tickers() at
+several universe sizes, after the app import and first paint of the main
+page. The Dash callbacks are called through the app's
+/_dash-update-component endpoint, so JSON serialization is included.
+
+By default every response is synthetic (a Finviz export with N rows,
+generated quote pages and random-walk OHLCV bars). With --fixtures the
+recorded responses in that directory are replayed instead; record them
+with STOCK_REPLAY=record STOCK_FIXTURES=DIR while running the apps or
+MAIN.py. --latency adds that many seconds to every replayed call.
+
+    python benchmarks/bench_offline.py [--sizes 50,200,1000] [--latency 0.02] [--fixtures DIR]
+"""
+import argparse
+import contextlib
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# The stores read their directories at import; keep this run's data apart.
+WORK_DIR = tempfile.mkdtemp(prefix='stock-bench-')
+for var, name in (('OHLCV_STORE_DIR', 'ohlcv'), ('STOCK_CACHE_DIR', 'cache'), ('POLL_STORE_DIR', 'polls'),
+                  ('STOCK_JOB_DIR', 'jobs'), ('STOCK_LOCK_DIR', 'locks')):
+    os.environ[var] = os.path.join(WORK_DIR, name)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ohlcv_store import period_offset  # noqa: E402
+from replay import Replayer  # noqa: E402
+from bench_quote_parse import synthetic_page  # noqa: E402
+from bench_snapshot_memory import synthetic_export  # noqa: E402
+
+SIZES = [50, 200, 1000]
+# Quote pages are fetched one per ticker, so MAIN.py is polled for at most
+# this many.
+MAX_POLLED = 200
+REPEAT = 3
+BAR_FREQ = {'1m': 'min', '60m': 'h', '1d': 'B', '1wk': 'W-MON', '1mo': 'MS'}
+
+universe = {'size': SIZES[0]}
+
+
+def synthetic_bars(symbols, interval, period=None, start=None, seed=0):
+    """
+    Random-walk OHLCV for every symbol as a (field, ticker) frame.
+    Intraday bars cover regular US sessions only.
+    """
+    now = pd.Timestamp.now(tz='America/New_York')
+    if start is not None:
+        first = pd.Timestamp(start)
+        first = first.tz_localize(now.tz) if first.tz is None else first.tz_convert(now.tz)
+    else:
+        first = now - (period_offset(period) or pd.DateOffset(years=10))
+    index = pd.date_range(first.floor('D'), now, freq=BAR_FREQ.get(interval, 'B'))
+    if interval in ('1m', '60m'):
+        minutes = index.hour * 60 + index.minute
+        index = index[(index.dayofweek < 5) & (minutes >= 570) & (minutes < 960)]
+    else:
+        index = index.tz_localize(None).normalize()
+
+    rng = np.random.default_rng(seed)
+    shape = (len(index), len(symbols))
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, shape), axis=0))
+    open_ = np.vstack([close[:1], close[:-1]])
+    fields = {
+        'Open': open_,
+        'High': np.maximum(open_, close) * 1.005,
+        'Low': np.minimum(open_, close) * 0.995,
+        'Close': close,
+        'Volume': rng.integers(1_000, 1_000_000, shape).astype(float),
+    }
+    columns = pd.MultiIndex.from_product([list(fields), symbols])
+    df = pd.DataFrame(np.hstack(list(fields.values())), index=index, columns=columns)
+    df.index.name = 'Date'
+    return df
+
+
+def yfinance_source(kind, symbols, interval, period, start):
+    if kind == 'info':
+        return {'marketCap': 1e9, 'trailingPE': 21.5, 'beta': 1.1, 'regularMarketVolume': 1e6}
+    df = synthetic_bars(symbols, interval, period, start)
+    if kind == 'history':
+        df = df.xs(symbols[0], axis=1, level=1)
+        if df.index.tz is None:
+            df.index = df.index.tz_localize('America/New_York')
+    return df
+
+
+def synthetic_replayer(latency):
+    page = synthetic_page()
+    replayer = Replayer(fixture_dir=os.path.join(WORK_DIR, 'fixtures'), latency=latency)
+    replayer.route(r'finviz\.com/export\.ashx', lambda method, url: synthetic_export(universe['size']))
+    replayer.route(r'finviz\.com/quote\.ashx', lambda method, url: page)
+    replayer.yfinance_source = yfinance_source
+    return replayer
+
+
+def dash_call(app, output, values):
+    """
+    Runs the callback whose outputs start with `output` the way the browser
+    does. `values` maps 'id.property' to the input/state values; the first
+    one counts as the input that changed. Background callbacks are polled
+    until their job has finished.
+    """
+    key = next(k for k in app.callback_map if k == output or k.startswith(f"..{output}"))
+    spec = app.callback_map[key]
+    outputs = [dict(zip(('id', 'property'), part.rsplit('.', 1))) for part in key.strip('.').split('...')]
+    if not key.startswith('..'):
+        outputs = outputs[0]  # a single output is sent on its own
+    payload = {
+        'output': key,
+        'outputs': outputs,
+        'inputs': [{**i, 'value': values.get(f"{i['id']}.{i['property']}")} for i in spec['inputs']],
+        'state': [{**s, 'value': values.get(f"{s['id']}.{s['property']}")} for s in spec['state']],
+        'changedPropIds': list(values)[:1],
+    }
+    client = app.server.test_client()
+    response = client.post('/_dash-update-component', json=payload)
+    assert response.status_code == 200, f"{output}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}"
+    body = response.get_json()
+    if 'cacheKey' not in body:
+        return body
+    poll = f"/_dash-update-component?cacheKey={body['cacheKey']}&job={body['job']}"
+    while True:
+        response = client.post(poll, json=payload)
+        if response.status_code == 200 and 'response' in response.get_json():
+            return response.get_json()
+        time.sleep(0.005)
+
+
+def timed(func, repeat=REPEAT):
+    """
+    Median seconds per call. Output of the code under test is discarded.
+    """
+    times = []
+    for _ in range(repeat):
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def main_table_inputs(**overrides):
+    values = {
+        'refresh-button.n_clicks': 0, 'live-requery.data': 0,
+        'sort-by-dropdown.value': 'Ticker', 'sort-order.value': 'asc',
+        'main-table.page_current': 0, 'main-table.page_size': 10, 'main-table.sort_by': [],
+        'main-table.filter_query': '', 'search-input.value': None, 'screen-input.value': None,
+    }
+    changed = next(iter(overrides), None)
+    values.update(overrides)
+    if changed is not None:
+        values = {changed: values.pop(changed), **values}
+    return values
+
+
+def bench_size(size, app_module, MAIN):
+    results = {}
+    universe['size'] = size
+
+    results['finviz export fetch + parse'] = timed(lambda: app_module.finviz_snapshot.refresh(force=True))
+    results['fetch_finviz_data()'] = timed(app_module.fetch_finviz_data)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        screen = app_module.current_screen()
+        results['current_screen() rebuild'] = time.perf_counter() - start
+    tickers = screen.df['Ticker'].astype(str).tolist()
+
+    app = app_module.app
+    results['update_main_table: page'] = timed(
+        lambda: dash_call(app, 'main-table.data', main_table_inputs(**{'main-table.page_current': 3})))
+    results['update_main_table: sort'] = timed(
+        lambda: dash_call(app, 'main-table.data', main_table_inputs(
+            **{'main-table.sort_by': [{'column_id': 'Market Cap', 'direction': 'desc'}]})))
+    results['update_main_table: screen'] = timed(
+        lambda: dash_call(app, 'main-table.data', main_table_inputs(
+            **{'screen-input.value': 'P/E < 20 and zscore(ROE by Sector) > 1'})))
+
+    # Symbols never fetched before, so nothing is on disk or memoized yet.
+    cold = (f"COLD{size}X{i}" for i in itertools.count())
+    for timeframe in ('1d', '1m', '1y'):
+        results[f"fetch_historical_data({timeframe}) cold"] = timed(
+            lambda: app_module.fetch_historical_data(next(cold), timeframe))
+        results[f"update_detail_page({timeframe})"] = timed(lambda: dash_call(app, 'candlestick-chart.figure', {
+            'timeframe-dropdown.value': timeframe, 'sma-options.value': ['SMA20', 'SMA50'],
+            'url.pathname': f"/ticker/{tickers[0]}", 'candlestick-chart.relayoutData': None}))
+
+    polled = tickers[:MAX_POLLED]
+    results[f"log_data_for_tickers ({len(polled)} tickers)"] = timed(lambda: MAIN.log_data_for_tickers(polled), 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)))
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--fixtures', help='replay recorded fixtures from this directory')
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',')]
+
+    if args.fixtures:
+        replayer = Replayer(fixture_dir=args.fixtures, latency=args.latency)
+        sizes = sizes[:1]  # the recorded universe is what it is
+    else:
+        replayer = synthetic_replayer(args.latency)
+    universe['size'] = sizes[0]
+    replayer.install()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        import app_custom_change
+        import MAIN
+        imported = time.perf_counter() - start
+        # The main page as first painted, before any snapshot is loaded.
+        start = time.perf_counter()
+        dash_call(app_custom_change.app, 'page-content.children', {'url.pathname': '/'})
+        painted = time.perf_counter() - start
+
+    print(f"data in {WORK_DIR}, latency {args.latency * 1000:.0f}ms per call, "
+          f"app import {imported:.2f}s ({replayer.calls['route'] + replayer.calls['hit']} calls), "
+          f"first paint {painted * 1000:.0f}ms")
+    table = {size: bench_size(size, app_custom_change, MAIN) for size in sizes}
+    names = list(dict.fromkeys(name.split(' (')[0] if name.startswith('log_') else name
+                                for results in table.values() for name in results))
+    print(f"\n{'':>36}" + ''.join(f"{size:>10}" for size in sizes))
+    for name in names:
+        row = []
+        for size in sizes:
+            value = next((v for k, v in table[size].items() if k == name or k.startswith(name + ' (')), None)
+            row.append(f"{value * 1000:>8.1f}ms" if value is not None else f"{'-':>10}")
+        print(f"{name:>36}" + ''.join(row))
+    print(f"\nreplayed calls: {replayer.calls}")
+
+
+if __name__ == '__main__':
+    main()
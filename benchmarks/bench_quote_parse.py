@@ -0,0 +1,134 @@
+"""
+Parse time per Finviz quote page: the old path (finvizfinance's
+BeautifulSoup parse for ticker_fundament() plus a second html.parser soup
+in get_data_manual()) against the single lxml pass in quote_page.py. Also
+checks that both produce the same fundamentals.
+
+Pages are the *.html files in benchmarks/fixtures/ (save real quote pages
+there, e.g. curl -A Mozilla/5.0 'https://finviz.com/quote.ashx?t=AAPL'),
+plus a synthetic page with the same structure.
+
+    python benchmarks/bench_quote_parse.py [page.html ...]
+"""
+import glob
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+from finvizfinance.quote import finvizfinance
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quote_page import QuotePageParser, parse_quote_page  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+REPEAT = 20
+LABELS = [
+    'Index', 'P/E', 'EPS (ttm)', 'Insider Own', 'Shs Outstand', 'Perf Week',
+    'Market Cap', 'Forward P/E', 'EPS next Y', 'Insider Trans', 'Shs Float', 'Perf Month',
+    'Income', 'PEG', 'EPS next Q', 'Inst Own', 'Short Float', 'Perf Quarter',
+    'Sales', 'P/S', 'EPS this Y', 'Inst Trans', 'Short Ratio', 'Perf Half Y',
+    'Book/sh', 'P/B', 'EPS next Y', 'ROA', 'Target Price', 'Perf Year',
+    'Cash/sh', 'P/C', 'EPS next 5Y', 'ROE', '52W Range', 'Perf YTD',
+    'Dividend', 'P/FCF', 'EPS past 5Y', 'ROI', '52W High', 'Beta',
+    'Employees', 'Quick Ratio', 'Sales past 5Y', 'Gross Margin', '52W Low', 'ATR',
+    'Optionable', 'Current Ratio', 'Sales Q/Q', 'Oper. Margin', 'RSI (14)', 'Volatility',
+    'Shortable', 'Debt/Eq', 'EPS Q/Q', 'Profit Margin', 'Rel Volume', 'Prev Close',
+    'Recom', 'LT Debt/Eq', 'Earnings', 'Payout', 'Avg Volume', 'Price',
+    'SMA20', 'SMA50', 'SMA200', 'Volume', 'Change', 'Employees 2',
+]
+
+
+def synthetic_page(news_rows=400, insider_rows=200):
+    """
+    A page shaped like a Finviz quote: header, classification links, the
+    snapshot table, then long news and insider tables after it.
+    """
+    cells = []
+    for i, label in enumerate(LABELS):
+        value = {'52W Range': '164.08 - 237.23', 'Volatility': '1.43% 1.60%'}.get(label, f"{i * 1.7:.2f}%")
+        cells.append(f'<td class="snapshot-td2 cursor-pointer w-[7%]" align="left">{label}</td>'
+                     f'<td class="snapshot-td2 w-[8%]" align="left"><b><span>{value}</span></b></td>')
+    rows = ''.join(f'<tr class="table-dark-row">{"".join(cells[i:i + 6])}</tr>' for i in range(0, len(cells), 6))
+    news = ''.join(f'<tr><td width="130" align="right">Oct-{i % 28 + 1:02d}-26 09:{i % 60:02d}AM</td>'
+                   f'<td align="left"><div class="news-link-container"><a class="tab-link-news" '
+                   f'href="https://example.com/news/{i}">Headline number {i} about the company</a>'
+                   f'<span style="color:#aa6dc0">(Source {i % 9})</span></div></td></tr>' for i in range(news_rows))
+    insiders = ''.join(f'<tr><td>Insider {i}</td><td>Officer</td><td>Oct {i % 28 + 1}</td><td>Sale</td>'
+                       f'<td>{100 + i}.00</td><td>{1000 * i}</td><td>{100000 * i}</td></tr>' for i in range(insider_rows))
+    return f"""<!DOCTYPE html><html><head><title>AAPL Stock Price</title>
+<script>{'var x = 1;' * 2000}</script></head><body>
+<div class="header">{'<a href="/x">menu</a>' * 100}</div>
+<h2 class="quote-header_ticker-wrapper_company"><a href="https://www.apple.com">Apple Inc</a></h2>
+<div class="quote-links"><div class="flex">
+<a href="screener.ashx?v=111&f=sec_technology">Technology</a>
+<a href="screener.ashx?v=111&f=ind_consumerelectronics">Consumer Electronics</a>
+<a href="screener.ashx?v=111&f=geo_usa">USA</a>
+<a href="screener.ashx?v=111&f=exch_nasd">NASD</a></div></div>
+<div class="screener_snapshot-table-wrapper"><table width="100%" class="js-snapshot-table snapshot-table2 screener_snapshot-table-body">
+{rows}</table></div>
+<table class="fullview-news-outer news-table">{news}</table>
+<table class="body-table styled-table-new is-rounded">{insiders}</table>
+</body></html>"""
+
+
+def finvizfinance_fundament(html):
+    # finvizfinance without its own download, on the same page.
+    quote = finvizfinance.__new__(finvizfinance)
+    quote.ticker, quote.quote_url, quote.info = 'TEST', 'fixture', {}
+    quote.soup = BeautifulSoup(html, 'lxml')
+    return quote.ticker_fundament()
+
+
+def legacy_manual(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    data = {}
+    table = soup.find_all('table', class_='snapshot-table2')
+    if table:
+        for row in table[0].find_all('tr'):
+            cols = row.find_all('td')
+            if len(cols) == 2:
+                data[cols[0].text.strip()] = cols[1].text.strip()
+    return data
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        func(*args)
+    return (time.perf_counter() - start) / REPEAT
+
+
+def main(paths):
+    pages = [('synthetic', synthetic_page())]
+    for path in paths or sorted(glob.glob(os.path.join(FIXTURES, '*.html'))):
+        with open(path, 'rb') as f:
+            pages.append((os.path.basename(path), f.read().decode('utf-8', errors='replace')))
+
+    print(f"{'page':>20} {'KB':>6} {'old (2 soups)':>14} {'lxml single':>12} {'stopped at':>11}")
+    for name, html in pages:
+        fundament, _ = parse_quote_page(html)
+        assert fundament == finvizfinance_fundament(html), f"{name}: fundamentals differ from finvizfinance"
+
+        data = html.encode('utf-8')
+        old = timed(lambda: (finvizfinance_fundament(html), legacy_manual(html)))
+        new = timed(parse_quote_page, data)
+        position = streamed_bytes(data)
+        print(f"{name:>20} {len(data) / 1024:>6.0f} {old * 1000:>12.1f}ms {new * 1000:>10.1f}ms "
+              f"{position / len(data):>10.0%}")
+
+
+def streamed_bytes(data, chunk_size=16 * 1024):
+    """
+    How much of the page the streaming parser reads before it stops.
+    """
+    parser = QuotePageParser()
+    for start in range(0, len(data), chunk_size):
+        if parser.feed(data[start:start + chunk_size]):
+            return start + chunk_size
+    return len(data)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,111 @@
+"""
+Concurrent cold fetches with and without single-flight coalescing
+(singleflight.py), through the replay harness with a fixed latency per
+upstream call: N threads asking for the same history, N threads asking
+for the same Finviz refresh, and N worker processes asking for the same
+history. Reports wall time and how many calls reached "the network".
+
+    python benchmarks/bench_singleflight.py [--callers 8] [--latency 0.2]
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+WORK_DIR = tempfile.mkdtemp(prefix='stock-flight-')
+for var, name in (('OHLCV_STORE_DIR', 'ohlcv'), ('STOCK_CACHE_DIR', 'cache'), ('STOCK_LOCK_DIR', 'locks')):
+    os.environ[var] = os.path.join(WORK_DIR, name)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from finviz_snapshot import SnapshotRefresher  # noqa: E402
+from ohlcv_store import OHLCVStore  # noqa: E402
+from bench_offline import synthetic_replayer  # noqa: E402
+
+
+def run_threads(callers, func):
+    barrier = threading.Barrier(callers)
+
+    def call():
+        barrier.wait()
+        func()
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+
+def uncoalesced(obj, method):
+    # The same work with the flight bypassed, as before single-flight.
+    return lambda *args: getattr(obj, method)(*args, time.time())
+
+
+def worker(ticker, latency, barrier, calls):
+    sys.stdout = open(os.devnull, 'w')
+    replayer = synthetic_replayer(latency).install()
+    barrier.wait()
+    OHLCVStore().history(ticker, '1y', '1d')
+    with calls.get_lock():
+        calls.value += replayer.calls['route']
+
+
+def run_processes(callers, ticker, latency):
+    ctx = multiprocessing.get_context('fork')
+    barrier = ctx.Barrier(callers)
+    calls = ctx.Value('i', 0)
+    processes = [ctx.Process(target=worker, args=(ticker, latency, barrier, calls)) for _ in range(callers)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return time.perf_counter() - start, calls.value
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--callers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.2)
+    args = parser.parse_args()
+    n = args.callers
+
+    print(f"{n} concurrent callers, {args.latency * 1000:.0f}ms per upstream call\n")
+    print(f"{'':>28}{'wall':>10}{'upstream':>10}")
+
+    def report(name, seconds, calls):
+        print(f"{name:>28}{seconds * 1000:>8.0f}ms{calls:>10}")
+
+    with contextlib.redirect_stdout(None):
+        replayer = synthetic_replayer(args.latency).install()
+    store = OHLCVStore()
+    for label, func in (('history, no coalescing', uncoalesced(store, '_history')),
+                        ('history, single-flight', store.history)):
+        ticker = f"T{label[-3:].upper()}"
+        before = replayer.calls['route']
+        seconds = run_threads(n, lambda: func(ticker, '1y', '1d'))
+        report(label, seconds, replayer.calls['route'] - before)
+
+    snapshot = SnapshotRefresher('https://finviz.com/export.ashx?v=111')
+    for label, func in (('finviz, no coalescing', uncoalesced(snapshot, '_download')),
+                        ('finviz, single-flight', lambda: snapshot.refresh(force=True))):
+        before = replayer.calls['route']
+        seconds = run_threads(n, func)
+        report(label, seconds, replayer.calls['route'] - before)
+    replayer.uninstall()
+
+    seconds, calls = run_processes(n, 'PROCS', args.latency)
+    report(f"history, {n} processes", seconds, calls)
+    print(f"\ndata in {WORK_DIR}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Memory of a parsed Finviz snapshot: the old bare read_csv + per-column
+to_numeric against the schema-driven parser in finviz_snapshot.py, on a
+synthetic export shaped like the real one. Then peak memory and time to
+first rows for parsing the whole response text vs streaming it in chunks.
+
+    python benchmarks/bench_snapshot_memory.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+from io import BytesIO, StringIO
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from finviz_snapshot import NUMERIC_COLUMNS, memory_report, parse_finviz_export, parse_finviz_stream  # noqa: E402
+
+ROWS = 10_000
+STREAM_ROWS = 100_000
+SECTORS = ['Technology', 'Healthcare', 'Financial', 'Energy', 'Utilities', 'Industrials',
+           'Consumer Cyclical', 'Consumer Defensive', 'Basic Materials', 'Real Estate',
+           'Communication Services']
+
+
+def synthetic_export(rows=ROWS, seed=0):
+    rng = np.random.default_rng(seed)
+    pct = lambda scale: [f"{v:.2f}%" for v in rng.normal(0, scale, rows)]  # noqa: E731
+    df = pd.DataFrame({
+        'No.': np.arange(1, rows + 1),
+        'Ticker': [f"T{i:05d}" for i in range(rows)],
+        'Company': [f"Company {i} Holdings Inc." for i in range(rows)],
+        'Sector': rng.choice(SECTORS, rows),
+        'Industry': [f"Industry {i}" for i in rng.integers(0, 150, rows)],
+        'Country': rng.choice(['USA', 'Canada', 'China', 'United Kingdom', 'Israel'], rows),
+        'Market Cap': [f"{v:.2f}" for v in rng.lognormal(7, 2, rows)],
+        'P/E': np.where(rng.random(rows) < 0.3, '-', np.round(rng.lognormal(3, 0.5, rows), 2).astype(str)),
+        'Forward P/E': np.round(rng.lognormal(3, 0.5, rows), 2),
+        'EPS (ttm)': np.round(rng.normal(2, 3, rows), 2),
+        'EPS Growth': pct(20),
+        'ROE': pct(15),
+        'Operating Margin': pct(10),
+        'Debt/Equity': np.round(rng.lognormal(0, 1, rows), 2),
+        'Beta': np.round(rng.normal(1, 0.4, rows), 2),
+        'Price': np.round(rng.lognormal(3, 1, rows), 2),
+        'Change': pct(2),
+        'Volume': rng.integers(1_000, 50_000_000, rows),
+    })
+    return df.to_csv(index=False)
+
+
+def legacy_parse(text):
+    df = pd.read_csv(StringIO(text))
+    if 'Change' in df.columns:
+        df['Change'] = pd.to_numeric(df['Change'].replace('%', '', regex=True), errors='coerce')
+        if df['Change'].max() < 1:
+            df['Change'] = df['Change'] * 100
+        df['Change'] = df['Change'].round(2)
+    for col in NUMERIC_COLUMNS[:17]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+class SocketLike(BytesIO):
+    """
+    Hands out the body in network-sized reads, like response.raw.
+    """
+
+    def read(self, size=-1):
+        return super().read(min(size, 65536) if size and size > 0 else 65536)
+
+
+def whole_text(body):
+    # What the old loader did: response.text, then a StringIO copy of it.
+    text = body.decode('utf-8')
+    return parse_finviz_export(text)
+
+
+def streamed(body):
+    return parse_finviz_stream(SocketLike(body), on_partial=lambda df: first_rows.setdefault('t', time.perf_counter()))
+
+
+first_rows = {}
+
+
+def main():
+    text = synthetic_export()
+    for name, parse in (('legacy', legacy_parse), ('schema', parse_finviz_export)):
+        start = time.perf_counter()
+        df = parse(text)
+        elapsed = time.perf_counter() - start
+        report = memory_report(df)
+        parsed = int(df[['P/E', 'ROE', 'EPS Growth', 'Operating Margin']].notna().sum().sum())
+        print(f"{name:>7}: {report['bytes'] / 1e6:6.2f} MB, {elapsed:.3f}s, {parsed} numeric cells parsed")
+        for col, size in list(report['columns'].items())[:5]:
+            print(f"           {col:<18} {size / 1e3:8.1f} kB")
+
+    body = synthetic_export(STREAM_ROWS).encode('utf-8')
+    print(f"\n{STREAM_ROWS} rows, {len(body) / 1e6:.1f} MB export")
+    for name, parse in (('whole text', whole_text), ('streamed', streamed)):
+        first_rows.clear()
+        start = time.perf_counter()
+        parse(body)
+        elapsed = time.perf_counter() - start
+        first = first_rows.get('t', start + elapsed) - start
+        # Tracing slows allocation down a lot, so memory is measured in a
+        # separate run.
+        tracemalloc.start()
+        parse(body)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name:>10}: peak {peak / 1e6:6.1f} MB, first rows after {first:.3f}s, done in {elapsed:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
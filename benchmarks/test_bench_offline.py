@@ -0,0 +1,83 @@
+"""
+The offline benchmarks of bench_offline.py as a pytest-benchmark suite,
+so runs can be saved and compared (--benchmark-autosave,
+--benchmark-compare). Same replay harness and synthetic data, at one
+universe size (STOCK_BENCH_SIZE, default 200).
+
+    pytest benchmarks/test_bench_offline.py [--benchmark-compare]
+
+A plain `pytest` runs only tests/ (see pytest.ini); this file is collected
+only when named.
+"""
+import itertools
+import os
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+# Importing bench_offline points the stores at a temporary directory.
+from bench_offline import MAX_POLLED, dash_call, main_table_inputs, synthetic_replayer, universe  # noqa: E402
+
+SIZE = int(os.environ.get('STOCK_BENCH_SIZE', 200))
+TIMEFRAMES = ['1d', '1m', '1y']
+
+
+@pytest.fixture(scope='module')
+def replayer():
+    universe['size'] = SIZE
+    replayer = synthetic_replayer(0.0).install()
+    yield replayer
+    replayer.uninstall()
+
+
+@pytest.fixture(scope='module')
+def app_module(replayer):
+    import app_custom_change
+    return app_custom_change
+
+
+@pytest.fixture(scope='module')
+def tickers(app_module):
+    app_module.finviz_snapshot.refresh(force=True)
+    return app_module.current_screen().df['Ticker'].astype(str).tolist()
+
+
+def test_first_paint(benchmark, app_module):
+    benchmark(dash_call, app_module.app, 'page-content.children', {'url.pathname': '/'})
+
+
+def test_finviz_refresh(benchmark, app_module):
+    benchmark(app_module.finviz_snapshot.refresh, force=True)
+
+
+def test_fetch_finviz_data(benchmark, app_module, tickers):
+    benchmark(app_module.fetch_finviz_data)
+
+
+@pytest.mark.parametrize('change', [
+    {'main-table.page_current': 3},
+    {'main-table.sort_by': [{'column_id': 'Market Cap', 'direction': 'desc'}]},
+    {'screen-input.value': 'P/E < 20 and zscore(ROE by Sector) > 1'},
+], ids=['page', 'sort', 'screen'])
+def test_update_main_table(benchmark, app_module, tickers, change):
+    benchmark(dash_call, app_module.app, 'main-table.data', main_table_inputs(**change))
+
+
+@pytest.mark.parametrize('timeframe', TIMEFRAMES)
+def test_fetch_historical_data_cold(benchmark, app_module, timeframe):
+    # Symbols never fetched before, so nothing is on disk or memoized yet.
+    cold = (f"COLD{timeframe}X{i}" for i in itertools.count())
+    benchmark.pedantic(lambda: app_module.fetch_historical_data(next(cold), timeframe), rounds=5)
+
+
+@pytest.mark.parametrize('timeframe', TIMEFRAMES)
+def test_update_detail_page(benchmark, app_module, tickers, timeframe):
+    benchmark(dash_call, app_module.app, 'candlestick-chart.figure', {
+        'timeframe-dropdown.value': timeframe, 'sma-options.value': ['SMA20', 'SMA50'],
+        'url.pathname': f"/ticker/{tickers[0]}", 'candlestick-chart.relayoutData': None})
+
+
+def test_log_data_for_tickers(benchmark, app_module, tickers):
+    import MAIN
+    benchmark.pedantic(MAIN.log_data_for_tickers, args=(tickers[:MAX_POLLED],), rounds=1)
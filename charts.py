@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+from downsample import MAX_POINTS, ohlc_buckets, lttb_series
+from metrics import timed_stage
+
+# go.Figure() applies the default template; keep the same look for the
+# plain-dict figures below.
+TEMPLATE = pio.templates[pio.templates.default].to_plotly_json()
+
+# Checklist values that draw more than one line.
+OVERLAY_COLUMNS = {'BB': ['BB_UPPER', 'BB_LOWER']}
+
+
+def _fmt(values, spec='%.2f'):
+    return pd.Series(np.char.mod(spec, np.asarray(values, dtype=float)), dtype=object)
+
+
+def _wall_clock(dates):
+    """
+    ISO wall-clock strings ('2024-01-02T09:30:00') for a date column, which is
+    what Plotly shows on a date axis whether or not the dates carry a zone.
+    Returns the strings and the tz-aware series (or None for naive dates).
+    """
+    dates = pd.Series(pd.to_datetime(dates)).reset_index(drop=True)
+    aware = dates if dates.dt.tz is not None else None
+    local = dates.dt.tz_localize(None) if aware is not None else dates
+    return np.datetime_as_string(local.to_numpy(), unit='s'), aware
+
+
+def _date_labels(dates):
+    """
+    Same text as str(Timestamp) for every bar, without formatting each
+    timestamp in Python: the wall-clock part comes from a naive datetime
+    array, and the UTC offset is formatted once per distinct offset.
+    """
+    wall_clock, aware = _wall_clock(dates)
+    labels = pd.Series(wall_clock, dtype=object).str.replace('T', ' ', regex=False)
+    if aware is None:
+        return labels
+    local = aware.dt.tz_localize(None)
+    offsets = ((local - aware.dt.tz_convert('UTC').dt.tz_localize(None)) // pd.Timedelta(minutes=1)).astype(int)
+    suffix = {m: f"{'+' if m >= 0 else '-'}{abs(m) // 60:02d}:{abs(m) % 60:02d}" for m in offsets.unique()}
+    return labels + offsets.map(suffix)
+
+
+def candle_hover_text(df):
+    """
+    Hover label for every candle, built column by column instead of one
+    f-string per row.
+    """
+    change = (df['Close'] - df['Open']) / df['Open'] * 100
+    text = (
+        "Date: " + _date_labels(df['Date'])
+        + "<br>Open: " + _fmt(df['Open'])
+        + "<br>High: " + _fmt(df['High'])
+        + "<br>Low: " + _fmt(df['Low'])
+        + "<br>Close: " + _fmt(df['Close'])
+        # Summed by downsampling into floats; shown as whole shares.
+        + "<br>Volume: " + _fmt(df['Volume'], '%.0f')
+        + "<br>Change: " + _fmt(change) + "%"
+    )
+    return text.to_numpy()
+
+
+def visible_range(relayout_data):
+    """
+    (start, end) of a zoomed x-axis from a Graph's relayoutData, or None
+    when the chart shows everything.
+    """
+    if not relayout_data:
+        return None
+    if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        return relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']
+    if 'xaxis.range' in relayout_data:
+        return tuple(relayout_data['xaxis.range'][:2])
+    return None
+
+
+def slice_to_range(df, x_range):
+    """
+    Bars whose wall-clock Date falls inside `x_range` (as reported by Plotly).
+    """
+    start, end = pd.Timestamp(x_range[0]), pd.Timestamp(x_range[1])
+    dates = pd.to_datetime(df['Date'])
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    return df[(dates >= start) & (dates <= end)]
+
+
+@timed_stage('figure_build')
+def build_detail_figures(historical_data, sma_options, max_points=MAX_POINTS, x_range=None):
+    """
+    Candlestick (with SMA/EMA/Bollinger overlays and an overall-change annotation) and
+    volume figures for the detail page. The figures are plain dicts of NumPy
+    arrays: Dash serializes them directly, skipping the per-trace validation
+    and deep copies of go.Figure, which dominate for long series.
+
+    Series longer than `max_points` are downsampled: candles and volume by
+    OHLC bucket aggregation, SMA lines with LTTB. `x_range` keeps a zoomed
+    axis in place when only the visible bars are passed in.
+    """
+    if historical_data.empty:
+        return {'data': [], 'layout': {'template': TEMPLATE}}, {'data': [], 'layout': {'template': TEMPLATE}}
+
+    bars = ohlc_buckets(historical_data, max_points)
+    x, _ = _wall_clock(bars['Date'])
+    candles = {
+        'type': 'candlestick',
+        'x': x,
+        'open': bars['Open'].to_numpy(),
+        'high': bars['High'].to_numpy(),
+        'low': bars['Low'].to_numpy(),
+        'close': bars['Close'].to_numpy(),
+        'name': 'Candlestick',
+        'text': candle_hover_text(bars),
+        'hoverinfo': 'text',
+    }
+    traces = [candles]
+    for option in sma_options or []:
+        for column in OVERLAY_COLUMNS.get(option, [option]):
+            if column not in historical_data.columns:
+                continue
+            line_dates, line_values = lttb_series(historical_data['Date'], historical_data[column], max_points)
+            traces.append({
+                'type': 'scatter',
+                'x': _wall_clock(line_dates)[0],
+                'y': line_values,
+                'mode': 'lines',
+                'name': column,
+            })
+
+    layout = {'template': TEMPLATE}
+    if x_range is not None:
+        layout['xaxis'] = {'range': list(x_range)}
+    if len(historical_data) > 1:
+        overall_change = ((historical_data['Close'].iloc[-1] - historical_data['Open'].iloc[0]) /
+                          historical_data['Open'].iloc[0]) * 100
+        layout['annotations'] = [{
+            'x': x[-1],
+            'y': float(historical_data['High'].max()),
+            'text': f"Overall Change: {overall_change:.2f}%",
+            'showarrow': True,
+            'arrowhead': 2,
+            'ax': 0,
+            'ay': -40,
+        }]
+
+    candlestick_chart = {'data': traces, 'layout': layout}
+    volume_chart = {'data': [{
+        'type': 'bar',
+        'x': x,
+        'y': bars['Volume'].to_numpy(),
+        'name': 'Volume',
+    }], 'layout': {'template': TEMPLATE}}
+    return candlestick_chart, volume_chart
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+# Points per trace sent to the browser; a chart is rarely wider than this in pixels.
+MAX_POINTS = 2000
+
+
+def bucket_starts(n, max_points=MAX_POINTS):
+    """
+    Start offsets of equal-width buckets that split `n` bars into at most
+    `max_points` groups.
+    """
+    size = int(np.ceil(n / max_points))
+    return np.arange(0, n, size)
+
+
+def ohlc_buckets(df, max_points=MAX_POINTS):
+    """
+    Aggregates consecutive bars into at most `max_points` candles while
+    preserving the price range of each bucket: first Open, max High, min Low,
+    last Close, summed Volume, and the Date of the bucket's first bar.
+    Frames already within budget are returned unchanged.
+    """
+    n = len(df)
+    if n <= max_points:
+        return df
+    starts = bucket_starts(n, max_points)
+    ends = np.append(starts[1:], n) - 1
+    out = {
+        'Date': df['Date'].to_numpy()[starts],
+        'Open': df['Open'].to_numpy()[starts],
+        'High': np.maximum.reduceat(df['High'].to_numpy(dtype=float), starts),
+        'Low': np.minimum.reduceat(df['Low'].to_numpy(dtype=float), starts),
+        'Close': df['Close'].to_numpy()[ends],
+        'Volume': np.add.reduceat(df['Volume'].to_numpy(dtype=float), starts),
+    }
+    result = pd.DataFrame(out)
+    if isinstance(df['Date'].dtype, pd.DatetimeTZDtype):
+        result['Date'] = pd.to_datetime(result['Date'], utc=True).dt.tz_convert(df['Date'].dt.tz)
+    return result
+
+
+def lttb(x, y, threshold=MAX_POINTS):
+    """
+    Largest-Triangle-Three-Buckets: returns the indices of `threshold` points
+    that keep the visual shape of the line (x, y). x must be numeric and
+    increasing; NaNs in y should be dropped beforehand.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # First and last points are always kept; the rest is split into
+    # threshold - 2 buckets.
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def lttb_series(dates, values, threshold=MAX_POINTS):
+    """
+    Applies LTTB to a line over a date axis and returns (dates, values) for
+    the kept points. Leading NaNs (e.g. an SMA warming up) are skipped.
+    """
+    dates = pd.Series(pd.to_datetime(dates)).reset_index(drop=True)
+    values = np.asarray(values, dtype=float)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) > threshold:
+        # Epoch nanoseconds; a zone-aware column is compared in UTC.
+        x = dates.iloc[valid].astype('int64').to_numpy()
+        valid = valid[lttb(x, values[valid], threshold)]
+    return dates.iloc[valid], values[valid]
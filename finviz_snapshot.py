@@ -0,0 +1,385 @@
+import hashlib
+import threading
+import time
+from io import StringIO
+
+import pandas as pd
+import requests
+
+from http_client import session
+from metrics import observe_stage, stage
+from singleflight import SingleFlight
+
+NUMERIC_COLUMNS = [
+    'Market Cap', 'P/E', 'Forward P/E', 'EPS (ttm)', 'EPS (next Y)',
+    'EPS Growth', 'Revenue', 'Operating Margin', 'ROE', 'Debt/Equity', 'Beta',
+    'Change 1m', 'Change 3m', 'Change 1d', 'Change 1w', 'Change 1h', 'Change 1mo', 'Change 1y',
+    'Change', 'Price', 'Volume', 'Avg Volume', 'Relative Volume', 'PEG', 'P/S', 'P/B',
+    'Sales', 'Income', 'Dividend', 'Dividend Yield', 'Float', 'Shares Outstanding',
+    'Insider Ownership', 'Institutional Ownership', 'Short Float', 'Gross Margin',
+    'Profit Margin', 'ROA', 'ROI', 'Perf Week', 'Perf Month', 'Perf Quarter',
+    'Perf Half', 'Perf Year', 'Perf YTD', 'Volatility (Week)', 'Volatility (Month)',
+    'RSI (14)', '52-Week High', '52-Week Low', 'Target Price', 'Current Ratio',
+    'Quick Ratio', 'LT Debt/Equity', 'Employees',
+]
+# Few distinct values repeated on every row.
+CATEGORY_COLUMNS = ['Sector', 'Industry', 'Country', 'Exchange', 'Index']
+TEXT_COLUMNS = ['Ticker', 'Company']
+# Unit of columns Finviz exports in millions. A value with a K/M/B/T suffix
+# is converted to the column's unit; a plain number is already in it.
+NUMBER_UNITS = {
+    'Market Cap': 1e6, 'Revenue': 1e6, 'Sales': 1e6, 'Income': 1e6,
+    'Float': 1e6, 'Shares Outstanding': 1e6,
+}
+SUFFIXES = {'K': 1e3, 'M': 1e6, 'B': 1e9, 'T': 1e12}
+MISSING_VALUES = ['-', '']
+# Rows parsed per chunk while streaming the export.
+CHUNK_ROWS = 2000
+
+# Refresh a bit before the old ten-minute cache timeout; retry sooner after
+# a failure, but never faster than the rate limiter allows anyway.
+REFRESH_INTERVAL = 540
+RETRY_INTERVAL = 60
+# How long the last snapshot stays in the shared cache, so a freshly started
+# worker can serve it while its own refresh runs.
+SHARED_TIMEOUT = 24 * 60 * 60
+
+
+class FinvizExportError(Exception):
+    pass
+
+
+def parse_number(values, unit=1.0, dtype='float32'):
+    """
+    Parses text such as '2.95B', '815.3M', '12.5%' or '1,234' into floats.
+    Percentages keep their percent units ('12.5%' -> 12.5); suffixed values
+    are expressed in `unit`. Anything else becomes NaN.
+    """
+    text = values.astype('str').str.strip()
+    numbers = pd.to_numeric(text, errors='coerce')
+    # Only cells that are not plain numbers go through the suffix handling.
+    todo = numbers.isna() & text.notna()
+    if todo.any():
+        rest = text[todo].str.replace(',', '', regex=False)
+        last = rest.str[-1].str.upper()
+        scale = last.map(SUFFIXES)
+        rest = rest.where(scale.isna() & (last != '%'), rest.str[:-1])
+        numbers[todo] = pd.to_numeric(rest, errors='coerce') * (scale.astype('float64').fillna(unit) / unit)
+    return numbers.astype(dtype)
+
+
+def coerce_chunk(df):
+    """
+    Applies the numeric schema to one chunk of the export. Change values
+    that come without a '%' suffix are fractions and are scaled to percent;
+    the suffix, not the size of the values, decides.
+    """
+    df.columns = df.columns.map(str)
+    fractions = None
+    if 'Change' in df.columns:
+        text = df['Change'].astype('str').str.strip()
+        fractions = (text.notna() & ~text.str.endswith('%')).to_numpy(dtype=bool)
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = parse_number(df[col], NUMBER_UNITS.get(col, 1.0))
+    if fractions is not None:
+        df['Change'] = df['Change'].where(~fractions, df['Change'] * 100).round(2)
+    return df
+
+
+def _categorize(df):
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def parse_finviz_stream(source, chunk_rows=CHUNK_ROWS, on_partial=None):
+    """
+    Parses the CSV export from a file-like object chunk by chunk, so neither
+    the raw text nor an untyped frame of the whole export is ever held.
+    Numeric columns become float32 (suffixed and percent values included),
+    sector-like columns categoricals, tickers and names strings.
+
+    `on_partial`, if given, receives the rows parsed so far each time their
+    number has doubled, for showing results while the download runs.
+    """
+    dtype = {col: 'str' for col in TEXT_COLUMNS + NUMERIC_COLUMNS + CATEGORY_COLUMNS}
+    reader = pd.read_csv(source, dtype=dtype, na_values=MISSING_VALUES, chunksize=chunk_rows)
+    chunks, rows, published = [], 0, 0
+    # Reading a chunk includes waiting on the socket when streaming.
+    read_time = coerce_time = 0.0
+    mark = time.perf_counter()
+    for chunk in reader:
+        start = time.perf_counter()
+        read_time += start - mark
+        chunk = coerce_chunk(chunk)
+        mark = time.perf_counter()
+        coerce_time += mark - start
+        chunks.append(chunk)
+        rows += len(chunk)
+        if on_partial is not None and rows >= 2 * published:
+            on_partial(_categorize(pd.concat(chunks, ignore_index=True)))
+            published = rows
+        mark = time.perf_counter()
+    observe_stage('finviz_read_parse', read_time)
+    observe_stage('finviz_coerce', coerce_time)
+    if not chunks:
+        return pd.DataFrame()
+    with stage('finviz_assemble'):
+        return _categorize(pd.concat(chunks, ignore_index=True))
+
+
+def parse_finviz_export(text):
+    """
+    Parses an export that is already in memory as text.
+    """
+    return parse_finviz_stream(StringIO(text))
+
+
+def memory_report(df):
+    """
+    Deep memory use of a snapshot frame: total bytes and bytes per column,
+    largest first.
+    """
+    usage = df.memory_usage(deep=True, index=True)
+    columns = usage.drop('Index').sort_values(ascending=False)
+    return {
+        'rows': len(df),
+        'bytes': int(usage.sum()),
+        'columns': {col: int(size) for col, size in columns.items()},
+    }
+
+
+def load_finviz_export(url, headers=None, on_partial=None):
+    """
+    Downloads and parses the Finviz CSV export, streaming the body from the
+    socket into the chunked parser. Raises FinvizExportError instead of
+    returning an error frame, so callers can keep serving the previous
+    snapshot. See parse_finviz_stream() for `on_partial`.
+    """
+    try:
+        with stage('finviz_request'):
+            response = session.get(url, headers=headers, stream=True)
+    except requests.RequestException as e:
+        raise FinvizExportError(f"Failed to fetch data: {e}") from e
+    print(f"Fetching new data from Finviz... Status: {response.status_code}")
+
+    with response:
+        if response.status_code == 429:
+            raise FinvizExportError("Rate limit exceeded. Please try again later.")
+        if response.status_code != 200:
+            raise FinvizExportError(f"Failed to fetch data. Status code: {response.status_code}")
+        # Let urllib3 undo gzip/deflate while reading.
+        response.raw.decode_content = True
+        try:
+            df = parse_finviz_stream(response.raw, on_partial=on_partial)
+        except Exception as e:
+            raise FinvizExportError(f"Failed to parse data from Finviz: {e}") from e
+    if df.empty:
+        raise FinvizExportError("Finviz returned an empty export")
+    report = memory_report(df)
+    print(f"Parsed Finviz snapshot: {report['rows']} rows, {report['bytes'] / 1e6:.1f} MB")
+    return df
+
+
+class SnapshotRefresher:
+    """
+    Keeps the last good Finviz snapshot in memory and refreshes it on a
+    background thread before it goes stale. Readers never wait on a download
+    once the first snapshot is in; a failed refresh keeps the previous frame.
+
+    With a shared `cache` (see shared_cache.py) every worker publishes its
+    snapshot there and adopts a fresh one written by another worker instead
+    of downloading the export itself. Downloads are single-flight: while
+    one runs, a refresh in another thread joins it and one in another
+    worker waits and then adopts the snapshot it published.
+
+    While the very first export is still streaming in, readers get the rows
+    parsed so far (see `partial`) instead of waiting for the whole file.
+    """
+
+    def __init__(self, url, headers=None, refresh_interval=REFRESH_INTERVAL,
+                 retry_interval=RETRY_INTERVAL, loader=load_finviz_export, cache=None):
+        self.url = url
+        self.headers = headers
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.loader = loader
+        self.cache = cache
+        self.cache_key = f"finviz_snapshot:{hashlib.sha1(url.encode()).hexdigest()}"
+        self._force = False
+        # (frame, fetched_at) is swapped as a single reference so readers
+        # always see a matching pair.
+        self._snapshot = (None, None)
+        self._partial = (None, None)
+        self._first_rows = threading.Event()
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._flights = SingleFlight('finviz', processes=cache is not None)
+
+    def _load_shared(self, max_age):
+        """
+        Returns (frame, fetched_at) from the shared cache if it is newer than
+        ours and younger than `max_age` seconds (None means any age).
+        """
+        if self.cache is None:
+            return None
+        try:
+            fetched_at = self.cache.get(f"{self.cache_key}:fetched_at")
+            if fetched_at is None:
+                return None
+            _, current = self._snapshot
+            if current is not None and fetched_at <= current:
+                return None
+            if max_age is not None and time.time() - fetched_at >= max_age:
+                return None
+            df = self.cache.get(self.cache_key)
+        except Exception as e:
+            print(f"Error reading shared Finviz snapshot: {e}")
+            return None
+        return None if df is None else (df, fetched_at)
+
+    def _store_shared(self, df, fetched_at):
+        if self.cache is None:
+            return
+        try:
+            self.cache.set(self.cache_key, df, timeout=SHARED_TIMEOUT)
+            self.cache.set(f"{self.cache_key}:fetched_at", fetched_at, timeout=SHARED_TIMEOUT)
+        except Exception as e:
+            print(f"Error writing shared Finviz snapshot: {e}")
+
+    def refresh(self, force=False):
+        """
+        Loads a new snapshot and swaps it in. Returns True on success.
+        Unless `force` is set, a fresh snapshot published by another worker
+        is adopted instead of downloading.
+        """
+        if not force:
+            shared = self._load_shared(self.refresh_interval)
+            if shared is not None:
+                self._adopt(shared)
+                return True
+        since = time.time()
+        return self._flights.do(self.cache_key, lambda: self._download(since))
+
+    def _adopt(self, shared):
+        # Readers blocked in get() waiting for the first rows are released
+        # by an adopted snapshot just as by a download.
+        self._snapshot = shared
+        self._partial = (None, None)
+        self.last_error = None
+        self._first_rows.set()
+
+    def _download(self, since):
+        # A worker that held the download lock before this one may have just
+        # published a snapshot; that is as fresh as a new download.
+        shared = self._load_shared(None)
+        if shared is not None and shared[1] >= since:
+            self._adopt(shared)
+            return True
+        # Only the first download is worth showing half-done; later ones
+        # keep serving the previous complete snapshot until they finish.
+        on_partial = self._publish_partial if self._snapshot[0] is None else None
+        try:
+            df = self.loader(self.url, self.headers, on_partial=on_partial)
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Finviz refresh failed, keeping previous snapshot: {e}")
+            self._first_rows.set()
+            return False
+        fetched_at = time.time()
+        self._snapshot = (df, fetched_at)
+        self._partial = (None, None)
+        self.last_error = None
+        self._first_rows.set()
+        self._store_shared(df, fetched_at)
+        return True
+
+    def _publish_partial(self, df):
+        self._partial = (df, time.time())
+        self._first_rows.set()
+
+    @property
+    def partial(self):
+        """
+        True while only part of the first export has been parsed.
+        """
+        return self._snapshot[0] is None and self._partial[0] is not None
+
+    def _next_wait(self):
+        df, fetched_at = self._snapshot
+        if self.last_error is not None:
+            return self.retry_interval
+        if df is None:
+            return 0
+        return max(0, fetched_at + self.refresh_interval - time.time())
+
+    def _run(self):
+        while True:
+            wait = self._next_wait()
+            if wait > 0:
+                self._wakeup.wait(wait)
+            self._wakeup.clear()
+            force, self._force = self._force, False
+            self.refresh(force=force)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='finviz-refresher', daemon=True)
+                self._thread.start()
+
+    def request_refresh(self):
+        """
+        Asks the background thread to refresh now without waiting for it.
+        """
+        self._force = True
+        self.start()
+        self._wakeup.set()
+
+    def version(self):
+        """
+        Fetch time of the current snapshot; changes whenever a new one is
+        swapped in, so derived data can be keyed on it.
+        """
+        df, fetched_at = self._snapshot
+        if df is None and self._partial[0] is not None:
+            return ('partial', len(self._partial[0]))
+        return fetched_at
+
+    def age(self):
+        """
+        Seconds since the current snapshot was fetched, or None.
+        """
+        _, fetched_at = self._snapshot if self._snapshot[0] is not None else self._partial
+        return None if fetched_at is None else time.time() - fetched_at
+
+    def get(self):
+        """
+        Returns (frame, age in seconds) for the last good snapshot. Only the
+        first calls can block, and only until the first rows of the export
+        are parsed, when no other worker has shared a snapshot yet. The frame
+        is a copy, so callers may add columns to it.
+        """
+        df, fetched_at = self._snapshot
+        if df is None:
+            with self._lock:
+                if self._snapshot[0] is None:
+                    # Any shared snapshot beats waiting; the background
+                    # thread revalidates it if it is stale.
+                    shared = self._load_shared(None)
+                    if shared is not None:
+                        self._snapshot = shared
+            self.start()
+            if self._snapshot[0] is None:
+                self._first_rows.wait()
+            df, fetched_at = self._snapshot
+            if df is None:
+                df, fetched_at = self._partial
+        self.start()
+        if df is None:
+            return None, None
+        return df.copy(), time.time() - fetched_at
@@ -0,0 +1,105 @@
+import random
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import registry
+from rate_limit import HostRateLimiter
+
+# (connect, read) timeout in seconds applied when a caller does not pass one.
+DEFAULT_TIMEOUT = (5, 30)
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+POOL_MAXSIZE = 32
+
+# Requests per second per host; finviz.com also covers elite.finviz.com.
+DEFAULT_RATE = 5.0
+HOST_RATES = {
+    'finviz.com': 2.0,
+}
+
+
+http_requests = registry.counter('stock_http_requests_total', 'HTTP attempts by host and outcome.',
+                                 ['host', 'status'])
+http_seconds = registry.histogram('stock_http_request_seconds', 'Time to response headers per attempt.', ['host'])
+
+
+class PooledSession(requests.Session):
+    """
+    requests.Session with a shared keep-alive connection pool, bounded
+    timeouts, exponential backoff with full jitter on 429/5xx and connection
+    errors, and a per-host token-bucket rate limit applied to every attempt.
+    """
+
+    def __init__(self, rate_limiter=None, max_retries=MAX_RETRIES, timeout=DEFAULT_TIMEOUT,
+                 pool_maxsize=POOL_MAXSIZE):
+        super().__init__()
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.timeout = timeout
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    @staticmethod
+    def backoff(attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.replace('.', '', 1).isdigit():
+                return min(float(retry_after), BACKOFF_CAP)
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+    def request(self, method, url, *args, rate_limiter=None, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        limiter = rate_limiter or self.rate_limiter
+
+        host = urlsplit(url).hostname or ''
+        for attempt in range(self.max_retries + 1):
+            if limiter is not None:
+                limiter.acquire(url)
+            start = time.perf_counter()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                http_requests.inc(host, type(e).__name__)
+                if attempt == self.max_retries:
+                    raise
+                wait = self.backoff(attempt)
+                print(f"Request to {url} failed ({e}); retrying in {wait:.1f}s")
+                time.sleep(wait)
+                continue
+            http_seconds.observe(time.perf_counter() - start, host)
+            http_requests.inc(host, str(response.status_code))
+
+            if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                wait = self.backoff(attempt, response)
+                print(f"HTTP {response.status_code} from {url}; retrying in {wait:.1f}s")
+                response.close()
+                time.sleep(wait)
+                continue
+            return response
+
+
+rate_limiter = HostRateLimiter(default_rate=DEFAULT_RATE, rates=HOST_RATES)
+session = PooledSession(rate_limiter)
+
+
+def install_finvizfinance_session():
+    """
+    Routes finvizfinance's own requests through the shared session so they
+    share its connection pool and rate limit. Returns False on finvizfinance
+    versions that do not support injecting a session.
+    """
+    try:
+        from finvizfinance import util
+    except ImportError:
+        return False
+    if not hasattr(util, 'set_session'):
+        return False
+    util.set_session(session)
+    return True
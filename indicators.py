@@ -0,0 +1,447 @@
+import math
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from metrics import registry, timed_stage
+
+NAN = float('nan')
+
+
+def _prev_valid(values):
+    """
+    Previous non-NaN value for every position (NaN before the first one),
+    i.e. what the incremental indicators remember as the last close.
+    """
+    return pd.Series(values).ffill().shift(1).to_numpy()
+
+
+def _rolling(values, window, reduce):
+    out = np.full(len(values), NAN)
+    if len(values) >= window:
+        out[window - 1:] = reduce(sliding_window_view(values, window), axis=1)
+    return out
+
+
+def _ewm(values, alpha, min_periods):
+    """
+    Exponential average with pandas' adjust=False, ignore_na=True semantics:
+    NaNs are skipped and the previous average is carried over them.
+    Returns the column and the final (average, observation count).
+    """
+    series = pd.Series(values)
+    avg = series.ewm(alpha=alpha, adjust=False, ignore_na=True).mean().to_numpy()
+    count = series.notna().cumsum().to_numpy()
+    out = np.where(count >= min_periods, avg, NAN)
+    last = avg[-1] if len(avg) else NAN
+    return out, last, int(count[-1]) if len(count) else 0
+
+
+class RollingWindow:
+    """
+    Fixed-size window with running sum and sum of squares, so mean and
+    standard deviation cost O(1) per bar. A NaN anywhere in the window makes
+    the statistics NaN, as with pandas' rolling(window).
+    """
+
+    def __init__(self, window, values=()):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.pushes = 0
+        self.total = self.total_sq = 0.0
+        self.missing = 0
+        for value in values:
+            self.values.append(value)
+        self._resum()
+
+    def _resum(self):
+        valid = [v for v in self.values if v == v]
+        self.total = math.fsum(valid)
+        self.total_sq = math.fsum(v * v for v in valid)
+        self.missing = len(self.values) - len(valid)
+
+    def _with(self, x):
+        """
+        (count, missing, total, total_sq) after pushing x, without pushing it.
+        """
+        count, missing, total, total_sq = len(self.values), self.missing, self.total, self.total_sq
+        if count == self.window:
+            old = self.values[0]
+            if old != old:
+                missing -= 1
+            else:
+                total -= old
+                total_sq -= old * old
+        else:
+            count += 1
+        if x != x:
+            missing += 1
+        else:
+            total += x
+            total_sq += x * x
+        return count, missing, total, total_sq
+
+    def push(self, x):
+        count, self.missing, self.total, self.total_sq = self._with(x)
+        self.values.append(x)
+        self.pushes += 1
+        if self.pushes % self.window == 0:
+            # Re-sum now and then so add/subtract rounding cannot build up.
+            self._resum()
+        return count, self.missing, self.total, self.total_sq
+
+    def moments(self, state, ddof=0):
+        """
+        (mean, std) for a state returned by push()/_with(), NaN until full.
+        """
+        count, missing, total, total_sq = state
+        if count < self.window or missing:
+            return NAN, NAN
+        mean = total / count
+        var = max(total_sq - total * mean, 0.0) / (count - ddof)
+        return mean, math.sqrt(var)
+
+
+class SMA:
+    def __init__(self, window, name=None):
+        self.window = window
+        self.columns = (name or f'SMA{window}',)
+        self.state = RollingWindow(window)
+
+    def cold_start(self, close, high, low):
+        self.state = RollingWindow(self.window, close[-self.window:])
+        return (_rolling(close, self.window, np.mean),)
+
+    def update(self, close, high, low):
+        return (self.state.moments(self.state.push(close))[0],)
+
+    def peek(self, close, high, low):
+        return (self.state.moments(self.state._with(close))[0],)
+
+
+class BollingerBands:
+    """
+    Upper and lower bands `k` population standard deviations around the
+    `window`-bar mean of the close.
+    """
+
+    def __init__(self, window=20, k=2.0):
+        self.window = window
+        self.k = k
+        self.columns = ('BB_UPPER', 'BB_LOWER')
+        self.state = RollingWindow(window)
+
+    def _bands(self, state):
+        mean, std = self.state.moments(state)
+        return mean + self.k * std, mean - self.k * std
+
+    def cold_start(self, close, high, low):
+        self.state = RollingWindow(self.window, close[-self.window:])
+        mean = _rolling(close, self.window, np.mean)
+        std = _rolling(close, self.window, np.std)
+        return mean + self.k * std, mean - self.k * std
+
+    def update(self, close, high, low):
+        return self._bands(self.state.push(close))
+
+    def peek(self, close, high, low):
+        return self._bands(self.state._with(close))
+
+
+class RollingVolatility:
+    """
+    Sample standard deviation of log returns over `window` bars.
+    """
+
+    def __init__(self, window=20):
+        self.window = window
+        self.columns = (f'VOL{window}',)
+        self.state = RollingWindow(window)
+        self.prev_close = NAN
+
+    def _return(self, close):
+        return math.log(close / self.prev_close) if close == close and self.prev_close == self.prev_close else NAN
+
+    def cold_start(self, close, high, low):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.log(close / _prev_valid(close))
+        self.state = RollingWindow(self.window, returns[-self.window:])
+        valid = close[~np.isnan(close)]
+        self.prev_close = valid[-1] if len(valid) else NAN
+        return (_rolling(returns, self.window, lambda w, axis: np.std(w, axis=axis, ddof=1)),)
+
+    def update(self, close, high, low):
+        value = self.state.moments(self.state.push(self._return(close)), ddof=1)[1]
+        if close == close:
+            self.prev_close = close
+        return (value,)
+
+    def peek(self, close, high, low):
+        return (self.state.moments(self.state._with(self._return(close)), ddof=1)[1],)
+
+
+class EWMA:
+    """
+    Running exponential average (adjust=False) that skips missing inputs
+    and reports NaN until `min_periods` observations were seen.
+    """
+
+    def __init__(self, alpha, min_periods):
+        self.alpha = alpha
+        self.min_periods = min_periods
+        self.value = NAN
+        self.count = 0
+
+    def _next(self, x):
+        if x != x:
+            return self.value, self.count
+        if self.count == 0:
+            return x, 1
+        return self.value + self.alpha * (x - self.value), self.count + 1
+
+    def output(self, state):
+        value, count = state
+        return value if count >= self.min_periods else NAN
+
+    def push(self, x):
+        self.value, self.count = self._next(x)
+        return self.output((self.value, self.count))
+
+    def peek(self, x):
+        return self.output(self._next(x))
+
+    def cold_start(self, values):
+        out, self.value, self.count = _ewm(values, self.alpha, self.min_periods)
+        return out
+
+
+class EMA:
+    def __init__(self, span):
+        self.columns = (f'EMA{span}',)
+        self.avg = EWMA(2.0 / (span + 1), span)
+
+    def cold_start(self, close, high, low):
+        return (self.avg.cold_start(close),)
+
+    def update(self, close, high, low):
+        return (self.avg.push(close),)
+
+    def peek(self, close, high, low):
+        return (self.avg.peek(close),)
+
+
+class RSI:
+    """
+    Wilder's RSI: exponential averages (alpha = 1/period) of gains and
+    losses between consecutive closes.
+    """
+
+    def __init__(self, period=14):
+        self.columns = (f'RSI{period}',)
+        self.gain = EWMA(1.0 / period, period)
+        self.loss = EWMA(1.0 / period, period)
+        self.prev_close = NAN
+
+    @staticmethod
+    def _rsi(gain, loss):
+        if gain != gain or loss != loss:
+            return NAN
+        return 100.0 if loss == 0 else 100.0 - 100.0 / (1.0 + gain / loss)
+
+    def _moves(self, close):
+        delta = close - self.prev_close
+        return (max(delta, 0.0), max(-delta, 0.0)) if delta == delta else (NAN, NAN)
+
+    def cold_start(self, close, high, low):
+        delta = close - _prev_valid(close)
+        gain = self.gain.cold_start(np.where(np.isnan(delta), NAN, np.clip(delta, 0, None)))
+        loss = self.loss.cold_start(np.where(np.isnan(delta), NAN, np.clip(-delta, 0, None)))
+        valid = close[~np.isnan(close)]
+        self.prev_close = valid[-1] if len(valid) else NAN
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(loss == 0, 100.0, 100.0 - 100.0 / (1.0 + gain / loss))
+        return (np.where(np.isnan(gain) | np.isnan(loss), NAN, rsi),)
+
+    def update(self, close, high, low):
+        up, down = self._moves(close)
+        value = self._rsi(self.gain.push(up), self.loss.push(down))
+        if close == close:
+            self.prev_close = close
+        return (value,)
+
+    def peek(self, close, high, low):
+        up, down = self._moves(close)
+        return (self._rsi(self.gain.peek(up), self.loss.peek(down)),)
+
+
+class ATR:
+    """
+    Wilder's average true range over `period` bars.
+    """
+
+    def __init__(self, period=14):
+        self.columns = (f'ATR{period}',)
+        self.avg = EWMA(1.0 / period, period)
+        self.prev_close = NAN
+
+    def _true_range(self, close, high, low):
+        if close != close or high != high or low != low:
+            return NAN
+        if self.prev_close != self.prev_close:
+            return high - low
+        return max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+
+    def cold_start(self, close, high, low):
+        prev = _prev_valid(close)
+        with np.errstate(invalid='ignore'):
+            tr = np.fmax(high - low, np.fmax(np.abs(high - prev), np.abs(low - prev)))
+        tr[np.isnan(close) | np.isnan(high) | np.isnan(low)] = NAN
+        valid = close[~np.isnan(close)]
+        self.prev_close = valid[-1] if len(valid) else NAN
+        return (self.avg.cold_start(tr),)
+
+    def update(self, close, high, low):
+        value = self.avg.push(self._true_range(close, high, low))
+        if close == close:
+            self.prev_close = close
+        return (value,)
+
+    def peek(self, close, high, low):
+        return (self.avg.peek(self._true_range(close, high, low)),)
+
+
+def default_indicators():
+    return [
+        SMA(20), SMA(50), SMA(200),
+        EMA(20), EMA(50),
+        BollingerBands(20, 2.0),
+        RSI(14), ATR(14),
+        RollingVolatility(20),
+    ]
+
+
+class _SeriesState:
+    def __init__(self, indicators):
+        self.indicators = indicators
+        self.dates = None  # dates of the committed bars still in the window
+        self.last_close = NAN
+        self.count = 0
+        self.columns = {}  # column -> values for the committed bars
+
+
+class IndicatorEngine:
+    """
+    Keeps running indicator state per (ticker, period, interval) so a history
+    that only gained a few bars since the last call costs O(new bars) instead
+    of a full rolling recompute.
+
+    Every bar but the last is committed into the state; the last one may
+    still be forming, so its values come from peek(), which does not move the
+    state, and it is committed on the next call. The first call for a series,
+    or any call where the committed bars no longer line up (bars were
+    inserted, the last committed close was revised), takes the vectorized
+    cold-start path.
+
+    A window that lost bars at the front (the store trims every history to
+    now - period) still continues the state: the indicators only carry
+    trailing state, so the bars that dropped out are simply not reported.
+    EMA, RSI and ATR keep the memory of the whole history seen so far, as
+    if the series had been computed from its first call on.
+    """
+
+    def __init__(self, factory=default_indicators, max_series=256):
+        self.factory = factory
+        self.max_series = max_series
+        self.series = OrderedDict()  # key -> _SeriesState
+        self.lock = threading.Lock()
+        self.cold_starts = 0
+        self.updates = 0
+
+    def _offset(self, state, dates, close):
+        """
+        How many committed bars `dates` dropped at the front if it continues
+        the committed ones, otherwise None.
+        """
+        n = state.count
+        if n == 0:
+            return None
+        offset = int(np.searchsorted(state.dates, dates[0]))
+        kept = n - offset
+        if offset >= n or kept >= len(dates) or state.dates[offset] != dates[0]:
+            return None
+        if dates[kept - 1] != state.dates[-1]:
+            return None
+        last = close[kept - 1]
+        if last == state.last_close or (last != last and state.last_close != state.last_close):
+            return offset
+        return None
+
+    def _cold_start(self, state, dates, close, high, low):
+        n = len(dates) - 1
+        state.columns = {}
+        for indicator in state.indicators:
+            values = indicator.cold_start(close[:n], high[:n], low[:n])
+            state.columns.update(zip(indicator.columns, values))
+        state.count = n
+        self.cold_starts += 1
+
+    def _advance(self, state, offset, dates, close, high, low):
+        if offset:
+            state.columns = {column: values[offset:] for column, values in state.columns.items()}
+        start, n = state.count - offset, len(dates) - 1
+        for indicator in state.indicators:
+            new = [indicator.update(close[i], high[i], low[i]) for i in range(start, n)]
+            for j, column in enumerate(indicator.columns):
+                values = np.fromiter((row[j] for row in new), dtype=float, count=n - start)
+                state.columns[column] = np.concatenate([state.columns[column], values])
+        state.count = n
+        self.updates += 1
+
+    @timed_stage('indicators')
+    def apply(self, key, df):
+        """
+        Adds the indicator columns to `df` (which needs Date, High, Low and
+        Close) in place and returns it.
+        """
+        if df.empty:
+            return df
+        # UTC datetime64 for zone-aware dates too: cheap to index and compare.
+        dates = df['Date'].to_numpy(dtype='datetime64[ns]')
+        close = df['Close'].to_numpy(dtype=float)
+        high = df['High'].to_numpy(dtype=float)
+        low = df['Low'].to_numpy(dtype=float)
+
+        with self.lock:
+            state = self.series.get(key)
+            offset = self._offset(state, dates, close) if state is not None else None
+            if offset is not None:
+                self._advance(state, offset, dates, close, high, low)
+            else:
+                state = _SeriesState(self.factory())
+                self._cold_start(state, dates, close, high, low)
+            self.series[key] = state
+            self.series.move_to_end(key)
+            while len(self.series) > self.max_series:
+                self.series.popitem(last=False)
+
+            n = state.count
+            state.dates = dates[:n].copy()
+            state.last_close = close[n - 1] if n else NAN
+            columns = {}
+            for indicator in state.indicators:
+                forming = indicator.peek(close[-1], high[-1], low[-1])
+                for column, value in zip(indicator.columns, forming):
+                    columns[column] = np.append(state.columns[column], value)
+
+        for column, values in columns.items():
+            df[column] = values
+        return df
+
+
+indicator_engine = IndicatorEngine()
+registry.counter_function('stock_indicator_runs_total', 'Indicator computations by path since start.', ['path'],
+                          lambda: {('cold_start',): indicator_engine.cold_starts,
+                                   ('incremental',): indicator_engine.updates})
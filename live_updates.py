@@ -0,0 +1,213 @@
+import itertools
+import json
+import queue
+import threading
+import time
+
+import pandas as pd
+from flask import Response, stream_with_context
+
+from metrics import registry, stage
+from table_query import json_records
+
+# Seconds between checks for a new snapshot version. Checking is a
+# reference comparison; the screen is only rebuilt when it changed.
+POLL_SECONDS = 1.0
+# An SSE comment is sent this often so proxies keep idle streams open.
+HEARTBEAT_SECONDS = 15
+# Events a client may fall behind by before it is told to resync instead.
+QUEUE_SIZE = 16
+# Browsers reconnect after this many milliseconds when a stream drops.
+RETRY_MS = 5000
+
+
+def _changed(old, new):
+    """
+    Boolean Series: where the aligned columns differ. NaN equals NaN, and
+    categoricals with different category sets compare by value.
+    """
+    if isinstance(old.dtype, pd.CategoricalDtype) or isinstance(new.dtype, pd.CategoricalDtype):
+        old, new = old.astype(object), new.astype(object)
+    try:
+        same = (old == new) | (old.isna() & new.isna())
+    except TypeError:
+        same = old.astype(str) == new.astype(str)
+    return ~same.fillna(False).astype(bool)
+
+
+def _keyed(df, key):
+    df = df[df[key].notna()]
+    df = df.set_index(df[key].astype(str))
+    return df[~df.index.duplicated()]
+
+
+def row_diff(old, new, key='Ticker'):
+    """
+    Row-level difference between two snapshot frames, keyed on `key`:
+    {'changed': {key: {column: new value}}, 'columns': [changed columns],
+    'added': [keys], 'removed': [keys]}. Values are JSON-ready. Returns
+    None when the columns differ, since rows cannot be patched then.
+    """
+    if list(old.columns) != list(new.columns) or key not in new.columns:
+        return None
+    old, new = _keyed(old, key), _keyed(new, key)
+
+    common = new.index.intersection(old.index, sort=False)
+    added = new.index.difference(old.index, sort=False)
+    removed = old.index.difference(new.index, sort=False)
+
+    before, after = old.loc[common], new.loc[common]
+    mask = pd.DataFrame({col: _changed(before[col], after[col]) for col in new.columns}, index=common)
+    rows = mask.any(axis=1)
+    changed = {}
+    if rows.any():
+        mask = mask[rows]
+        records = json_records(after[rows])
+        for ticker, record, flags in zip(mask.index, records, mask.to_numpy()):
+            changed[ticker] = {col: value for (col, value), flag in zip(record.items(), flags) if flag}
+    return {
+        'changed': changed,
+        'columns': [col for col in mask.columns if mask[col].any()] if changed else [],
+        'added': list(added),
+        'removed': list(removed),
+    }
+
+
+def sse_message(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines += [f"data: {line}" for line in data.splitlines() or ['']]
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+class SnapshotPublisher:
+    """
+    Pushes main-table updates to every open browser tab over Server-Sent
+    Events. One thread per worker watches the version of `snapshot` (a
+    SnapshotRefresher); when it changes, the new screen is built once
+    (through `screen`, the same ScreenCache the callbacks use), diffed against the previous one row by
+    row, serialized once, and the same bytes are queued to each connected
+    client. The cost of a snapshot change does not grow with the number of
+    viewers, and what is sent grows with the number of changed rows.
+
+    Clients apply the diff to the rows they show (assets/live_updates.js)
+    and only ask the server for their page again when rows were added or
+    removed, or a changed column decides their sort or filter.
+
+    Each stream holds a server thread for as long as the tab is open; run
+    gunicorn with threaded or gevent workers.
+    """
+
+    def __init__(self, snapshot, screen, poll_seconds=POLL_SECONDS, queue_size=QUEUE_SIZE):
+        self.snapshot = snapshot
+        self.screen = screen
+        self.poll_seconds = poll_seconds
+        self.queue_size = queue_size
+        self.clients = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._version = None
+        self._df = None
+        self.events_sent = 0
+
+    def subscribe(self):
+        client = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self.clients.add(client)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='snapshot-publisher', daemon=True)
+                self._thread.start()
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self.clients.discard(client)
+
+    def publish(self, event, payload):
+        message = sse_message(event, json.dumps(payload, separators=(',', ':')), next(self._ids))
+        resync = sse_message('resync', json.dumps({'version': payload.get('version')}))
+        with self._lock:
+            clients = list(self.clients)
+        for client in clients:
+            try:
+                client.put_nowait(message)
+            except queue.Full:
+                # Too far behind for diffs to apply; drop its backlog and
+                # have it fetch its page afresh.
+                while True:
+                    try:
+                        client.get_nowait()
+                    except queue.Empty:
+                        break
+                client.put_nowait(resync)
+        self.events_sent += len(clients)
+
+    def status(self):
+        age = self.snapshot.age()
+        return {'fetched_at': None if age is None else time.time() - age, 'partial': self.snapshot.partial}
+
+    def check(self):
+        """
+        Publishes a diff if the snapshot version changed since the last
+        call. The first call only records the current screen.
+        """
+        version = self.snapshot.version()
+        if version == self._version or version is None:
+            return False
+        engine = self.screen()
+        df = engine.df
+        if 'Error' in df.columns:
+            return False
+        previous, self._version, self._df = self._df, version, df
+        if previous is None:
+            return False
+        with stage('live_diff'):
+            diff = row_diff(previous, df)
+        payload = {'version': str(version), **self.status()}
+        if diff is None:
+            self.publish('resync', payload)
+        else:
+            self.publish('diff', {**payload, **diff})
+        return True
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self.clients:
+                    # Whoever connects next loads a current page; diff
+                    # against the screen as of then, not this one.
+                    self._thread = self._version = self._df = None
+                    return
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Live update failed: {e}")
+            time.sleep(self.poll_seconds)
+
+    def stream(self):
+        client = self.subscribe()
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode('utf-8')
+            yield sse_message('hello', json.dumps(self.status()))
+            while True:
+                try:
+                    yield client.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield b": keepalive\n\n"
+        finally:
+            self.unsubscribe(client)
+
+    def install(self, server, route='/events'):
+        """
+        Serves the event stream at `route` on the Flask server.
+        """
+        endpoint = 'live_updates'
+        if endpoint not in server.view_functions:
+            def events():
+                return Response(stream_with_context(self.stream()), mimetype='text/event-stream',
+                                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+            server.add_url_rule(route, endpoint, events)
+        registry.gauge_function('stock_live_clients', 'Open live-update streams.', [],
+                                lambda: {(): len(self.clients)})
+        return self
@@ -0,0 +1,172 @@
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+from ohlcv_store import store
+
+# Same (period, interval) pairs that fetch_historical_data() uses per timeframe.
+TIMEFRAME_MAPPING = {
+    '1m':  ('7d', '1m'),
+    '1d':  ('1y', '1d'),
+    '1w':  ('2y', '1wk'),
+    '1h':  ('5d', '60m'),
+    '1mo': ('2y', '1mo'),
+    '1y':  ('10y', '1mo')
+}
+
+FALLBACK_PERIOD = ('1y', '1d')
+
+# The finest series that coarser timeframes are resampled from. A whole
+# screen needs at most these two downloads instead of one per timeframe.
+SOURCE_SERIES = {
+    'intraday': ('7d', '1m'),
+    'daily':    ('10y', '1d'),
+}
+
+# timeframe -> (source series, lookback, resample rule). The lookbacks match
+# the periods in TIMEFRAME_MAPPING (None uses the whole source series). The
+# first open and last close are the same whether minute bars are summed into
+# hours or not, so '1h' reads the minute series directly.
+TIMEFRAME_DERIVATION = {
+    '1m':  ('intraday', None, None),
+    '1d':  ('daily', pd.DateOffset(years=1), None),
+    '1w':  ('daily', pd.DateOffset(years=2), 'W-MON'),
+    '1h':  ('intraday', pd.DateOffset(days=5), None),
+    '1mo': ('daily', pd.DateOffset(years=2), 'MS'),
+    '1y':  ('daily', pd.DateOffset(years=10), 'MS')
+}
+
+OHLCV_AGG = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+
+def _clean_tickers(tickers):
+    return [t for t in dict.fromkeys(tickers) if isinstance(t, str) and t.strip()]
+
+
+def fetch_bulk_history(tickers, period, interval):
+    """
+    OHLCV bars for every ticker as a single wide frame whose columns are
+    (field, ticker) pairs, e.g. ('Close', 'AAPL'). Reads through the on-disk
+    store, so only bars newer than the stored ones are downloaded, in one
+    batched request.
+    """
+    tickers = _clean_tickers(tickers)
+    if not tickers:
+        return pd.DataFrame(columns=pd.MultiIndex.from_arrays([[], []]))
+    return store.bulk_history(tickers, period, interval).dropna(axis=1, how='all')
+
+
+def overall_changes_from_wide(wide):
+    """
+    Percentage change from each ticker's first open to its latest close.
+    Tickers that start trading later in the window or miss bars are handled
+    by taking the first/last valid value per column.
+    """
+    if wide.empty:
+        return pd.Series(dtype=float)
+    first_open = wide['Open'].bfill().iloc[0]
+    last_close = wide['Close'].ffill().iloc[-1]
+    return (((last_close - first_open) / first_open) * 100).round(2)
+
+
+def resample_ohlcv(df, rule):
+    """
+    Aggregates finer OHLCV bars into coarser ones (e.g. daily -> weekly).
+    Works on a flat single-ticker frame as well as on the wide (field, ticker)
+    frame returned by fetch_bulk_history(). Bins are labelled by their start,
+    like Yahoo's weekly and monthly bars.
+    """
+    parts = {}
+    for field, how in OHLCV_AGG.items():
+        if field in df.columns.get_level_values(0):
+            parts[field] = df[field].resample(rule, label='left', closed='left').agg(how)
+    if not parts:
+        return df.iloc[0:0]
+    out = pd.concat(parts, axis=1)
+    has_close = out['Close'].notna()
+    if has_close.ndim == 2:
+        has_close = has_close.any(axis=1)
+    return out[has_close]
+
+
+def timeframe_window(df, tf, now=None):
+    """
+    Returns the bars `tf` covers, derived locally from a finer series.
+    The window start is snapped to the start of the first coarse bar so the
+    first open matches what Yahoo reports for that bar size.
+    """
+    _, lookback, rule = TIMEFRAME_DERIVATION[tf]
+    if df.empty or lookback is None:
+        return df
+    if now is None:
+        now = pd.Timestamp.now(tz=df.index.tz)
+    start = (now - lookback).normalize()
+    if rule is not None:
+        start = to_offset(rule).rollback(start)
+    window = df[df.index >= start]
+    return resample_ohlcv(window, rule) if rule is not None else window
+
+
+def changes_from_sources(sources, timeframes):
+    """
+    Computes every timeframe's overall change from already-downloaded source
+    series (keyed like SOURCE_SERIES). Tickers missing from the intraday
+    series fall back to one year of daily bars, like fetch_historical_data().
+    """
+    changes = {}
+    daily = sources.get('daily')
+    fallback = None
+    for tf in timeframes:
+        if tf not in TIMEFRAME_DERIVATION:
+            continue
+        source = sources.get(TIMEFRAME_DERIVATION[tf][0])
+        tf_changes = pd.Series(dtype=float)
+        if source is not None and not source.empty:
+            tf_changes = overall_changes_from_wide(timeframe_window(source, tf)).dropna()
+
+        if daily is not None and not daily.empty:
+            if fallback is None:
+                fallback = overall_changes_from_wide(timeframe_window(daily, '1d')).dropna()
+            missing = fallback.index.difference(tf_changes.index)
+            tf_changes = pd.concat([tf_changes, fallback.reindex(missing)])
+
+        changes[f'Change {tf}'] = tf_changes
+    return pd.DataFrame(changes)
+
+
+def calculate_overall_changes(tickers, timeframes, progress=None):
+    """
+    Returns a frame indexed by ticker with one `Change {tf}` column per
+    timeframe. Only the finest series the requested timeframes need are
+    downloaded, in one batched request each; coarser bars are resampled
+    locally. `progress`, if given, is called with a status line before
+    each download.
+    """
+    tickers = _clean_tickers(tickers)
+    needed = {TIMEFRAME_DERIVATION[tf][0] for tf in timeframes if tf in TIMEFRAME_DERIVATION}
+    needed.add('daily')
+
+    sources = {}
+    for name in needed:
+        period, interval = SOURCE_SERIES[name]
+        if progress is not None:
+            progress(f"Updating {name} bars for {len(tickers)} tickers...")
+        try:
+            sources[name] = fetch_bulk_history(tickers, period, interval)
+        except Exception as e:
+            print(f"Error fetching {name} history: {e}")
+
+    changes = changes_from_sources(sources, timeframes)
+    changes = changes.reindex(pd.Index(tickers, name='Ticker'))
+    return changes.reindex(columns=[f'Change {tf}' for tf in timeframes])
+
+
+def add_overall_changes(df, timeframes, progress=None):
+    """
+    Fills the `Change {tf}` columns of a Finviz snapshot for all rows at once.
+    """
+    if 'Ticker' not in df.columns:
+        return df
+    changes = calculate_overall_changes(df['Ticker'].dropna(), timeframes, progress)
+    for col in changes.columns:
+        df[col] = df['Ticker'].map(changes[col])
+    return df
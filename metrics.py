@@ -0,0 +1,333 @@
+import cProfile
+import functools
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:
+    SamplingProfiler = None
+
+# Histogram bucket bounds in seconds, from a cache hit to a full refresh.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Opt-in profiling of slow callbacks: a PROFILE_SAMPLE fraction of calls runs
+# under a profiler, and the profile is kept when the call took longer than
+# STOCK_PROFILE_SLOW seconds (unset or 0 disables it).
+PROFILE_SLOW = float(os.environ.get('STOCK_PROFILE_SLOW', '0') or 0)
+PROFILE_SAMPLE = float(os.environ.get('STOCK_PROFILE_SAMPLE', '0.1') or 0)
+PROFILE_DIR = os.environ.get('STOCK_PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+    return '{' + body + '}'
+
+
+def _number(value):
+    return repr(float(value)) if value == value else 'NaN'
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self.lock:
+            series = self.series.get(labelvalues)
+            if series is None:
+                series = self.series[labelvalues] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = [(key, list(series)) for key, series in sorted(self.series.items())]
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {series[-2]!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = sorted(self.values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+        return lines
+
+
+class GaugeFunction:
+    """
+    Gauge read when /metrics is scraped: `func` returns a dict of label
+    values (a tuple) -> number.
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name, help, labelnames, func):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.func = func
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        try:
+            items = sorted(self.func().items())
+        except Exception as e:
+            print(f"Error collecting {self.name}: {e}")
+            items = []
+        lines += [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+        return lines
+
+
+class CounterFunction(GaugeFunction):
+    """
+    Counter read when /metrics is scraped, for totals something else keeps
+    (cache hits, evictions): `func` must only ever return growing values.
+    """
+
+    type = 'counter'
+
+
+class Registry:
+    """
+    In-process metrics rendered in the Prometheus text format. Each gunicorn
+    worker keeps its own; scrape them per worker.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _add(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, help, labelnames=(), buckets=BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge_function(self, name, help, labelnames, func):
+        return self._add(GaugeFunction(name, help, labelnames, func))
+
+    def counter_function(self, name, help, labelnames, func):
+        return self._add(CounterFunction(name, help, labelnames, func))
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+stage_seconds = registry.histogram(
+    'stock_stage_seconds', 'Time spent per pipeline stage (network, parse, coerce, indicators, '
+    'figure build, JSON serialize, ...).', ['stage'])
+callback_seconds = registry.histogram(
+    'stock_callback_seconds', 'Dash callback latency from request to serialized response.', ['callback'])
+callback_errors = registry.counter('stock_callback_errors_total', 'Dash callbacks that raised.', ['callback'])
+
+_current = threading.local()
+
+
+def observe_stage(name, seconds):
+    stage_seconds.observe(seconds, name)
+
+
+@contextmanager
+def stage(name):
+    """
+    Times the enclosed block into stock_stage_seconds{stage=name}.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, name)
+
+
+def timed_stage(name):
+    """
+    Decorator form of stage().
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def callback_timer(func):
+    """
+    Goes between @app.callback and the function. Records how long the
+    function body ran, so instrument_app() can attribute the rest of the
+    request to Dash's output handling and JSON serialization.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.body = time.perf_counter() - start
+    return wrapper
+
+
+_caches = {}
+
+
+def _cache_stats():
+    with registry.lock:
+        sources = list(_caches.values())
+    return [stats() for stats in sources]
+
+
+def register_cache(cache):
+    """
+    Exposes hit/miss/eviction counts, size and hit ratio of anything with a
+    TTLCache-style stats() method.
+    """
+    registry.gauge_function('stock_cache_hit_ratio', 'Cache hits / lookups since start.', ['cache'],
+                            lambda: {(s['name'],): s['hit_ratio'] for s in _cache_stats()})
+    registry.counter_function('stock_cache_lookups_total', 'Cache lookups since start.', ['cache', 'result'],
+                              lambda: {k: v for s in _cache_stats()
+                                       for k, v in (((s['name'], 'hit'), s['hits']), ((s['name'], 'miss'), s['misses']))})
+    registry.counter_function('stock_cache_evictions_total', 'Entries evicted to stay under the size limit.', ['cache'],
+                              lambda: {(s['name'],): s['evictions'] for s in _cache_stats()})
+    registry.gauge_function('stock_cache_bytes', 'Estimated size of the cached values.', ['cache'],
+                            lambda: {(s['name'],): s['bytes'] for s in _cache_stats()})
+    with registry.lock:
+        _caches[id(cache)] = cache.stats
+
+
+class SlowCallbackProfiler:
+    """
+    Runs a sample of callback calls under pyinstrument (or cProfile when it
+    is not installed) and writes the profile of any that took longer than
+    `threshold` seconds to `directory`. Only one call is profiled at a time.
+    """
+
+    def __init__(self, threshold=PROFILE_SLOW, sample=PROFILE_SAMPLE, directory=PROFILE_DIR):
+        self.threshold = threshold
+        self.sample = sample
+        self.directory = directory
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.threshold > 0 and self.sample > 0
+
+    def call(self, name, func, *args, **kwargs):
+        if not self.enabled or random.random() >= self.sample or not self.lock.acquire(blocking=False):
+            return func(*args, **kwargs)
+        try:
+            profiler = SamplingProfiler() if SamplingProfiler is not None else cProfile.Profile()
+            start = time.perf_counter()
+            profiler.enable() if SamplingProfiler is None else profiler.start()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.disable() if SamplingProfiler is None else profiler.stop()
+                elapsed = time.perf_counter() - start
+                if elapsed >= self.threshold:
+                    self._save(name, profiler, elapsed)
+        finally:
+            self.lock.release()
+
+    def _save(self, name, profiler, elapsed):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        if SamplingProfiler is None:
+            path = os.path.join(self.directory, f"{name}-{stamp}.prof")
+            profiler.dump_stats(path)
+        else:
+            path = os.path.join(self.directory, f"{name}-{stamp}.html")
+            with open(path, 'w') as f:
+                f.write(profiler.output_html())
+        print(f"Slow callback {name} took {elapsed:.2f}s; profile saved to {path}")
+
+
+profiler = SlowCallbackProfiler()
+
+
+def _instrument(name, dispatch):
+    @functools.wraps(dispatch)
+    def wrapper(*args, **kwargs):
+        _current.body = None
+        start = time.perf_counter()
+        try:
+            return profiler.call(name, dispatch, *args, **kwargs)
+        except Exception:
+            callback_errors.inc(name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            callback_seconds.observe(elapsed, name)
+            if _current.body is not None:
+                stage_seconds.observe(elapsed - _current.body, 'json_serialize')
+    return wrapper
+
+
+def instrument_app(app, caches=()):
+    """
+    Times every callback registered on `app` so far and serves the metrics
+    at /metrics on app.server. Call it after the last @app.callback.
+    """
+    for spec in app.callback_map.values():
+        dispatch = spec.get('callback')
+        if dispatch is None or getattr(dispatch, '_instrumented', False):
+            # Clientside callbacks never reach the server.
+            continue
+        name = getattr(dispatch, '__wrapped__', dispatch).__name__
+        spec['callback'] = _instrument(name, dispatch)
+        spec['callback']._instrumented = True
+    for cache in caches:
+        register_cache(cache)
+
+    if 'metrics' not in app.server.view_functions:
+        def metrics():
+            return app.server.response_class(registry.render(), mimetype=None, content_type=CONTENT_TYPE)
+        app.server.add_url_rule('/metrics', 'metrics', metrics)
+    return app
@@ -0,0 +1,315 @@
+import os
+import re
+import time
+import uuid
+
+import pandas as pd
+import yfinance as yf
+
+from metrics import stage
+from singleflight import SingleFlight
+
+STORE_DIR = os.environ.get('OHLCV_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ohlcv_data'))
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+BATCH_SIZE = 200
+# Slack when checking that stored bars reach back to a period's start.
+# Daily bars are stored as exchange dates, so a start computed from the
+# clock can read up to a day apart.
+COVERAGE_SLACK = pd.Timedelta(days=1)
+
+# Yahoo only serves recent intraday bars, so there is no point keeping more.
+RETENTION = {
+    '1m': pd.DateOffset(days=30),
+    '60m': pd.DateOffset(days=730),
+}
+
+
+def period_offset(period):
+    """
+    Converts a yfinance period string such as '7d', '2y' or '6mo' into a
+    DateOffset. Returns None for 'max' or anything unrecognised.
+    """
+    match = re.fullmatch(r'(\d+)(d|wk|mo|y)', period or '')
+    if not match:
+        return None
+    n, unit = int(match.group(1)), match.group(2)
+    return {
+        'd': pd.DateOffset(days=n),
+        'wk': pd.DateOffset(weeks=n),
+        'mo': pd.DateOffset(months=n),
+        'y': pd.DateOffset(years=n),
+    }[unit]
+
+
+def _normalize(df):
+    df = df[[c for c in OHLCV_COLUMNS if c in df.columns]].copy()
+    df.index.name = 'Date'
+    df = df[~df.index.duplicated(keep='last')]
+    return df.sort_index()
+
+
+def is_intraday(interval):
+    return re.fullmatch(r'\d+[mh]', interval or '') is not None
+
+
+def _store_tz(df, interval):
+    """
+    Puts the index in the one timezone stored for `interval`: UTC for
+    intraday bars, tz-naive exchange dates for daily and longer. yfinance
+    returns daily bars tz-naive from download() but tz-aware from
+    Ticker.history(), and intraday bars in the exchange's zone or UTC;
+    tickers fetched either way have to line up in one wide frame.
+    """
+    idx = df.index
+    if is_intraday(interval):
+        df.index = idx.tz_localize('UTC') if idx.tz is None else idx.tz_convert('UTC')
+    elif idx.tz is not None:
+        df.index = idx.tz_localize(None)
+    return df
+
+
+def _as_tz(timestamp, tz):
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tz is None:
+        return timestamp if tz is None else timestamp.tz_localize(tz)
+    return timestamp.tz_convert(tz) if tz is not None else timestamp.tz_localize(None)
+
+
+def period_start(period, tz=None):
+    """
+    Where a full download of `period` starts if made now, or None for
+    'max' and anything unrecognised.
+    """
+    offset = period_offset(period)
+    return None if offset is None else pd.Timestamp.now(tz=tz) - offset
+
+
+def download_wide(tickers, interval, period=None, start=None, batch_size=BATCH_SIZE):
+    """
+    Downloads bars for many tickers with one batched yfinance request per
+    `batch_size` symbols. Returns a wide frame with (field, ticker) columns.
+    """
+    frames = []
+    for i in range(0, len(tickers), batch_size):
+        batch = tickers[i:i + batch_size]
+        kwargs = {'start': start} if start is not None else {'period': period}
+        with stage('yahoo_download'):
+            df = yf.download(batch, interval=interval, group_by='column', auto_adjust=True,
+                             threads=True, progress=False, **kwargs)
+        if df.empty:
+            continue
+        if not isinstance(df.columns, pd.MultiIndex):
+            df.columns = pd.MultiIndex.from_product([df.columns, batch])
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=pd.MultiIndex.from_arrays([[], []]))
+    return pd.concat(frames, axis=1).sort_index()
+
+
+class OHLCVStore:
+    """
+    On-disk OHLCV cache with one Parquet file per (ticker, interval). A
+    refresh only downloads the bars after the last stored timestamp, so its
+    cost depends on how much data is new rather than on the lookback.
+    Intraday bars are stored in UTC and daily ones as tz-naive dates (see
+    _store_tz); history() shows intraday bars in the exchange's timezone
+    when Yahoo reported it.
+
+    Requests with different periods share a file, so each file records in
+    its attrs where its bars are complete from ('covered_from': the start
+    of the longest full-period download in it). A request reaching further
+    back than that downloads its full period again.
+
+    Concurrent refreshes of the same request, in this process or another
+    worker, download once: the others wait and then read what it stored.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self.flights = SingleFlight('ohlcv', processes=True)
+
+    def path(self, ticker, interval):
+        safe = re.sub(r'[^A-Za-z0-9._-]', '_', ticker)
+        return os.path.join(self.root, interval, f"{safe}.parquet")
+
+    def load(self, ticker, interval):
+        path = self.path(ticker, interval)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = pd.read_parquet(path)
+        except Exception as e:
+            print(f"Error reading {path}: {e}")
+            return None
+        # Files written before the timezone was fixed per interval.
+        return _store_tz(df, interval)
+
+    def refreshed_since(self, ticker, interval, stored, period, since):
+        """
+        True if the stored bars were written at or after `since` (epoch
+        seconds), i.e. by a refresh that finished while the caller waited,
+        and reach back far enough for `period`.
+        """
+        try:
+            written = os.path.getmtime(self.path(ticker, interval))
+        except OSError:
+            return False
+        return written >= since and self._refresh_start(stored, period) is not None
+
+    @staticmethod
+    def covered_from(df):
+        """
+        Timestamp from which `df` holds every bar, in the index's timezone.
+        Files written before this was recorded count from their first bar.
+        """
+        covered = df.attrs.get('covered_from')
+        return df.index[0] if covered is None else _as_tz(covered, df.index.tz)
+
+    def save(self, ticker, interval, df):
+        path = self.path(ticker, interval)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        retention = RETENTION.get(interval)
+        if retention is not None and not df.empty:
+            cutoff = df.index[-1] - retention
+            covered = max(self.covered_from(df), cutoff)
+            df = df[df.index >= cutoff]
+            df.attrs['covered_from'] = covered.isoformat()
+        # Write to a temporary file first so readers never see a partial file.
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        df.to_parquet(tmp)
+        os.replace(tmp, path)
+
+    def merge(self, ticker, interval, stored, new, full_period=None):
+        """
+        Adds `new` bars to `stored` and saves the result. `full_period` is
+        the period `new` was downloaded for, if it was a full-period
+        download; otherwise the new bars only count from their first one.
+        """
+        if new is None or new.empty:
+            return stored
+        exchange_tz = new.index.tz if is_intraday(interval) else None
+        new = _store_tz(_normalize(new.dropna(how='all')), interval)
+        if new.empty:
+            return stored
+        start = period_start(full_period, new.index.tz) if full_period is not None else None
+        starts = [new.index[0] if start is None else start]
+        if stored is None or stored.empty:
+            merged = new
+        else:
+            merged = _normalize(pd.concat([stored, new]))
+            starts.append(self.covered_from(stored))
+            if exchange_tz is None or str(exchange_tz) == 'UTC':
+                exchange_tz = stored.attrs.get('exchange_tz')
+        tz = merged.index.tz
+        merged.attrs['covered_from'] = min(_as_tz(s, tz) for s in starts).isoformat()
+        if exchange_tz is not None and str(exchange_tz) != 'UTC':
+            merged.attrs['exchange_tz'] = str(exchange_tz)
+        self.save(ticker, interval, merged)
+        return merged
+
+    def _refresh_start(self, stored, period):
+        """
+        Timestamp to resume downloading from, or None if the full period has
+        to be fetched: nothing is stored, the last bar is older than the
+        period, or the stored bars do not reach back to its start. The last
+        stored bar is fetched again because it may still have been forming
+        when it was saved.
+        """
+        if stored is None or stored.empty:
+            return None
+        last = stored.index[-1]
+        start = period_start(period, last.tz)
+        if start is None:
+            return last
+        if last < start or self.covered_from(stored) > start + COVERAGE_SLACK:
+            return None
+        return last
+
+    @staticmethod
+    def _trim(df, period):
+        offset = period_offset(period)
+        if df is None or df.empty or offset is None:
+            return df
+        now = pd.Timestamp.now(tz=df.index.tz)
+        return df[df.index >= now - offset]
+
+    def history(self, ticker, period, interval):
+        """
+        Single-ticker bars for the last `period`, served from disk and topped
+        up with whatever Yahoo has published since the last stored bar.
+        """
+        since = time.time()
+        return self.flights.do(('history', ticker, period, interval),
+                               lambda: self._history(ticker, period, interval, since))
+
+    def _history(self, ticker, period, interval, since):
+        stored = self.load(ticker, interval)
+        new = full_period = None
+        if not self.refreshed_since(ticker, interval, stored, period, since):
+            start = self._refresh_start(stored, period)
+            stock = yf.Ticker(ticker)
+            try:
+                with stage('yahoo_history'):
+                    if start is None:
+                        full_period = period
+                        new = stock.history(period=period, interval=interval)
+                    else:
+                        new = stock.history(start=start, interval=interval)
+            except Exception as e:
+                print(f"Error fetching {interval} history for {ticker}: {e}")
+        merged = self.merge(ticker, interval, stored, new, full_period)
+        if merged is None:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+        merged = self._trim(merged, period)
+        exchange_tz = merged.attrs.get('exchange_tz')
+        if exchange_tz is not None and merged.index.tz is not None:
+            merged.index = merged.index.tz_convert(exchange_tz)
+        return merged
+
+    def bulk_history(self, tickers, period, interval):
+        """
+        Wide (field, ticker) frame for many tickers. Tickers already on disk
+        share one incremental batched download from the oldest last bar among
+        them; the rest share one full-period batched download.
+        """
+        since = time.time()
+        return self.flights.do(('bulk', tuple(sorted(tickers)), period, interval),
+                               lambda: self._bulk_history(tickers, period, interval, since))
+
+    def _bulk_history(self, tickers, period, interval, since):
+        stored = {t: self.load(t, interval) for t in tickers}
+        # Tickers another worker refreshed while this call waited are current.
+        pending = [t for t in tickers if not self.refreshed_since(t, interval, stored[t], period, since)]
+        starts = {t: self._refresh_start(stored[t], period) for t in pending}
+        full = [t for t in pending if starts[t] is None]
+        incremental = [t for t in pending if starts[t] is not None]
+
+        downloads = []
+        if full:
+            downloads.append(download_wide(full, interval, period=period))
+        if incremental:
+            start = min(starts[t] for t in incremental)
+            downloads.append(download_wide(incremental, interval, start=start))
+
+        new_by_ticker = {}
+        for wide in downloads:
+            if wide.empty:
+                continue
+            for ticker in wide.columns.get_level_values(1).unique():
+                new_by_ticker[ticker] = wide.xs(ticker, axis=1, level=1)
+
+        frames = {}
+        for ticker in tickers:
+            merged = self.merge(ticker, interval, stored[ticker], new_by_ticker.get(ticker),
+                                period if ticker in full else None)
+            merged = self._trim(merged, period)
+            if merged is not None and not merged.empty:
+                frames[ticker] = merged
+
+        if not frames:
+            return pd.DataFrame(columns=pd.MultiIndex.from_arrays([[], []]))
+        wide = pd.concat(frames, axis=1).swaplevel(axis=1).sort_index(axis=1)
+        return wide.sort_index()
+
+
+store = OHLCVStore()
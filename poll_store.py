@@ -0,0 +1,255 @@
+import glob
+import os
+import threading
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from finviz_snapshot import parse_number
+
+POLL_DIR = os.environ.get('POLL_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'poll_data'))
+# Poll files a day partition may collect before they are merged into one.
+COMPACT_AFTER = 24
+# Rows sorted by metric are written in groups this size, so a query for one
+# metric only reads the groups whose min/max statistics can contain it.
+ROW_GROUP_SIZE = 16_384
+# How often every metric of a (ticker, source) is written again in full;
+# in between only changed values are stored.
+CHECKPOINT_INTERVAL = pd.Timedelta(hours=24)
+
+SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('us', tz='UTC')),
+    ('ticker', pa.string()),
+    ('source', pa.string()),
+    ('metric', pa.string()),
+    ('value', pa.float64()),
+    # Null for tombstones: the metric was missing from that poll of its
+    # ticker/source.
+    ('text', pa.string()),
+    # True for full checkpoints, False for change-only rows. Files written
+    # before delta writes existed have no such column and read as null,
+    # which counts as a checkpoint.
+    ('checkpoint', pa.bool_()),
+])
+SORT_KEYS = [('metric', 'ascending'), ('ticker', 'ascending'), ('timestamp', 'ascending')]
+KEY_COLUMNS = ['timestamp', 'ticker', 'source', 'metric']
+CHECKPOINT = ds.field('checkpoint').is_null() | ds.field('checkpoint')
+
+
+def _utc(timestamp):
+    timestamp = pd.Timestamp(timestamp)
+    return timestamp.tz_localize('UTC') if timestamp.tz is None else timestamp.tz_convert('UTC')
+
+
+def poll_rows(timestamp, ticker, source, data):
+    """
+    Long rows for one ticker/source of a poll from a frame with Metric and
+    Value columns. `value` is the parsed number (NaN for text such as a
+    sector name); `text` keeps what was scraped.
+    """
+    text = data['Value'].astype('str')
+    return pd.DataFrame({
+        'timestamp': _utc(timestamp),
+        'ticker': ticker,
+        'source': source,
+        'metric': data['Metric'].astype('str').to_numpy(),
+        'value': parse_number(text, dtype='float64').to_numpy(),
+        'text': text.to_numpy(),
+        'checkpoint': True,
+    })
+
+
+class PollStore:
+    """
+    Parquet dataset of every MAIN.py poll as typed long rows
+    (timestamp, ticker, source, metric, value, text), partitioned by UTC day
+    (`date=YYYY-MM-DD/`). Each poll appends one small file; once a day has
+    more than COMPACT_AFTER of them they are rewritten as a single file
+    sorted by metric, which keeps metric queries to a few row groups.
+    """
+
+    def __init__(self, root=POLL_DIR, compact_after=COMPACT_AFTER):
+        self.root = root
+        self.compact_after = compact_after
+
+    def partition(self, day):
+        return os.path.join(self.root, f"date={pd.Timestamp(day).strftime('%Y-%m-%d')}")
+
+    def _write(self, table, directory, prefix):
+        os.makedirs(directory, exist_ok=True)
+        name = f"{prefix}-{uuid.uuid4().hex}.parquet"
+        path = os.path.join(directory, name)
+        # Dataset discovery skips dot files, so readers never see a partial write.
+        tmp = os.path.join(directory, f".{name}.tmp")
+        pq.write_table(table, tmp, row_group_size=ROW_GROUP_SIZE, compression='zstd')
+        os.replace(tmp, path)
+        return path
+
+    def append(self, rows):
+        """
+        Writes one poll's rows (see poll_rows()). Returns the written paths.
+        """
+        if rows.empty:
+            return []
+        rows = rows.sort_values([key for key, _ in SORT_KEYS], kind='stable')
+        paths = []
+        for day, day_rows in rows.groupby(rows['timestamp'].dt.strftime('%Y-%m-%d')):
+            table = pa.Table.from_pandas(day_rows, schema=SCHEMA, preserve_index=False)
+            directory = self.partition(day)
+            paths.append(self._write(table, directory, 'poll'))
+            if len(glob.glob(os.path.join(directory, 'poll-*.parquet'))) > self.compact_after:
+                self.compact(day)
+        return paths
+
+    def compact(self, day):
+        """
+        Merges every file of one day partition into a single sorted file.
+        The new file is in place before the old ones are removed, so a reader
+        never misses rows (load_metric() drops the brief duplicates).
+        """
+        directory = self.partition(day)
+        files = sorted(glob.glob(os.path.join(directory, '*.parquet')))
+        if len(files) < 2:
+            return None
+        table = pq.ParquetDataset(files, schema=SCHEMA).read().sort_by(SORT_KEYS)
+        path = self._write(table, directory, 'part')
+        for old in files:
+            os.remove(old)
+        return path
+
+    def dataset(self):
+        date = pa.schema([('date', pa.string())])
+        return ds.dataset(self.root, format='parquet', schema=pa.unify_schemas([SCHEMA, date]),
+                          partitioning=ds.partitioning(date, flavor='hive'))
+
+    def _scan(self, condition, columns=None, start=None, end=None):
+        if not os.path.isdir(self.root):
+            return pd.DataFrame(columns=columns or SCHEMA.names)
+        if start is not None:
+            start = _utc(start)
+            condition &= ds.field('date') >= start.strftime('%Y-%m-%d')
+            condition &= ds.field('timestamp') >= pa.scalar(start.to_pydatetime(), pa.timestamp('us', tz='UTC'))
+        if end is not None:
+            end = _utc(end)
+            condition &= ds.field('date') <= end.strftime('%Y-%m-%d')
+            condition &= ds.field('timestamp') <= pa.scalar(end.to_pydatetime(), pa.timestamp('us', tz='UTC'))
+        table = self.dataset().to_table(columns=columns or SCHEMA.names, filter=condition)
+        return table.to_pandas()
+
+    def load_metric(self, metric, tickers=None, start=None, end=None, source=None, wide=False):
+        """
+        One metric across tickers and time. Day partitions outside
+        [start, end] are skipped and the metric/ticker filters are pushed
+        down to the Parquet row groups. Rows are the points where the value
+        was written (every checkpoint and every change). With `wide`,
+        returns a timestamp x ticker frame of values, carried forward
+        between changes.
+        """
+        condition = ds.field('metric') == metric
+        if tickers is not None:
+            condition &= ds.field('ticker').isin(list(tickers))
+        if source is not None:
+            condition &= ds.field('source') == source
+        df = self._scan(condition, start=start, end=end)
+        df = df.drop_duplicates(KEY_COLUMNS).sort_values(['timestamp', 'ticker']).reset_index(drop=True)
+        if wide:
+            # A tombstone ends the value carried forward instead of being
+            # skipped over like a missing number.
+            gone = df.assign(gone=df['text'].isna()).pivot_table(
+                index='timestamp', columns='ticker', values='gone', aggfunc='last')
+            values = df.pivot_table(index='timestamp', columns='ticker', values='value', aggfunc='last')
+            values = values.reindex(index=gone.index, columns=gone.columns).ffill()
+            return values.mask(gone.astype(float).ffill().fillna(0).astype(bool))
+        return df
+
+    def state_at(self, timestamp, tickers=None, source=None):
+        """
+        Every (ticker, source, metric) value as it stood at `timestamp`:
+        the latest checkpoint of each (ticker, source) up to then, with the
+        changes written after it applied on top.
+        """
+        end = _utc(timestamp)
+        condition = CHECKPOINT
+        if tickers is not None:
+            condition &= ds.field('ticker').isin(list(tickers))
+        if source is not None:
+            condition &= ds.field('source') == source
+        checkpoints = self._scan(condition, columns=['timestamp', 'ticker', 'source'], end=end)
+        if checkpoints.empty:
+            return pd.DataFrame(columns=SCHEMA.names)
+        since = checkpoints.groupby(['ticker', 'source'])['timestamp'].max().rename('since').reset_index()
+
+        condition = ds.field('ticker').isin(since['ticker'].unique().tolist())
+        if source is not None:
+            condition &= ds.field('source') == source
+        rows = self._scan(condition, start=since['since'].min(), end=end)
+        rows = rows.merge(since, on=['ticker', 'source'])
+        rows = rows[rows['timestamp'] >= rows['since']].drop(columns='since')
+        rows = rows.sort_values('timestamp', kind='stable')
+        state = rows.drop_duplicates(['ticker', 'source', 'metric'], keep='last')
+        state = state[state['text'].notna()]
+        return state.sort_values(['ticker', 'source', 'metric']).reset_index(drop=True)
+
+
+class DeltaWriter:
+    """
+    Sits in front of a PollStore and writes only what changed: it keeps the
+    last-seen text per (ticker, source, metric) and drops unchanged rows,
+    except that each (ticker, source) is written in full as a checkpoint on
+    first sight (e.g. after a restart) and then every `checkpoint_interval`.
+    Each ticker/source in a poll is taken as complete, so a metric it no
+    longer has is written once as a tombstone (NaN value, null text).
+    """
+
+    def __init__(self, store, checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.store = store
+        self.checkpoint_interval = checkpoint_interval
+        self.last_seen = {}      # (ticker, source, metric) -> text
+        self.checkpointed = {}   # (ticker, source) -> timestamp of last checkpoint
+        self.metrics = {}        # (ticker, source) -> metrics in its last poll
+        self.lock = threading.Lock()
+
+    def write(self, rows):
+        """
+        Writes the changed part of one poll (see poll_rows()). Returns
+        (rows written, rows polled).
+        """
+        if rows.empty:
+            return 0, 0
+        with self.lock:
+            keys = list(zip(rows['ticker'], rows['source']))
+            due = {key: ts for key, ts in zip(keys, rows['timestamp'])
+                   if key not in self.checkpointed or ts - self.checkpointed[key] >= self.checkpoint_interval}
+            checkpoint = pd.Series([key in due for key in keys], index=rows.index)
+
+            last_seen = self.last_seen
+            changed = pd.Series([last_seen.get((t, s, m), None) != text for t, s, m, text in
+                                 zip(rows['ticker'], rows['source'], rows['metric'], rows['text'])], index=rows.index)
+            out = rows[checkpoint | changed].copy()
+            out['checkpoint'] = checkpoint[out.index]
+
+            polled = {}
+            for ticker, source, metric, ts in zip(rows['ticker'], rows['source'], rows['metric'], rows['timestamp']):
+                polled.setdefault((ticker, source), (ts, set()))[1].add(metric)
+            removed = [(ts, ticker, source, metric) for (ticker, source), (ts, metrics) in polled.items()
+                       for metric in sorted(self.metrics.get((ticker, source), set()) - metrics)]
+            if removed:
+                tombstones = pd.DataFrame(removed, columns=['timestamp', 'ticker', 'source', 'metric'])
+                tombstones = tombstones.assign(value=float('nan'), text=None, checkpoint=False)
+                out = pd.concat([out, tombstones], ignore_index=True)
+            if not out.empty:
+                self.store.append(out)
+
+            for ts, ticker, source, metric in removed:
+                last_seen.pop((ticker, source, metric), None)
+            last_seen.update(zip(zip(rows['ticker'], rows['source'], rows['metric']), rows['text']))
+            self.metrics.update({key: metrics for key, (_, metrics) in polled.items()})
+            self.checkpointed.update(due)
+            return len(out), len(rows)
+
+
+poll_store = PollStore()
+delta_writer = DeltaWriter(poll_store)
@@ -0,0 +1,167 @@
+import time
+
+from lxml import etree
+
+import http_client
+from metrics import observe_stage, stage
+
+QUOTE_URL = "https://finviz.com/quote.ashx?t={ticker}"
+CHUNK_SIZE = 64 * 1024
+CLASSIFICATION = ['Sector', 'Industry', 'Country', 'Exchange']
+# Fallback when the quote-links block is renamed: the screener filter each
+# classification link points to.
+CLASSIFICATION_HREFS = {'Sector': 'f=sec_', 'Industry': 'f=ind_', 'Country': 'f=geo_', 'Exchange': 'f=exch_'}
+# Snapshot cells finvizfinance splits into two entries: (names, word positions).
+SPLIT_CELLS = {
+    'Volatility': (['Volatility W', 'Volatility M'], [0, 1]),
+    '52W Range': (['52W Range From', '52W Range To'], [0, 2]),
+}
+
+
+class QuotePageError(Exception):
+    pass
+
+
+def _classes(elem):
+    return (elem.get('class') or '').split()
+
+
+def _text(elem):
+    return ''.join(elem.itertext())
+
+
+class QuotePageParser:
+    """
+    Incremental lxml parser for a Finviz quote page that only keeps what
+    the pollers read: the company name, the classification links and the
+    snapshot-table2 cells. Feed it the page in chunks; feed() returns True
+    once the element holding the snapshot tables has closed, after which
+    the rest of the page need not be parsed.
+    """
+
+    def __init__(self, encoding='utf-8'):
+        self.parser = etree.HTMLPullParser(events=('end',), encoding=encoding)
+        self.company = None
+        self.links = None
+        self.href_links = {}
+        self.rows = []  # td texts of every snapshot-table2 row, in page order
+        self.tables_parent = None
+        self.done = False
+
+    def feed(self, data):
+        if self.done:
+            return True
+        self.parser.feed(data)
+        for _, elem in self.parser.read_events():
+            self._handle(elem)
+            if self.done:
+                break
+        return self.done
+
+    def _handle(self, elem):
+        tag = elem.tag
+        if tag == 'a':
+            href = elem.get('href') or ''
+            for key, token in CLASSIFICATION_HREFS.items():
+                if token in href and key not in self.href_links:
+                    self.href_links[key] = _text(elem).strip()
+        elif tag == 'h2' and self.company is None and 'quote-header_ticker-wrapper_company' in _classes(elem):
+            self.company = _text(elem).strip()
+        elif tag == 'div' and self.links is None and 'quote-links' in _classes(elem):
+            self.links = [_text(a).strip() for a in elem.iter('a')]
+        elif tag == 'table' and 'snapshot-table2' in _classes(elem):
+            for tr in elem.iter('tr'):
+                self.rows.append([_text(td) for td in tr.iter('td')])
+            if self.tables_parent is None:
+                self.tables_parent = elem.getparent()
+        elif self.tables_parent is not None and elem is self.tables_parent:
+            self.done = True
+
+    def classification(self):
+        result = dict.fromkeys(CLASSIFICATION)
+        for key, text in zip(CLASSIFICATION, self.links or []):
+            result[key] = text
+        for key in CLASSIFICATION:
+            if not result[key]:
+                result[key] = self.href_links.get(key)
+        return result
+
+    def fundament(self):
+        """
+        Same dict as finvizfinance(ticker).ticker_fundament() (raw values).
+        """
+        info = {}
+        if self.company is not None:
+            info['Company'] = self.company
+        info.update(self.classification())
+        for cols in self.rows:
+            header = ''
+            for i, value in enumerate(cols):
+                if i % 2 == 0:
+                    header = value
+                    continue
+                if header in SPLIT_CELLS:
+                    names, positions = SPLIT_CELLS[header]
+                    words = value.split()
+                    if len(words) <= max(positions):
+                        info[header] = words
+                    else:
+                        info.update({name: words[pos] for name, pos in zip(names, positions)})
+                    continue
+                if header == 'EPS next Y' and header in info:
+                    header += ' Percentage'
+                info[header] = value
+        return info
+
+    def snapshot(self):
+        """
+        Label -> value for every snapshot-table2 cell pair, as the manual
+        scraper reported them.
+        """
+        data = {}
+        for cols in self.rows:
+            for label, value in zip(cols[0::2], cols[1::2]):
+                data[label.strip()] = value.strip()
+        return data
+
+
+def parse_quote_page(html):
+    """
+    (fundament, snapshot) from a complete page, as str or bytes.
+    """
+    parser = QuotePageParser()
+    parser.feed(html.encode('utf-8') if isinstance(html, str) else html)
+    return parser.fundament(), parser.snapshot()
+
+
+def fetch_quote_page(ticker, headers=None, rate_limiter=None):
+    """
+    Downloads one quote page and parses it while it streams in. Returns
+    (fundament, snapshot); raises QuotePageError on an HTTP error or when
+    the page has no snapshot table.
+    """
+    url = QUOTE_URL.format(ticker=ticker)
+    with stage('quote_request'):
+        response = http_client.session.get(url, headers=headers, stream=True, rate_limiter=rate_limiter)
+    with response:
+        if response.status_code != 200:
+            raise QuotePageError(f"HTTP Error {response.status_code} for {ticker}")
+        parser = QuotePageParser(encoding=response.encoding or 'utf-8')
+        chunks = response.iter_content(CHUNK_SIZE)
+        parse_time = 0.0
+        start = time.perf_counter()
+        for chunk in chunks:
+            mark = time.perf_counter()
+            done = parser.feed(chunk)
+            parse_time += time.perf_counter() - mark
+            if done:
+                break
+        observe_stage('quote_parse', parse_time)
+        observe_stage('quote_read', time.perf_counter() - start - parse_time)
+        # Read (without parsing) what is left so the connection goes back
+        # to the keep-alive pool instead of being dropped.
+        for _ in chunks:
+            pass
+    if not parser.rows:
+        raise QuotePageError(f"No snapshot table on the quote page for {ticker}")
+    return parser.fundament(), parser.snapshot()
@@ -0,0 +1,70 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows `rate` acquisitions per second on
+    average with bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def acquire(self):
+        """
+        Blocks until a token is available and returns the time spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class HostRateLimiter:
+    """
+    One token bucket per host, created on first use. `rates` overrides the
+    default requests-per-second for specific hosts.
+    """
+
+    def __init__(self, default_rate=2.0, rates=None, burst=None):
+        self.default_rate = default_rate
+        self.rates = rates or {}
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url_or_host):
+        host = urlparse(url_or_host).hostname if '//' in url_or_host else url_or_host
+        host = (host or '').lower()
+        # elite.finviz.com and finviz.com share the same backend limits.
+        parts = host.split('.')
+        return '.'.join(parts[-2:]) if len(parts) > 2 else host
+
+    def bucket(self, url_or_host):
+        host = self.host_of(url_or_host)
+        with self.lock:
+            if host not in self.buckets:
+                rate = self.rates.get(host, self.default_rate)
+                self.buckets[host] = TokenBucket(rate, self.burst)
+            return self.buckets[host]
+
+    def acquire(self, url_or_host):
+        return self.bucket(url_or_host).acquire()
@@ -0,0 +1,349 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from io import BytesIO
+
+import pandas as pd
+import requests
+import urllib3
+import yfinance as yf
+from requests.adapters import HTTPAdapter
+
+import http_client
+from ohlcv_store import period_offset
+
+FIXTURE_DIR = os.environ.get('STOCK_FIXTURES', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures'))
+# Set to 'record' or 'replay' to have install_from_env() switch the apps and
+# MAIN.py over; STOCK_REPLAY_LATENCY adds that many seconds per replayed call.
+MODES = ('record', 'replay')
+# Recorded bodies are stored decoded, so these no longer describe them.
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+
+class ReplayMiss(requests.ConnectionError):
+    """
+    A request with no recorded response and no route. Subclasses
+    ConnectionError so callers handle it like the network being down.
+    """
+
+
+def fixture_key(*parts):
+    return hashlib.sha1('\x1f'.join(str(p) for p in parts).encode('utf-8')).hexdigest()[:20]
+
+
+def _write_atomic(path, write):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def build_response(method, url, status, headers, body):
+    """
+    A requests.Response served from memory that behaves like a live one:
+    .content, .text, iter_content() and .raw reads all work.
+    """
+    raw = urllib3.HTTPResponse(body=BytesIO(body), headers=headers, status=status,
+                               preload_content=False, decode_content=False)
+    request = requests.Request(method, url).prepare()
+    return HTTPAdapter().build_response(request, raw)
+
+
+def _naive(timestamp):
+    timestamp = pd.Timestamp(timestamp)
+    return timestamp.tz_localize(None) if timestamp.tz is not None else timestamp
+
+
+def _shift_to_now(df):
+    # Move recorded bars forward by whole weeks so the last one falls in the
+    # current week: the stores trim by wall-clock period, and weekday
+    # patterns (weekends, sessions) stay where they were.
+    if df.empty:
+        return df
+    last = df.index[-1]
+    now = pd.Timestamp.now(tz=last.tz)
+    weeks = (now - last) // pd.Timedelta(weeks=1)
+    if weeks > 0:
+        df = df.copy()
+        df.index = df.index + pd.Timedelta(weeks=weeks)
+    return df
+
+
+def _window(df, period=None, start=None):
+    """
+    Cuts a recorded series down to what a live call with these arguments
+    would have returned.
+    """
+    if df.empty:
+        return df
+    if start is not None:
+        naive = df.index.tz_localize(None) if df.index.tz is not None else df.index
+        return df[naive >= _naive(start)]
+    offset = period_offset(period)
+    if offset is None:
+        return df
+    return df[df.index >= df.index[-1] - offset]
+
+
+class Replayer:
+    """
+    Records the project's network calls to disk and plays them back offline.
+
+    Covers HTTP made through requests (the shared PooledSession, the Finviz
+    export and quote pages, finvizfinance) and the yfinance entry points the
+    code uses: yf.download() and yf.Ticker().history() / .info.
+
+    In 'record' mode calls go to the network as usual and every response
+    is written under `fixture_dir`. In 'replay' mode nothing leaves the
+    machine: responses come from `routes` (synthetic handlers, checked
+    first) or from the fixtures, and a call with neither raises ReplayMiss
+    (HTTP) or returns an empty frame (yfinance, like a failed download).
+    Replayed calls skip the rate limiter and retries; `latency` (seconds,
+    or a callable taking the URL or call name) and `jitter` stand in for
+    the network time instead.
+    """
+
+    def __init__(self, fixture_dir=FIXTURE_DIR, mode='replay', latency=0.0, jitter=0.0, shift_to_now=True):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, not {mode!r}")
+        self.fixture_dir = fixture_dir
+        self.mode = mode
+        self.latency = latency
+        self.jitter = jitter
+        self.shift_to_now = shift_to_now
+        self.routes = []          # (url regex, handler)
+        self.yfinance_source = None
+        self.calls = {'hit': 0, 'route': 0, 'miss': 0, 'recorded': 0}
+        self._patched = []
+        self._lock = threading.Lock()
+
+    def route(self, pattern, handler):
+        """
+        Serves URLs matching `pattern` from handler(method, url), which
+        returns the body as bytes/str or a (status, headers, body) tuple.
+        """
+        self.routes.append((re.compile(pattern), handler))
+        return self
+
+    def _count(self, kind):
+        with self._lock:
+            self.calls[kind] += 1
+
+    def delay(self, target):
+        latency = self.latency(target) if callable(self.latency) else self.latency
+        wait = latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if wait > 0:
+            time.sleep(wait)
+
+    # -- HTTP -------------------------------------------------------------
+
+    def _http_paths(self, method, url):
+        base = os.path.join(self.fixture_dir, 'http', fixture_key(method.upper(), url))
+        return f"{base}.json", f"{base}.body"
+
+    def _save_http(self, method, url, response):
+        body = response.content
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS}
+        meta_path, body_path = self._http_paths(method, url)
+
+        def write_body(tmp):
+            with open(tmp, 'wb') as f:
+                f.write(body)
+
+        def write_meta(tmp):
+            with open(tmp, 'w') as f:
+                json.dump({'method': method.upper(), 'url': url, 'status': response.status_code,
+                           'headers': headers}, f, indent=1)
+
+        _write_atomic(body_path, write_body)
+        _write_atomic(meta_path, write_meta)
+        self._count('recorded')
+        return build_response(method, url, response.status_code, headers, body)
+
+    def _replay_http(self, method, url):
+        for pattern, handler in self.routes:
+            if pattern.search(url):
+                result = handler(method, url)
+                status, headers, body = result if isinstance(result, tuple) else (200, {}, result)
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+                    headers = {'Content-Type': 'text/html; charset=utf-8', **headers}
+                self._count('route')
+                self.delay(url)
+                return build_response(method, url, status, headers, body)
+
+        meta_path, body_path = self._http_paths(method, url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except FileNotFoundError:
+            self._count('miss')
+            raise ReplayMiss(f"No recorded response for {method.upper()} {url}") from None
+        self._count('hit')
+        self.delay(url)
+        return build_response(method, url, meta['status'], meta['headers'], body)
+
+    def _http_wrapper(self, original):
+        replayer = self
+
+        def request(session, method, url, *args, **kwargs):
+            params = args[0] if args else kwargs.get('params')
+            full_url = requests.Request(method, url, params=params).prepare().url
+            if replayer.mode == 'replay':
+                return replayer._replay_http(method, full_url)
+            response = original(session, method, url, *args, **kwargs)
+            return replayer._save_http(method, full_url, response)
+
+        return request
+
+    # -- yfinance ---------------------------------------------------------
+
+    def _frame_path(self, *parts):
+        return os.path.join(self.fixture_dir, 'yfinance', f"{parts[0]}-{fixture_key(*parts)}.parquet")
+
+    def _save_frame(self, path, df):
+        if df is None or df.empty:
+            return
+        if os.path.exists(path):
+            # Incremental refreshes add to what an earlier call recorded.
+            df = pd.concat([pd.read_parquet(path), df])
+            df = df[~df.index.duplicated(keep='last')].sort_index()
+        _write_atomic(path, df.to_parquet)
+        self._count('recorded')
+
+    def _load_frame(self, path, kind, symbols, interval, period, start):
+        if self.yfinance_source is not None:
+            df = self.yfinance_source(kind, symbols, interval, period, start)
+            if df is not None:
+                self._count('route')
+                return df
+        if not os.path.exists(path):
+            self._count('miss')
+            print(f"Replay: no recorded {kind} for {symbols} ({interval})")
+            return pd.DataFrame()
+        df = pd.read_parquet(path)
+        if self.shift_to_now:
+            df = _shift_to_now(df)
+        self._count('hit')
+        return _window(df, period, start)
+
+    def _download_wrapper(self, original):
+        replayer = self
+
+        def download(tickers, *args, interval='1d', period=None, start=None, **kwargs):
+            symbols = [tickers] if isinstance(tickers, str) else list(tickers)
+            path = replayer._frame_path('download', ','.join(sorted(symbols)), interval)
+            if replayer.mode == 'record':
+                df = original(tickers, *args, interval=interval, period=period, start=start, **kwargs)
+                replayer._save_frame(path, df)
+                return df
+            df = replayer._load_frame(path, 'download', symbols, interval, period, start)
+            replayer.delay('download')
+            return df
+
+        return download
+
+    def _ticker_class(self, original):
+        replayer = self
+
+        class Ticker:
+            """
+            yf.Ticker stand-in that records or replays history() and .info.
+            """
+
+            def __init__(self, ticker, *args, **kwargs):
+                self.ticker = ticker
+                self._live = original(ticker, *args, **kwargs) if replayer.mode == 'record' else None
+
+            def history(self, period=None, interval='1d', start=None, **kwargs):
+                path = replayer._frame_path('history', self.ticker, interval)
+                if self._live is not None:
+                    df = self._live.history(period=period, interval=interval, start=start, **kwargs)
+                    replayer._save_frame(path, df)
+                    return df
+                df = replayer._load_frame(path, 'history', [self.ticker], interval, period, start)
+                replayer.delay('history')
+                return df
+
+            @property
+            def info(self):
+                path = os.path.join(replayer.fixture_dir, 'yfinance', f"info-{fixture_key(self.ticker)}.json")
+                if self._live is not None:
+                    info = self._live.info
+
+                    def write(tmp):
+                        with open(tmp, 'w') as f:
+                            json.dump(info, f, default=str)
+
+                    _write_atomic(path, write)
+                    replayer._count('recorded')
+                    return info
+                if replayer.yfinance_source is not None:
+                    info = replayer.yfinance_source('info', [self.ticker], None, None, None)
+                    if info is not None:
+                        replayer._count('route')
+                        return info
+                replayer.delay('info')
+                try:
+                    with open(path) as f:
+                        info = json.load(f)
+                except FileNotFoundError:
+                    replayer._count('miss')
+                    return {}
+                replayer._count('hit')
+                return info
+
+        return Ticker
+
+    # -- install ----------------------------------------------------------
+
+    def _patch(self, owner, name, value):
+        self._patched.append((owner, name, owner.__dict__[name]))
+        setattr(owner, name, value)
+
+    def install(self):
+        """
+        Patches requests, the shared session and yfinance in place. Modules
+        look these up at call time, so anything already imported is covered.
+        """
+        if self._patched:
+            return self
+        self._patch(requests.Session, 'request', self._http_wrapper(requests.Session.request))
+        if self.mode == 'replay':
+            # Skip the pooled session's rate limiter and retries as well;
+            # when recording they stay in front of the real requests.
+            self._patch(http_client.PooledSession, 'request', self._http_wrapper(None))
+        self._patch(yf, 'download', self._download_wrapper(yf.download))
+        self._patch(yf, 'Ticker', self._ticker_class(yf.Ticker))
+        print(f"Replay harness installed in {self.mode} mode ({self.fixture_dir})")
+        return self
+
+    def uninstall(self):
+        while self._patched:
+            owner, name, value = self._patched.pop()
+            setattr(owner, name, value)
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+
+def install_from_env():
+    """
+    Installs a Replayer when STOCK_REPLAY is 'record' or 'replay'.
+    Returns it, or None when the variable is unset.
+    """
+    mode = os.environ.get('STOCK_REPLAY', '').strip().lower()
+    if not mode:
+        return None
+    latency = float(os.environ.get('STOCK_REPLAY_LATENCY', '0') or 0)
+    return Replayer(mode=mode, latency=latency).install()
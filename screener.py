@@ -0,0 +1,393 @@
+"""
+Small expression language for screening the Finviz snapshot locally, e.g.
+
+    P/E < 20 and ROE > 15 and Change 1w > 5
+    zscore(P/E by Sector) < -1 and not Sector == 'Utilities'
+    rank(Market Cap by Industry) <= 3
+
+Column names are matched as written (longest name first, so `P/E` is one
+column, not a division); `{Any Name}` quotes a column explicitly. Functions:
+rank (1 = largest), pct_rank (0-1, ascending) and zscore, each optionally
+computed per group with `by <column>`, plus abs. Expressions compile once to
+a tree of vectorized pandas operations and are cached per column set.
+
+Percent fields (ROE, Change, margins, growth) are in percent units, as
+parsed from the export: `ROE > 15` means above 15%, and `ROE > 0.15`
+matches nearly every profitable company.
+"""
+import functools
+import re
+
+import numpy as np
+import pandas as pd
+
+FUNCTIONS = ('rank', 'pct_rank', 'zscore', 'abs')
+KEYWORDS = ('and', 'or', 'not', 'by', 'contains')
+COMPARISONS = {'<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge', '=': 'eq', '==': 'eq', '!=': 'ne'}
+
+NUMBER = re.compile(r"\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?")
+STRING = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+OPERATOR = re.compile(r"<=|>=|==|!=|<|>|=|[-+*/()]")
+WORD = re.compile(r"[A-Za-z_]\w*")
+
+
+class ScreenError(ValueError):
+    pass
+
+
+def tokenize(expression, columns):
+    """
+    Splits an expression into (kind, value) tokens. `columns` decides what
+    counts as a column name; the longest name matching at a position wins.
+    """
+    names = sorted(columns, key=len, reverse=True)
+    tokens, i, n = [], 0, len(expression)
+    while i < n:
+        ch = expression[i]
+        if ch.isspace():
+            i += 1
+            continue
+        if ch == '{':
+            end = expression.find('}', i)
+            if end < 0:
+                raise ScreenError(f"Unclosed '{{' at position {i}")
+            tokens.append(('column', expression[i + 1:end]))
+            i = end + 1
+            continue
+
+        word = WORD.match(expression, i)
+        if word and word.group().lower() in FUNCTIONS + KEYWORDS:
+            tokens.append(('keyword', word.group().lower()))
+            i = word.end()
+            continue
+
+        column = next((c for c in names if expression.startswith(c, i)
+                       and not (expression[i + len(c):i + len(c) + 1].isalnum() and c[-1:].isalnum())), None)
+        if column is not None:
+            tokens.append(('column', column))
+            i += len(column)
+            continue
+
+        for kind, pattern in (('number', NUMBER), ('string', STRING), ('op', OPERATOR)):
+            match = pattern.match(expression, i)
+            if match:
+                if kind == 'number':
+                    value = float(match.group())
+                elif kind == 'string':
+                    value = match.group(1) if match.group(1) is not None else match.group(2)
+                else:
+                    value = match.group()
+                tokens.append((kind, value))
+                i = match.end()
+                break
+        else:
+            word = WORD.match(expression, i)
+            raise ScreenError(f"Unknown column or symbol {word.group() if word else ch!r} at position {i}")
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive-descent parser producing nested tuples:
+    ('col', name), ('num', x), ('str', s), ('neg', a), ('arith', op, a, b),
+    ('cmp', op, a, b), ('contains', a, s), ('and', a, b), ('or', a, b),
+    ('not', a), ('func', name, a, group_column).
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if token[0] is None or (kind and token[0] != kind) or (value and token[1] != value):
+            expected = value or kind or 'more input'
+            raise ScreenError(f"Expected {expected!r}, got {token[1]!r}")
+        self.pos += 1
+        return token
+
+    def accept(self, kind, value):
+        if self.peek() == (kind, value):
+            self.pos += 1
+            return True
+        return False
+
+    def parse(self):
+        node = self.or_()
+        if self.pos != len(self.tokens):
+            raise ScreenError(f"Unexpected {self.peek()[1]!r}")
+        return node
+
+    def or_(self):
+        node = self.and_()
+        while self.accept('keyword', 'or'):
+            node = ('or', node, self.and_())
+        return node
+
+    def and_(self):
+        node = self.not_()
+        while self.accept('keyword', 'and'):
+            node = ('and', node, self.not_())
+        return node
+
+    def not_(self):
+        if self.accept('keyword', 'not'):
+            return ('not', self.not_())
+        return self.comparison()
+
+    def comparison(self):
+        left = self.sum()
+        kind, value = self.peek()
+        if kind == 'op' and value in COMPARISONS:
+            self.pos += 1
+            return ('cmp', COMPARISONS[value], left, self.sum())
+        if self.accept('keyword', 'contains'):
+            return ('contains', left, self.take('string')[1])
+        return left
+
+    def sum(self):
+        node = self.term()
+        while self.peek() in (('op', '+'), ('op', '-')):
+            node = ('arith', self.take()[1], node, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self.peek() in (('op', '*'), ('op', '/')):
+            node = ('arith', self.take()[1], node, self.unary())
+        return node
+
+    def unary(self):
+        if self.accept('op', '-'):
+            return ('neg', self.unary())
+        return self.atom()
+
+    def atom(self):
+        kind, value = self.peek()
+        if kind == 'number':
+            self.pos += 1
+            return ('num', value)
+        if kind == 'string':
+            self.pos += 1
+            return ('str', value)
+        if kind == 'column':
+            self.pos += 1
+            return ('col', value)
+        if kind == 'keyword' and value in FUNCTIONS:
+            self.pos += 1
+            self.take('op', '(')
+            arg = self.sum()
+            group = self.take('column')[1] if self.accept('keyword', 'by') else None
+            self.take('op', ')')
+            return ('func', value, arg, group)
+        if self.accept('op', '('):
+            node = self.or_()
+            self.take('op', ')')
+            return node
+        raise ScreenError(f"Unexpected {value!r}" if kind else "Expression ended too early")
+
+
+def _columns_in(node):
+    if node[0] == 'col':
+        return {node[1]}
+    names = set()
+    for child in node[1:]:
+        if isinstance(child, tuple):
+            names |= _columns_in(child)
+    if node[0] == 'func' and node[3]:
+        names.add(node[3])
+    return names
+
+
+class Expression:
+    """
+    A compiled screen. evaluate() returns a Series aligned with the frame;
+    mask() a boolean NumPy array where missing values never match.
+    Conditions are three-valued: a comparison involving a missing value is
+    NA, and stays NA under `not`, so it cannot turn into a match.
+    """
+
+    def __init__(self, source, tree):
+        self.source = source
+        self.tree = tree
+        self.columns = _columns_in(tree)
+
+    def evaluate(self, df, memo=None):
+        missing = self.columns - set(df.columns)
+        if missing:
+            raise ScreenError(f"Unknown column(s): {', '.join(sorted(missing))}")
+        try:
+            return _evaluate(self.tree, df, {} if memo is None else memo)
+        except ScreenError:
+            raise
+        except (TypeError, ValueError) as e:
+            # Anything the checks in _evaluate do not anticipate.
+            raise ScreenError(f"Cannot evaluate {self.source!r}: {e}") from e
+
+    def mask(self, df, memo=None):
+        result = self.evaluate(df, memo)
+        if not _is_condition(result):
+            raise ScreenError(f"{self.source!r} is not a condition")
+        return result.fillna(False).to_numpy(dtype=bool)
+
+
+@functools.lru_cache(maxsize=512)
+def _compile(expression, columns):
+    return Expression(expression, _Parser(tokenize(expression, columns)).parse())
+
+
+def compile_expression(expression, columns):
+    """
+    Parses `expression` against the given column names. Results are cached,
+    so re-running a screen on a new snapshot with the same columns is free.
+    """
+    return _compile(expression.strip(), tuple(columns))
+
+
+def _numeric(values):
+    if isinstance(values, pd.Series) and not pd.api.types.is_numeric_dtype(values.dtype):
+        return pd.to_numeric(values, errors='coerce')
+    return values
+
+
+def _is_text(value):
+    if isinstance(value, pd.Series):
+        return not pd.api.types.is_numeric_dtype(value.dtype) and not pd.api.types.is_bool_dtype(value.dtype)
+    return isinstance(value, str)
+
+
+def _is_condition(value):
+    return isinstance(value, pd.Series) and pd.api.types.is_bool_dtype(value.dtype)
+
+
+def _number_operand(value, op):
+    if isinstance(value, str):
+        raise ScreenError(f"Cannot use text {value!r} with {op!r}")
+    if _is_condition(value):
+        raise ScreenError(f"Cannot use a condition with {op!r}")
+    return _numeric(value)
+
+
+def _condition_operand(value, op):
+    if not _is_condition(value):
+        shown = value.name if isinstance(value, pd.Series) else value
+        raise ScreenError(f"{op!r} needs conditions on both sides, not {shown!r}")
+    return value.astype('boolean')
+
+
+def _compare(left, op, right, index):
+    """
+    Nullable boolean Series: NA wherever either side is missing. Text is
+    compared with text, numbers with numbers; mixing them is an error.
+    """
+    symbol = next(s for s, name in COMPARISONS.items() if name == op)
+    if _is_condition(left) or _is_condition(right):
+        raise ScreenError(f"Cannot compare a condition with {symbol!r}")
+    if _is_text(left) or _is_text(right):
+        if not (_is_text(left) and _is_text(right)):
+            raise ScreenError(f"Cannot compare text with a number using {symbol!r}")
+        # Categoricals only support ==/!=; as strings every operator works.
+        left = left.astype('string') if isinstance(left, pd.Series) else left
+        right = right.astype('string') if isinstance(right, pd.Series) else right
+    else:
+        left, right = _numeric(left), _numeric(right)
+    if not isinstance(left, pd.Series):
+        left = pd.Series(left, index=index)
+    missing = left.isna()
+    if isinstance(right, pd.Series):
+        missing |= right.isna()
+    return getattr(left, op)(right).astype('boolean').mask(missing)
+
+
+def _group_stat(name, values, groups):
+    grouped = values.groupby(groups) if groups is not None else None
+    if name == 'rank':
+        return grouped.rank(ascending=False, method='min') if grouped is not None else values.rank(ascending=False, method='min')
+    if name == 'pct_rank':
+        return grouped.rank(pct=True) if grouped is not None else values.rank(pct=True)
+    mean = grouped.transform('mean') if grouped is not None else values.mean()
+    std = grouped.transform('std') if grouped is not None else values.std()
+    return (values - mean) / std
+
+
+def _evaluate(node, df, memo):
+    kind = node[0]
+    if kind == 'col':
+        return df[node[1]]
+    if kind in ('num', 'str'):
+        return node[1]
+    if kind == 'neg':
+        return -_number_operand(_evaluate(node[1], df, memo), '-')
+    if kind == 'arith':
+        op = node[1]
+        left = _number_operand(_evaluate(node[2], df, memo), op)
+        right = _number_operand(_evaluate(node[3], df, memo), op)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if op == '+':
+                return left + right
+            if op == '-':
+                return left - right
+            if op == '*':
+                return left * right
+            return left / right
+    if kind == 'cmp':
+        return _compare(_evaluate(node[2], df, memo), node[1], _evaluate(node[3], df, memo), df.index)
+    if kind == 'contains':
+        values = _evaluate(node[1], df, memo)
+        if not isinstance(values, pd.Series):
+            raise ScreenError("'contains' needs a column on its left")
+        found = values.astype(str).str.contains(node[2], case=False, regex=False)
+        return found.astype('boolean').mask(values.isna())
+    if kind == 'and':
+        return (_condition_operand(_evaluate(node[1], df, memo), 'and')
+                & _condition_operand(_evaluate(node[2], df, memo), 'and'))
+    if kind == 'or':
+        return (_condition_operand(_evaluate(node[1], df, memo), 'or')
+                | _condition_operand(_evaluate(node[2], df, memo), 'or'))
+    if kind == 'not':
+        return ~_condition_operand(_evaluate(node[1], df, memo), 'not')
+    if kind == 'func':
+        # Cross-sectional statistics are shared by every screen run against
+        # the same frame through `memo`.
+        if node not in memo:
+            values = _number_operand(_evaluate(node[2], df, memo), node[1])
+            if node[1] == 'abs':
+                memo[node] = values.abs()
+            else:
+                memo[node] = _group_stat(node[1], values, df[node[3]] if node[3] else None)
+        return memo[node]
+    raise ScreenError(f"Cannot evaluate {kind!r}")
+
+
+class Screener:
+    """
+    Runs screens against one snapshot frame. Group statistics (ranks,
+    z-scores) are computed once and reused by every screen on the frame.
+
+        screener = Screener(df)
+        cheap = screener.screen("P/E < 20 and ROE > 15")
+        results = screener.run({'value': "P/E < 15", 'momentum': "Change 1w > 5"})
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.columns = tuple(df.columns)
+        self.memo = {}
+
+    def compile(self, expression):
+        return compile_expression(expression, self.columns)
+
+    def mask(self, expression):
+        return self.compile(expression).mask(self.df, self.memo)
+
+    def screen(self, expression):
+        return self.df[self.mask(expression)]
+
+    def run(self, screens):
+        """
+        Evaluates a {name: expression} mapping and returns {name: frame}.
+        """
+        return {name: self.screen(expression) for name, expression in screens.items()}
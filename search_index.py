@@ -0,0 +1,131 @@
+import bisect
+import threading
+
+import pandas as pd
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """
+    Prefix and trigram index over Ticker and Company for search-as-you-type.
+
+    Prefix lookups bisect a sorted key list kept parallel to a ticker list;
+    the keys are the ticker and every word of the company name. Queries of
+    three or more characters also match anywhere in the text through the
+    trigram postings. sync() only touches tickers whose entry changed, so refreshing
+    after a new snapshot costs as much as the number of changed rows.
+    """
+
+    def __init__(self):
+        self.entries = {}   # ticker -> lowercased "ticker company" text
+        self.keys = []      # sorted prefix keys
+        self.key_tickers = []  # ticker for each entry of self.keys
+        self.postings = {}  # trigram -> set of tickers
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def _text(ticker, company):
+        company = '' if company is None or pd.isna(company) else str(company)
+        return f"{ticker} {company}".lower().strip()
+
+    def _add(self, ticker, text):
+        self.entries[ticker] = text
+        for key in set(text.split()):
+            i = bisect.bisect_right(self.keys, key)
+            self.keys.insert(i, key)
+            self.key_tickers.insert(i, ticker)
+        for gram in _trigrams(text):
+            self.postings.setdefault(gram, set()).add(ticker)
+
+    def _remove(self, ticker):
+        text = self.entries.pop(ticker)
+        for key in set(text.split()):
+            i = bisect.bisect_left(self.keys, key)
+            while i < len(self.keys) and self.keys[i] == key:
+                if self.key_tickers[i] == ticker:
+                    del self.keys[i]
+                    del self.key_tickers[i]
+                    break
+                i += 1
+        for gram in _trigrams(text):
+            tickers = self.postings.get(gram)
+            if tickers is not None:
+                tickers.discard(ticker)
+                if not tickers:
+                    del self.postings[gram]
+
+    def sync(self, df):
+        """
+        Brings the index in line with a snapshot frame. Returns the number of
+        tickers added, changed or removed.
+        """
+        if 'Ticker' not in df.columns:
+            return 0
+        companies = df['Company'] if 'Company' in df.columns else [None] * len(df)
+        wanted = {str(t): self._text(str(t), c) for t, c in zip(df['Ticker'], companies) if not pd.isna(t)}
+
+        with self.lock:
+            if not self.entries:
+                # Cold build: sort once instead of inserting one by one.
+                self.entries = dict(wanted)
+                pairs = sorted({(key, t) for t, text in wanted.items() for key in text.split()})
+                self.keys = [key for key, _ in pairs]
+                self.key_tickers = [t for _, t in pairs]
+                self.postings = {}
+                for ticker, text in wanted.items():
+                    for gram in _trigrams(text):
+                        self.postings.setdefault(gram, set()).add(ticker)
+                return len(wanted)
+
+            changed = 0
+            for ticker in [t for t in self.entries if t not in wanted]:
+                self._remove(ticker)
+                changed += 1
+            for ticker, text in wanted.items():
+                old = self.entries.get(ticker)
+                if old == text:
+                    continue
+                if old is not None:
+                    self._remove(ticker)
+                self._add(ticker, text)
+                changed += 1
+            return changed
+
+    def _prefix_matches(self, prefix):
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + '\uffff', lo)
+        return self.key_tickers[lo:hi]
+
+    def search(self, query):
+        """
+        Tickers matching `query`, best first: exact ticker, then ticker or
+        company-word prefixes, then substring matches.
+        """
+        query = (query or '').strip().lower()
+        if not query:
+            return []
+        with self.lock:
+            ranked = {}
+            if query.upper() in self.entries:
+                ranked[query.upper()] = None
+            words = query.split()
+            prefix_matches = self._prefix_matches(words[0])
+            if len(words) > 1:
+                entries = self.entries
+                prefix_matches = [t for t in prefix_matches if query in entries[t]]
+            ranked.update(dict.fromkeys(prefix_matches))
+
+            if len(query) >= 3:
+                grams = sorted(_trigrams(query), key=lambda g: len(self.postings.get(g, ())))
+                candidates = set(self.postings.get(grams[0], ()))
+                for gram in grams[1:]:
+                    if not candidates:
+                        break
+                    candidates &= self.postings.get(gram, set())
+                candidates.difference_update(ranked)
+                entries = self.entries
+                ranked.update(dict.fromkeys(sorted(t for t in candidates if query in entries[t])))
+            return list(ranked)
@@ -0,0 +1,65 @@
+import os
+import pickle
+
+import pandas as pd
+import pyarrow as pa
+from flask_caching.backends.filesystemcache import FileSystemCache
+
+# One directory shared by every worker of both Dash apps.
+SHARED_CACHE_DIR = os.environ.get(
+    'STOCK_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache_data'))
+
+ARROW_TAG = b'A'
+PICKLE_TAG = b'P'
+IPC_OPTIONS = pa.ipc.IpcWriteOptions(compression='lz4')
+
+
+class ArrowSerializer:
+    """
+    Writes DataFrames as compressed Arrow IPC streams and everything else
+    (memoize version keys, dicts, ...) as pickle. Frames that Arrow cannot
+    represent, such as object columns mixing numbers and strings, fall back
+    to pickle as well.
+    """
+
+    def dump(self, value, f):
+        if isinstance(value, pd.DataFrame):
+            try:
+                table = pa.Table.from_pandas(value, preserve_index=True)
+            except (pa.ArrowException, TypeError, ValueError):
+                table = None
+            if table is not None:
+                f.write(ARROW_TAG)
+                with pa.ipc.new_stream(f, table.schema, options=IPC_OPTIONS) as writer:
+                    writer.write_table(table)
+                return
+        f.write(PICKLE_TAG)
+        pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+
+    def load(self, f):
+        tag = f.read(1)
+        if tag == ARROW_TAG:
+            return pa.ipc.open_stream(f).read_all().to_pandas()
+        if tag == PICKLE_TAG:
+            return pickle.load(f)
+        raise ValueError(f"Unknown cache entry format {tag!r}")
+
+
+class ArrowFileSystemCache(FileSystemCache):
+    """
+    Flask-Caching filesystem backend that every gunicorn worker and both
+    apps can point at, so a Finviz export or Yahoo history downloaded by one
+    process is reused by the others. Use it with
+    CACHE_TYPE='shared_cache.ArrowFileSystemCache'.
+    """
+
+    serializer = ArrowSerializer()
+
+
+def shared_cache_config(default_timeout=600):
+    return {
+        'CACHE_TYPE': 'shared_cache.ArrowFileSystemCache',
+        'CACHE_DIR': SHARED_CACHE_DIR,
+        'CACHE_DEFAULT_TIMEOUT': default_timeout,
+        'CACHE_THRESHOLD': 2000,
+    }
@@ -0,0 +1,104 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import pandas as pd
+
+from metrics import registry
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalesce within a process only
+    fcntl = None
+
+# Lock files for fetches coalesced across worker processes; one per key,
+# a few bytes each.
+LOCK_DIR = os.environ.get('STOCK_LOCK_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'locks'))
+
+flight_calls = registry.counter(
+    'stock_singleflight_calls_total', 'Calls through a single-flight group: ran the fetch (leader), '
+    'shared one in flight in this process (shared), or waited for another process (waited).',
+    ['flight', 'result'])
+
+
+def _copy(value):
+    # Every caller gets its own frame to add columns to.
+    return value.copy() if isinstance(value, (pd.DataFrame, pd.Series)) else value
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the
+    function and everyone who asks for that key while it runs waits on its
+    Future and gets the same result (or exception) instead of fetching
+    again.
+
+    With `processes=True` the first caller also holds an exclusive file
+    lock for the key (fcntl, so POSIX only), and callers in other worker
+    processes queue on it. Those cannot receive the result object, so the
+    function is still run by them once the lock is free; it should check
+    first whether what it needs was stored (shared cache, files on disk)
+    while it waited.
+    """
+
+    def __init__(self, name, processes=False, lock_dir=LOCK_DIR):
+        self.name = name
+        self.processes = processes and fcntl is not None
+        self.lock_dir = lock_dir
+        self.flights = {}  # key -> (Future, leader thread id)
+        self.lock = threading.Lock()
+
+    def do(self, key, func):
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is None:
+                future = Future()
+                self.flights[key] = (future, threading.get_ident())
+        if flight is not None:
+            future, leader = flight
+            if leader == threading.get_ident():
+                # Re-entered from inside its own fetch; waiting would deadlock.
+                return func()
+            flight_calls.inc(self.name, 'shared')
+            return _copy(future.result())
+
+        flight_calls.inc(self.name, 'leader')
+        try:
+            with self.process_lock(key):
+                result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.flights[key]
+
+    def lock_path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self.lock_dir, f"{self.name}-{digest}.lock")
+
+    @contextmanager
+    def process_lock(self, key):
+        """
+        Holds the cross-process lock for `key` (a no-op unless `processes`).
+        """
+        if not self.processes:
+            yield
+            return
+        path = self.lock_path(key)
+        os.makedirs(self.lock_dir, exist_ok=True)
+        with open(path, 'a') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                flight_calls.inc(self.name, 'waited')
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
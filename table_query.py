@@ -0,0 +1,188 @@
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from metrics import stage, timed_stage
+from screener import Screener
+
+# One term of a DataTable filter_query, e.g. "{P/E} s< 20" or
+# "{Sector} icontains tech". The optional s/i prefix marks case-sensitive or
+# case-insensitive comparisons.
+FILTER_TERM = re.compile(
+    r"\{(?P<col>[^}]+)\}\s*(?P<case>[si]?)(?P<op>>=|<=|!=|<|>|=|eq|ne|lt|le|gt|ge|contains|datestartswith)\s+(?P<value>.+)",
+    re.IGNORECASE)
+
+OPERATOR_ALIASES = {'>=': 'ge', '<=': 'le', '<': 'lt', '>': 'gt', '!=': 'ne', '=': 'eq'}
+
+
+def parse_filter_query(filter_query):
+    """
+    Splits a DataTable filter_query into (column, operator, value, case
+    sensitive) tuples. Terms that cannot be parsed are ignored.
+    """
+    terms = []
+    for part in (filter_query or '').split(' && '):
+        match = FILTER_TERM.match(part.strip())
+        if not match:
+            continue
+        op = match.group('op').lower()
+        op = OPERATOR_ALIASES.get(op, op)
+        value = match.group('value').strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in ("'", '"', '`'):
+            value = value[1:-1].replace('\\' + value[0], value[0])
+        else:
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        terms.append((match.group('col'), op, value, match.group('case').lower() != 'i'))
+    return terms
+
+
+def json_records(df):
+    """
+    Rows as dicts ready for JSON: float32 values go through their shortest
+    repr (they would otherwise serialize as e.g. 123.45000457763672) and
+    NaN becomes None, which the DataTable shows as an empty cell.
+    """
+    df = df.copy()
+    for col in df.columns[df.dtypes == 'float32']:
+        df[col] = df[col].astype(str).astype('float64')
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def _term_mask(series, op, value, case_sensitive):
+    if op in ('contains', 'datestartswith'):
+        text = series.astype(str)
+        if op == 'datestartswith':
+            return text.str.startswith(str(value)).to_numpy()
+        return text.str.contains(str(value), case=case_sensitive, regex=False).to_numpy()
+
+    if isinstance(value, float):
+        values = pd.to_numeric(series, errors='coerce')
+    else:
+        values = series.astype(str)
+        if not case_sensitive:
+            values, value = values.str.lower(), value.lower()
+    compare = {
+        'eq': values.__eq__, 'ne': values.__ne__, 'lt': values.__lt__,
+        'le': values.__le__, 'gt': values.__gt__, 'ge': values.__ge__,
+    }[op]
+    return compare(value).fillna(False).to_numpy(dtype=bool)
+
+
+class SnapshotQueryEngine:
+    """
+    Answers DataTable page/sort/filter requests against one snapshot frame
+    on the server, so only the visible page is serialized to the browser.
+    Sort orders are computed once per (column, direction) and reused by
+    every later request for the same snapshot.
+    """
+
+    def __init__(self, df, search_index=None):
+        self.df = df.reset_index(drop=True)
+        self.search_index = search_index
+        self._sort_orders = {}
+        self._lock = threading.Lock()
+        self.screener = Screener(self.df)
+        self._ticker_positions = {}
+        if 'Ticker' in self.df.columns:
+            for pos, ticker in enumerate(self.df['Ticker']):
+                if not pd.isna(ticker):
+                    self._ticker_positions.setdefault(str(ticker), pos)
+
+    def __len__(self):
+        return len(self.df)
+
+    def sort_order(self, column, ascending=True):
+        key = (column, ascending)
+        order = self._sort_orders.get(key)
+        if order is None:
+            col = self.df[column]
+            try:
+                order = col.sort_values(ascending=ascending, kind='stable', na_position='last').index
+            except TypeError:
+                # Mixed object columns: fall back to comparing as text.
+                order = col.astype(str).sort_values(ascending=ascending, kind='stable').index
+            order = order.to_numpy()
+            with self._lock:
+                self._sort_orders[key] = order
+        return order
+
+    def filter_mask(self, filter_query):
+        mask = np.ones(len(self.df), dtype=bool)
+        for column, op, value, case_sensitive in parse_filter_query(filter_query):
+            if column in self.df.columns:
+                mask &= _term_mask(self.df[column], op, value, case_sensitive)
+        return mask
+
+    def search_positions(self, query):
+        """
+        Row positions of the search matches, best match first.
+        """
+        if self.search_index is None:
+            return None
+        tickers = self.search_index.search(query)
+        return np.array([self._ticker_positions[t] for t in tickers if t in self._ticker_positions], dtype=int)
+
+    def rows(self, sort_by=None, filter_query=None, search=None, screen=None):
+        """
+        Row positions matching the filter, the search box and the screen
+        expression (see screener.py), in sort order (or search rank when
+        unsorted). `sort_by` uses the DataTable format:
+        [{'column_id': ..., 'direction': 'asc' | 'desc'}].
+        """
+        mask = self.filter_mask(filter_query)
+        if screen and screen.strip():
+            mask &= self.screener.mask(screen)
+        positions = self.search_positions(search) if search else None
+        if positions is not None:
+            allowed = np.zeros(len(self.df), dtype=bool)
+            allowed[positions] = True
+            mask &= allowed
+
+        sort = next((s for s in (sort_by or []) if s.get('column_id') in self.df.columns), None)
+        if sort is None:
+            return positions[mask[positions]] if positions is not None else np.flatnonzero(mask)
+        order = self.sort_order(sort['column_id'], sort.get('direction', 'asc') == 'asc')
+        return order[mask[order]]
+
+    @timed_stage('table_page')
+    def page(self, page_current=0, page_size=10, sort_by=None, filter_query=None, search=None, screen=None):
+        """
+        Returns (records for the requested page, page count).
+        """
+        rows = self.rows(sort_by, filter_query, search, screen)
+        page_size = max(1, page_size or 10)
+        page_count = max(1, -(-len(rows) // page_size))
+        start = min(page_current or 0, page_count - 1) * page_size
+        return json_records(self.df.iloc[rows[start:start + page_size]]), page_count
+
+
+class ScreenCache:
+    """
+    Holds the query engine for the current snapshot version and rebuilds it
+    only when the version changes. The search index, if any, is kept across
+    versions and synced incrementally on each rebuild.
+    """
+
+    def __init__(self, search_index=None):
+        self.version = object()
+        self.engine = None
+        self.search_index = search_index
+        self.lock = threading.Lock()
+
+    def get(self, version, build):
+        if self.engine is not None and self.version == version:
+            return self.engine
+        with self.lock:
+            if self.engine is None or self.version != version:
+                with stage('screen_build'):
+                    df = build()
+                if self.search_index is not None:
+                    self.search_index.sync(df)
+                self.engine = SnapshotQueryEngine(df, self.search_index)
+                self.version = version
+            return self.engine
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# The stores read their directories at import; keep test data out of the repo.
+WORK_DIR = tempfile.mkdtemp(prefix='stock-tests-')
+for var, name in (('OHLCV_STORE_DIR', 'ohlcv'), ('STOCK_CACHE_DIR', 'cache'), ('POLL_STORE_DIR', 'polls'),
+                  ('STOCK_JOB_DIR', 'jobs'), ('STOCK_LOCK_DIR', 'locks')):
+    os.environ.setdefault(var, os.path.join(WORK_DIR, name))
+
+# The modules live at the repository root, next to the apps.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,110 @@
+import inspect
+import os
+import threading
+import time
+
+import diskcache
+import pytest
+from dash import Dash, DiskcacheManager, Input, Output, html
+from dash.background_callback.managers import BaseBackgroundCallbackManager
+
+from background_jobs import JobCancelled, ThreadedJobManager, job_cancelled
+
+# ThreadedJobManager overrides these; Dash calls them with exactly these
+# arguments. A Dash upgrade that changes one should fail here, not in a
+# running app.
+OVERRIDDEN = {
+    'call_job_fn': ['self', 'key', 'job_fn', 'args', 'context'],
+    'terminate_job': ['self', 'job'],
+    'terminate_unhealthy_job': ['self', 'job'],
+    'job_running': ['self', 'job'],
+}
+# ...and relies on these from the base classes.
+USED = {
+    'result_ready': ['self', 'key'],
+    '_make_progress_key': ['key'],
+    'get_progress': ['self', 'key'],
+}
+
+
+@pytest.mark.parametrize('name, params', list(OVERRIDDEN.items()) + list(USED.items()))
+def test_dash_manager_interface_is_unchanged(name, params):
+    assert list(inspect.signature(getattr(DiskcacheManager, name)).parameters) == params
+    if name in OVERRIDDEN:
+        assert name in vars(BaseBackgroundCallbackManager)
+
+
+def test_progress_key_is_where_dash_reads_progress(tmp_path):
+    manager = DiskcacheManager(diskcache.Cache(str(tmp_path)))
+    key = manager._make_progress_key('k')
+    manager.handle.set(key, ['half'])
+    assert manager.get_progress('k') == ['half']
+
+
+def post(client, payload, query=''):
+    response = client.post(f"/_dash-update-component{query}", json=payload)
+    if response.status_code == 204:  # a job with nothing to report yet
+        return {}
+    assert response.status_code == 200, response.get_data(as_text=True)[:300]
+    return response.get_json()
+
+
+def run(client, value):
+    payload = {
+        'output': 'out.children', 'outputs': {'id': 'out', 'property': 'children'},
+        'inputs': [{'id': 'in', 'property': 'children', 'value': value}],
+        'state': [], 'changedPropIds': ['in.children'],
+    }
+    body = first = post(client, payload)
+    deadline = time.time() + 10
+    while 'response' not in body and time.time() < deadline:
+        time.sleep(0.01)
+        body = post(client, payload, f"?cacheKey={first['cacheKey']}&job={first['job']}")
+    return body
+
+
+@pytest.fixture
+def app(tmp_path):
+    manager = ThreadedJobManager(cache=diskcache.Cache(str(tmp_path)))
+    app = Dash(__name__)
+    app.layout = html.Div([html.Div(id='in'), html.Div(id='out'), html.Div(id='progress')])
+    app.ran_in = []
+
+    @app.callback(Output('out', 'children'), Input('in', 'children'), background=True, manager=manager,
+                  progress=[Output('progress', 'children')])
+    def slow(set_progress, value):
+        app.ran_in.append((os.getpid(), threading.current_thread().name))
+        set_progress(('working',))
+        time.sleep(0.1)
+        if job_cancelled():
+            raise JobCancelled()
+        return f"done {value}"
+    return app
+
+
+def test_jobs_run_on_this_process_thread_pool(app):
+    body = run(app.server.test_client(), 'x')
+    assert body['response']['out']['children'] == 'done x'
+    pid, thread = app.ran_in[0]
+    assert pid == os.getpid() and thread.startswith('dash-job')
+
+
+def test_identical_jobs_share_a_run_and_cancel_when_nobody_waits(tmp_path):
+    manager = ThreadedJobManager(cache=diskcache.Cache(str(tmp_path)))
+    started, release, runs = threading.Event(), threading.Event(), []
+
+    def job_fn(key, progress_key, args, context):
+        runs.append(key)
+        started.set()
+        release.wait(5)
+
+    first = manager.call_job_fn('key', job_fn, (), {})
+    assert started.wait(5)
+    assert manager.call_job_fn('key', job_fn, (), {}) == first
+    manager.terminate_job(first)
+    assert manager.job_running(first) and not manager.cancelled(first)
+    manager.terminate_job(first)
+    assert manager.cancelled(first)
+    release.set()
+    manager.executor.shutdown(wait=True)
+    assert runs == ['key'] and not manager.job_running(first)
@@ -0,0 +1,14 @@
+import pandas as pd
+
+from charts import candle_hover_text
+
+
+def test_hover_text_shows_downsampled_volume_as_whole_shares():
+    df = pd.DataFrame({
+        'Date': pd.to_datetime(['2026-01-05', '2026-01-06']),
+        'Open': [100.0, 101.0], 'High': [102.0, 103.0], 'Low': [99.0, 100.0], 'Close': [101.0, 102.0],
+        'Volume': [1234567.0, 250.0],
+    })
+    text = candle_hover_text(df)
+    assert 'Volume: 1234567<br>' in text[0]
+    assert 'Volume: 250<br>' in text[1]
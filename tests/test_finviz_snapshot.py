@@ -0,0 +1,51 @@
+import threading
+import time
+from io import StringIO
+
+import pandas as pd
+import pytest
+
+from finviz_snapshot import SnapshotRefresher, parse_finviz_export, parse_finviz_stream
+
+
+class DictCache:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, timeout=None):
+        self.data[key] = value
+
+
+def test_adopting_a_shared_snapshot_releases_waiting_readers():
+    # Another worker publishes after get() checked the shared cache; the
+    # background refresh adopts it instead of downloading.
+    def loader(url, headers=None, on_partial=None):
+        raise AssertionError("should not download")
+
+    refresher = SnapshotRefresher('https://finviz.example/export', loader=loader, cache=DictCache())
+    result = {}
+    reader = threading.Thread(target=lambda: result.update(frame=refresher._first_rows.wait(5)))
+    reader.start()
+    time.sleep(0.05)
+    refresher._store_shared(pd.DataFrame({'Ticker': ['A']}), time.time())
+    assert refresher.refresh()
+    reader.join(5)
+    assert result['frame'] is True
+    df, age = refresher.get()
+    assert list(df['Ticker']) == ['A'] and not refresher.partial
+
+
+def test_percent_changes_are_not_rescaled():
+    # Every move under 1% used to be read as a fraction and multiplied by 100.
+    df = parse_finviz_export("Ticker,Change\nA,0.50%\nB,-0.21%\nC,-\n")
+    assert df['Change'].tolist()[:2] == pytest.approx([0.5, -0.21])
+    assert df['Change'].isna().tolist() == [False, False, True]
+
+
+def test_fractional_changes_are_scaled_in_every_chunk():
+    rows = ''.join(f"T{i},{0.5 if i % 2 else 0.012}\n" for i in range(10))
+    df = parse_finviz_stream(StringIO("Ticker,Change\n" + rows), chunk_rows=3)
+    assert sorted(set(df['Change'].tolist())) == pytest.approx([1.2, 50.0])
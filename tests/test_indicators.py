@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import IndicatorEngine
+
+
+def synthetic_bars(n, seed=0, gaps=True):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, n))
+    if gaps:
+        close[rng.choice(n, size=max(1, n // 100), replace=False)] = np.nan
+    return pd.DataFrame({
+        'Date': pd.date_range('2020-01-01', periods=n, freq='D'),
+        'Open': close,
+        'High': close * 1.01,
+        'Low': close * 0.99,
+        'Close': close,
+    })
+
+
+def reference(df):
+    """
+    The indicators written directly with pandas.
+    """
+    close, high, low = df['Close'], df['High'], df['Low']
+    prev = close.ffill().shift(1)
+    out = pd.DataFrame(index=df.index)
+    for window in (20, 50, 200):
+        out[f'SMA{window}'] = close.rolling(window).mean()
+    for span in (20, 50):
+        out[f'EMA{span}'] = close.ewm(span=span, adjust=False, ignore_na=True, min_periods=span).mean()
+    mean, std = close.rolling(20).mean(), close.rolling(20).std(ddof=0)
+    out['BB_UPPER'], out['BB_LOWER'] = mean + 2 * std, mean - 2 * std
+
+    delta = close - prev
+    wilder = dict(alpha=1 / 14, adjust=False, ignore_na=True, min_periods=14)
+    gain = delta.clip(lower=0).ewm(**wilder).mean()
+    loss = (-delta).clip(lower=0).ewm(**wilder).mean()
+    rsi = 100 - 100 / (1 + gain / loss)
+    out['RSI14'] = rsi.where(loss != 0, 100.0).where(gain.notna() & loss.notna())
+
+    tr = pd.concat([high - low, (high - prev).abs(), (low - prev).abs()], axis=1).max(axis=1)
+    tr[close.isna()] = np.nan
+    out['ATR14'] = tr.ewm(**wilder).mean()
+    out['VOL20'] = np.log(close / prev).rolling(20).std(ddof=1)
+    return out
+
+
+def assert_matches(result, expected):
+    for column in expected.columns:
+        np.testing.assert_allclose(result[column].to_numpy(), expected[column].to_numpy(),
+                                   rtol=1e-9, atol=1e-9, err_msg=column)
+
+
+@pytest.mark.parametrize('gaps', [False, True])
+def test_cold_start_matches_pandas(gaps):
+    df = synthetic_bars(600, gaps=gaps)
+    assert_matches(IndicatorEngine().apply('key', df.copy()), reference(df))
+
+
+def test_updates_match_pandas():
+    df = synthetic_bars(600)
+    engine = IndicatorEngine()
+    for end in range(300, len(df) + 1, 7):
+        result = engine.apply('key', df.iloc[:end].copy())
+        assert_matches(result, reference(df.iloc[:end]))
+    assert engine.cold_starts == 1
+
+
+def test_window_trimmed_at_the_front_stays_incremental():
+    # Like OHLCVStore._trim: every call sees the last 300 bars, so the
+    # window start moves forward as new bars arrive.
+    df = synthetic_bars(600)
+    expected = reference(df)
+    engine = IndicatorEngine()
+    for end in range(300, len(df) + 1, 5):
+        window = df.iloc[end - 300:end].reset_index(drop=True)
+        result = engine.apply('key', window.copy())
+        assert_matches(result, expected.iloc[end - 300:end].reset_index(drop=True))
+    assert engine.cold_starts == 1
+    assert engine.updates == len(range(300, len(df) + 1, 5)) - 1
+
+
+def test_revised_close_cold_starts():
+    df = synthetic_bars(300, gaps=False)
+    engine = IndicatorEngine()
+    engine.apply('key', df.iloc[:200].copy())
+    revised = df.iloc[:210].copy()
+    revised.loc[198, 'Close'] += 1.0
+    assert_matches(engine.apply('key', revised.copy()), reference(revised))
+    assert engine.cold_starts == 2
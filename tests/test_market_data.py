@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from market_data import changes_from_sources
+
+
+def wide(index, tickers=('A', 'B')):
+    # Prices rise steadily, so a longer window means a larger change.
+    close = np.linspace(100, 200, len(index))
+    fields = {'Open': close, 'High': close, 'Low': close, 'Close': close, 'Volume': np.ones(len(index))}
+    columns = pd.MultiIndex.from_product([list(fields), list(tickers)])
+    data = np.column_stack([fields[f] for f in fields for _ in tickers])
+    return pd.DataFrame(data, index=index, columns=columns)
+
+
+def test_hourly_change_comes_from_the_intraday_bars():
+    now = pd.Timestamp.now(tz='UTC').floor('min')
+    sources = {
+        'intraday': wide(pd.date_range(now - pd.Timedelta(days=7), now, freq='30min')),
+        'daily': wide(pd.bdate_range(pd.Timestamp.now().normalize() - pd.DateOffset(years=10),
+                                     pd.Timestamp.now().normalize())),
+    }
+    changes = changes_from_sources(sources, ['1m', '1h', '1d'])
+    assert changes['Change 1h'].notna().all()
+    # Five of the seven intraday days, not the daily series' year.
+    assert (changes['Change 1h'] < changes['Change 1m']).all()
+    assert (changes['Change 1h'] != changes['Change 1d']).all()
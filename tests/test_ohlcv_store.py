@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ohlcv_store
+from ohlcv_store import OHLCVStore
+
+
+def bars(index):
+    close = np.linspace(100, 110, len(index))
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                         'Volume': 1000.0}, index=index)
+
+
+def daily_index(tz=None):
+    # Midnight exchange dates, as yfinance returns them.
+    index = pd.bdate_range(pd.Timestamp.now().normalize() - pd.DateOffset(years=1), pd.Timestamp.now().normalize())
+    return index.tz_localize(tz) if tz else index
+
+
+def intraday_index(tz):
+    end = pd.Timestamp.now(tz='UTC').floor('min')
+    return pd.date_range(end - pd.Timedelta(hours=2), end, freq='min').tz_convert(tz)
+
+
+class FakeYahoo:
+    """
+    Ticker.history and download with the timezones yfinance uses: daily
+    bars tz-aware from history() and tz-naive from download(), intraday
+    bars in the exchange's zone from history() and UTC from download().
+    """
+
+    def __init__(self, intraday=False):
+        self.intraday = intraday
+
+    def index(self, exchange):
+        if self.intraday:
+            return intraday_index('America/New_York' if exchange else 'UTC')
+        return daily_index('America/New_York' if exchange else None)
+
+    def Ticker(self, ticker):
+        fake = self
+
+        class Ticker:
+            def history(self, period=None, start=None, interval=None):
+                return bars(fake.index(exchange=True))
+        return Ticker()
+
+    def download(self, tickers, interval=None, start=None, period=None, **kwargs):
+        df = bars(self.index(exchange=False))
+        df.columns = pd.MultiIndex.from_product([df.columns, [tickers[0]]])
+        parts = [df.rename(columns={tickers[0]: t}, level=1) for t in tickers]
+        return pd.concat(parts, axis=1)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    return OHLCVStore(root=str(tmp_path))
+
+
+def test_daily_bars_from_both_fetch_paths_line_up(store, monkeypatch):
+    # A detail-page visit stores AAPL through Ticker.history; the main table
+    # then reads it next to a ticker fetched with download().
+    monkeypatch.setattr(ohlcv_store, 'yf', FakeYahoo())
+    store.history('AAPL', '1y', '1d')
+    assert store.load('AAPL', '1d').index.tz is None
+
+    wide = store.bulk_history(['AAPL', 'MSFT'], '1y', '1d')
+    assert wide.index.tz is None
+    assert set(wide['Close'].columns) == {'AAPL', 'MSFT'}
+    assert wide['Close'].iloc[-1].notna().all()
+
+
+def test_files_written_with_a_timezone_are_read_as_dates(store, monkeypatch):
+    df = bars(daily_index('America/New_York'))
+    df.index.name = 'Date'
+    store.save('OLD', '1d', df)
+    assert store.load('OLD', '1d').index.equals(daily_index().rename('Date'))
+
+
+def test_intraday_bars_are_stored_in_utc(store, monkeypatch):
+    monkeypatch.setattr(ohlcv_store, 'yf', FakeYahoo(intraday=True))
+    shown = store.history('AAPL', '1d', '1m')
+    assert str(shown.index.tz) == 'America/New_York'
+    assert str(store.load('AAPL', '1m').index.tz) == 'UTC'
+
+    wide = store.bulk_history(['AAPL', 'MSFT'], '1d', '1m')
+    assert str(wide.index.tz) == 'UTC'
+    assert wide['Close'].iloc[-1].notna().all()
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from poll_store import DeltaWriter, PollStore, poll_rows
+
+T0 = pd.Timestamp('2026-01-05 15:00', tz='UTC')
+
+
+def poll(writer, hours, values):
+    data = pd.DataFrame({'Metric': list(values), 'Value': list(values.values())})
+    return writer.write(poll_rows(T0 + pd.Timedelta(hours=hours), 'AAPL', 'finvizfinance', data))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PollStore(root=str(tmp_path))
+
+
+def state(store, hours):
+    df = store.state_at(T0 + pd.Timedelta(hours=hours))
+    return dict(zip(df['metric'], df['text']))
+
+
+def test_metric_missing_from_a_poll_is_removed(store):
+    writer = DeltaWriter(store)
+    poll(writer, 0, {'P/E': '25.1', 'ROE': '30%'})
+    assert poll(writer, 1, {'P/E': '25.1'}) == (1, 1)  # only the tombstone
+    assert poll(writer, 2, {'P/E': '25.3'}) == (1, 1)
+
+    assert state(store, 0.5) == {'P/E': '25.1', 'ROE': '30%'}
+    assert state(store, 1.5) == {'P/E': '25.1'}
+    assert state(store, 2.5) == {'P/E': '25.3'}
+
+    # Back again: written as a change even though the text is what it was.
+    assert poll(writer, 3, {'P/E': '25.3', 'ROE': '30%'}) == (1, 2)
+    assert state(store, 3.5) == {'P/E': '25.3', 'ROE': '30%'}
+
+
+def test_wide_values_stop_at_a_tombstone(store):
+    writer = DeltaWriter(store)
+    poll(writer, 0, {'P/E': '25.1', 'ROE': '30%'})
+    poll(writer, 1, {'P/E': '25.1'})
+    poll(writer, 2, {'P/E': '25.1', 'ROE': '31%'})
+    roe = store.load_metric('ROE', wide=True)['AAPL']
+    assert roe.iloc[0] == 30 and np.isnan(roe.iloc[1]) and roe.iloc[2] == 31
+    assert store.load_metric('P/E', wide=True)['AAPL'].tolist() == [25.1]
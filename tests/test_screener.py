@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from screener import Screener, ScreenError
+
+
+@pytest.fixture
+def screener():
+    return Screener(pd.DataFrame({
+        'Ticker': ['A', 'B', 'C', 'D'],
+        'ROE': np.array([20.0, np.nan, 10.0, 30.0], dtype='float32'),
+        'P/E': [10.0, 20.0, np.nan, 5.0],
+        'Sector': pd.Categorical(['Tech', 'Utilities', None, 'Energy']),
+    }))
+
+
+def tickers(screener, expression):
+    return list(screener.screen(expression)['Ticker'])
+
+
+@pytest.mark.parametrize('expression', [
+    "ROE > 'abc'",
+    "ROE + 'x' > 1",
+    "ROE and P/E",
+    "not ROE",
+    "(ROE > 0) > 1",
+])
+def test_type_errors_are_screen_errors(screener, expression):
+    with pytest.raises(ScreenError):
+        screener.mask(expression)
+
+
+def test_text_comparisons(screener):
+    assert tickers(screener, "Sector > 'S'") == ['A', 'B']
+    assert tickers(screener, "Sector == 'Energy'") == ['D']
+
+
+def test_missing_values_never_match(screener):
+    assert tickers(screener, "not ROE > 15") == ['C']
+    assert tickers(screener, "not Sector == 'Utilities'") == ['A', 'D']
+    assert tickers(screener, "not Sector contains 'ech'") == ['B', 'D']
+    # B fails P/E < 15 whatever its ROE is, so the conjunction is known.
+    assert tickers(screener, "not (ROE > 15 and P/E < 15)") == ['B', 'C']
+    assert tickers(screener, "not (ROE > 15 or P/E < 15)") == []
+    assert tickers(screener, "ROE > 15 or P/E < 15") == ['A', 'D']
+
+
+def test_group_statistics(screener):
+    assert tickers(screener, "rank(P/E) <= 2") == ['A', 'B']
+    assert tickers(screener, "P/E < 20 and abs(ROE - 25) < 6") == ['A', 'D']
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from ttl_cache import TTLCache
+
+
+def test_cold_call_counts_one_miss():
+    cache = TTLCache()
+    calls = []
+
+    @cache.memoize(60)
+    def load(x):
+        calls.append(x)
+        return x * 2
+
+    assert load(2) == 4
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert load(2) == 4
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert calls == [2]
+
+
+def test_concurrent_cold_callers_count_one_miss_each():
+    cache = TTLCache()
+    calls = []
+    barrier = threading.Barrier(4)
+
+    @cache.memoize(60)
+    def load(x):
+        calls.append(x)
+        time.sleep(0.2)
+        return x
+
+    def call():
+        barrier.wait()
+        load(1)
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [1]
+    assert (cache.hits, cache.misses) == (0, 4)
+
+
+def test_oversized_value_replaces_the_old_entry():
+    cache = TTLCache(max_bytes=1000)
+    cache.set('key', 'small', 60)
+    cache.set('key', 'x' * 5000, 60)
+    assert cache.peek('key') is None
+    assert cache.total_bytes == 0
@@ -0,0 +1,158 @@
+import functools
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from singleflight import SingleFlight
+
+# Seconds a cached history stays fresh, per app timeframe. Roughly one bar:
+# minute bars change every few seconds, monthly bars a few times a day.
+HISTORY_TTL = {
+    '1m': 30,
+    '3m': 60,
+    '1h': 300,
+    '1d': 900,
+    '1w': 3600,
+    '1mo': 4 * 3600,
+    '1y': 12 * 3600,
+}
+FUNDAMENTALS_TTL = 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def sizeof(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    return sys.getsizeof(value)
+
+
+def _copy(value):
+    # Callers add columns to the frames they get back; keep the cached one intact.
+    return value.copy() if isinstance(value, (pd.DataFrame, pd.Series)) else value
+
+
+class TTLCache:
+    """
+    In-process cache where every entry has its own time-to-live and the
+    least recently used entries are evicted once the total size exceeds
+    `max_bytes`. Keeps hit/miss/eviction counters for monitoring.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, name='cache'):
+        self.max_bytes = max_bytes
+        self.name = name
+        self.entries = OrderedDict()  # key -> (value, expires_at, size)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        missing = object()
+        with self.lock:
+            value = self._lookup(key, missing)
+            if value is missing:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def peek(self, key, default=None):
+        """
+        Like get, but leaves the hit and miss counters alone.
+        """
+        with self.lock:
+            return self._lookup(key, default)
+
+    def _lookup(self, key, default):
+        entry = self.entries.get(key)
+        if entry is None or entry[1] <= time.time():
+            if entry is not None:
+                self._remove(key)
+            return default
+        self.entries.move_to_end(key)
+        return _copy(entry[0])
+
+    def set(self, key, value, ttl):
+        size = sizeof(value)
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                # Too big to keep, but the old value is out of date either way.
+                return
+            self.entries[key] = (_copy(value), time.time() + ttl, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self.entries.pop(key)
+        self.total_bytes -= size
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'name': self.name,
+            'entries': len(self.entries),
+            'bytes': self.total_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+    def memoize(self, ttl):
+        """
+        Decorator caching results by positional and keyword arguments.
+        `ttl` is a number of seconds or a callable that receives the same
+        arguments as the function and returns one. Concurrent misses for
+        the same arguments run the function once and share its result.
+        """
+        def decorator(func):
+            flights = SingleFlight(f"{self.name}.{func.__name__}")
+
+            def load(key, args, kwargs):
+                # Another caller may have filled the entry while this one
+                # waited for the flight before it. The caller's own lookup
+                # already counted the miss.
+                missing = object()
+                value = self.peek(key, missing)
+                if value is not missing:
+                    return value
+                value = func(*args, **kwargs)
+                self.set(key, value, ttl(*args, **kwargs) if callable(ttl) else ttl)
+                return value
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                key = (func.__qualname__, args, tuple(sorted(kwargs.items())))
+                missing = object()
+                value = self.get(key, missing)
+                if value is not missing:
+                    return value
+                return flights.do(key, lambda: load(key, args, kwargs))
+            wrapper.cache = self
+            return wrapper
+        return decorator
+
+
+history_cache = TTLCache(name='history')
+fundamentals_cache = TTLCache(max_bytes=16 * 1024 * 1024, name='fundamentals')
+
+
+def history_ttl(ticker_symbol, interval):
+    return HISTORY_TTL.get(interval, 300)